@@ -0,0 +1,94 @@
+# 比較不同中間檔格式（CSV / Parquet / Feather）在前處理各階段的耗時與磁碟用量
+#
+# 用法（於專案根目錄執行）：
+# python -m benchmarks.bench_intermediate_formats --raw-dir data/raw --work-dir /tmp/bench_formats
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import time
+
+from preprocess.merge_csvs import merge_csvs
+from preprocess.clean_data import clean_data
+from preprocess.scale_features import scale_features
+from preprocess.feature_selection import run_feature_selection
+from preprocess.data_split import split_data_and_save
+
+
+def _timed(func, *args, **kwargs):
+    """
+    執行函式並回傳耗時（秒）；各階段的 print 輸出會被吞掉，避免干擾結果表
+    """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def _size_mb(*paths):
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p)) / 1024 ** 2
+
+
+def run_format(raw_dir, work_dir, fmt):
+    """
+    以指定格式跑完整個前處理流程，回傳每個階段的耗時與輸出檔大小
+    """
+    out_dir = os.path.join(work_dir, fmt)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    merged = os.path.join(out_dir, f"merged.{fmt}")
+    cleaned = os.path.join(out_dir, f"cleaned.{fmt}")
+    preprocessed = os.path.join(out_dir, f"preprocessed.{fmt}")
+    features_json = os.path.join(out_dir, "selected_features.json")
+    splits = [os.path.join(out_dir, f"{name}.{fmt}")
+              for name in ["train", "val", "test"]]
+
+    stages = {
+        "merge": (_timed(merge_csvs, raw_dir, merged), _size_mb(merged)),
+        "clean": (_timed(clean_data, merged, cleaned), _size_mb(cleaned)),
+        "scale": (_timed(scale_features, cleaned, preprocessed), _size_mb(preprocessed)),
+        "select": (_timed(run_feature_selection, preprocessed,
+                          feature_output_path=features_json), 0.0),
+        "split": (_timed(split_data_and_save, preprocessed, features_json,
+                         out_dir, fmt=fmt), _size_mb(*splits)),
+    }
+    return {name: {"seconds": round(sec, 3), "size_mb": round(mb, 2)}
+            for name, (sec, mb) in stages.items()}
+
+
+def print_report(results):
+    formats = list(results)
+    print(f"{'stage':<8}" + "".join(f"{fmt + ' s':>14}{fmt + ' MB':>14}" for fmt in formats))
+    for stage in results[formats[0]]:
+        row = f"{stage:<8}"
+        for fmt in formats:
+            r = results[fmt][stage]
+            row += f"{r['seconds']:>14.2f}{r['size_mb']:>14.1f}"
+        print(row)
+    totals = f"{'total':<8}"
+    for fmt in formats:
+        totals += f"{sum(r['seconds'] for r in results[fmt].values()):>14.2f}"
+        totals += f"{sum(r['size_mb'] for r in results[fmt].values()):>14.1f}"
+    print(totals)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="中間檔格式效能比較")
+    parser.add_argument("--raw-dir", default="data/raw")
+    parser.add_argument("--work-dir", default="data/bench_formats")
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "feather"])
+    parser.add_argument("--output-json", default=None, help="將結果另存成 JSON")
+    args = parser.parse_args()
+
+    results = {fmt: run_format(args.raw_dir, args.work_dir, fmt)
+               for fmt in args.formats}
+    print_report(results)
+
+    if args.output_json:
+        with open(args.output_json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"結果已儲存到 {args.output_json}")
@@ -0,0 +1,107 @@
+# 建圖（data/make_graph.build_graph）的時間與記憶體預算測試
+#
+# 以 CICIDS2017 一整週的規模（約 283 萬筆流量、約 1.9 萬個 IP、來源 Port 多為臨時 Port）
+# 產生測試資料，量測建圖耗時與峰值記憶體（tracemalloc，含 numpy 配置）；
+# 超過預算時以非 0 狀態碼結束，方便放進 CI。
+#
+# 預算（單核心、未計讀檔時間）：
+# - 整週（endpoint 節點、合併平行流量）：30 秒內、峰值記憶體 2048 MB 內
+#   （參考：單核心約 9 秒、峰值約 1.5 GB；約 308 萬個節點、283 萬條邊）
+#
+# 用法（於專案根目錄執行）：
+# python -m benchmarks.bench_make_graph
+# python -m benchmarks.bench_make_graph --rows 500000 --features 20
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from data.make_graph import build_graph, print_graph_summary
+
+WEEK_ROWS = 2_830_743
+BUDGET_SECONDS = 30
+BUDGET_PEAK_MB = 2048
+
+
+def make_flows(rows, n_features=20, n_internal=500, n_external=18_500, seed=0):
+    """
+    產生含端點欄位的流量資料：來源多為內部主機 + 臨時 Port，目的 Port 集中在常見服務
+    """
+    rng = np.random.default_rng(seed)
+    internal = np.array([f"192.168.{i // 256}.{i % 256}" for i in range(n_internal)])
+    external = np.array([f"{rng.integers(1, 224)}.{rng.integers(0, 256)}."
+                         f"{rng.integers(0, 256)}.{rng.integers(1, 255)}" for _ in range(n_external)])
+    hosts = np.concatenate([internal, external])
+    # 少數主機佔大部分流量
+    weights = 1.0 / np.arange(1, len(hosts) + 1) ** 0.8
+    weights /= weights.sum()
+    common_ports = np.array([80, 443, 53, 22, 21, 8080, 139, 445, 123, 3389])
+
+    df = pd.DataFrame({
+        "Source IP": hosts[rng.choice(len(hosts), rows, p=weights)],
+        "Source Port": rng.integers(32_768, 61_000, rows),
+        "Destination IP": hosts[rng.choice(len(hosts), rows, p=weights)],
+        "Destination Port": np.where(rng.random(rows) < 0.9,
+                                     common_ports[rng.integers(0, len(common_ports), rows)],
+                                     rng.integers(1, 65_536, rows)),
+    })
+    for i in range(n_features):
+        df[f"f{i}"] = rng.standard_normal(rows).astype(np.float32)
+    df["Label_Binary"] = (rng.random(rows) < 0.2).astype(np.int64)
+    df["Label_enc"] = np.where(df["Label_Binary"] == 1, rng.integers(1, 15, rows), 0)
+    return df
+
+
+def measure(df, features, node_key, aggregate):
+    """
+    回傳 (圖, 耗時秒數, 峰值記憶體 MB)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    graph = build_graph(df, features, node_key=node_key, aggregate=aggregate)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return graph, elapsed, peak / 1024 ** 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="建圖時間與記憶體預算測試")
+    parser.add_argument("--rows", type=int, default=WEEK_ROWS)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--budget-seconds", type=float, default=None,
+                        help="耗時預算（預設依筆數由整週預算等比例換算）")
+    parser.add_argument("--budget-mb", type=float, default=None,
+                        help="峰值記憶體預算（預設依筆數由整週預算等比例換算）")
+    args = parser.parse_args()
+
+    ratio = args.rows / WEEK_ROWS
+    budget_seconds = args.budget_seconds or BUDGET_SECONDS * ratio
+    budget_mb = args.budget_mb or BUDGET_PEAK_MB * ratio
+
+    df = make_flows(args.rows, n_features=args.features)
+    features = [f"f{i}" for i in range(args.features)]
+    print(f"資料 shape: {df.shape}")
+
+    print(f"{'mode':<24}{'seconds':>10}{'peak MB':>10}{'nodes':>12}{'edges':>12}")
+    results = {}
+    for node_key, aggregate in [("endpoint", True), ("endpoint", False), ("host", True)]:
+        graph, elapsed, peak_mb = measure(df, features, node_key, aggregate)
+        name = f"{node_key} / {'aggregate' if aggregate else 'per-flow'}"
+        results[name] = (elapsed, peak_mb)
+        print(f"{name:<24}{elapsed:>10.2f}{peak_mb:>10.1f}"
+              f"{len(graph['x']):>12}{graph['edge_index'].shape[1]:>12}")
+        if node_key == "endpoint" and aggregate:
+            print_graph_summary(graph)
+        del graph
+
+    elapsed, peak_mb = results["endpoint / aggregate"]
+    print(f"預算：{budget_seconds:.1f} 秒、{budget_mb:.0f} MB")
+    if elapsed > budget_seconds or peak_mb > budget_mb:
+        print("❌ 建圖超出預算")
+        sys.exit(1)
+    print("✅ 建圖在預算內")
@@ -0,0 +1,39 @@
+# 比較 merge_csvs 的讀檔方式：逐一讀取（float64 / int64）vs 多行程平行讀取 + dtype 降型
+#
+# 用法（於專案根目錄執行）：
+# python -m benchmarks.bench_merge_ingest --raw-dir data/raw
+
+import argparse
+import contextlib
+import io
+import time
+
+from preprocess.merge_csvs import merge_frames
+
+
+def measure(raw_dir, workers, downcast):
+    """
+    回傳 (耗時秒數, 合併後 DataFrame 的記憶體用量 MB, 筆數)
+    """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = merge_frames(raw_dir, workers=workers, downcast=downcast)
+    elapsed = time.perf_counter() - start
+    return elapsed, df.memory_usage(deep=True).sum() / 1024 ** 2, len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="merge_csvs 平行讀檔與降型效能比較")
+    parser.add_argument("--raw-dir", default="data/raw")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="平行讀檔的行程數（預設為檔案數與 CPU 核心數取小者）")
+    args = parser.parse_args()
+
+    base_sec, base_mb, rows = measure(args.raw_dir, workers=1, downcast=False)
+    fast_sec, fast_mb, _ = measure(args.raw_dir, workers=args.workers, downcast=True)
+
+    print(f"筆數：{rows}")
+    print(f"{'mode':<24}{'seconds':>10}{'memory MB':>12}")
+    print(f"{'sequential / 64-bit':<24}{base_sec:>10.2f}{base_mb:>12.1f}")
+    print(f"{'parallel / downcast':<24}{fast_sec:>10.2f}{fast_mb:>12.1f}")
+    print(f"加速 {base_sec / fast_sec:.2f} 倍，記憶體減少 {1 - fast_mb / base_mb:.0%}")
@@ -0,0 +1,78 @@
+# 評估指標（evaluate/metrics.StreamingMetrics）的耗時與正確性測試
+#
+# 以整週規模（約 283 萬筆）的預測分數逐批累加，量測二元（Label_Binary）與 15 類（Label_enc）
+# 指標的總耗時，並與 scikit-learn 在完整預測向量上的結果比較（AUC 因分數量化會有約 1e-4 的差異）。
+#
+# 用法（於專案根目錄執行）：
+# python -m benchmarks.bench_metrics
+# python -m benchmarks.bench_metrics --rows 500000 --batch-size 4096
+
+import argparse
+import time
+
+import numpy as np
+from sklearn import metrics as skm
+
+from evaluate.metrics import StreamingMetrics, best_threshold
+
+WEEK_ROWS = 2_830_743
+NUM_CLASSES = 15
+
+
+def make_predictions(rows, seed=0):
+    """
+    約 20% 攻擊的二元分數，以及 15 類的 softmax 機率（真實類別的 logit 較高）
+    """
+    rng = np.random.default_rng(seed)
+    y_binary = (rng.random(rows) < 0.2).astype(np.int64)
+    scores = np.clip(rng.normal(0.3 + 0.4 * y_binary, 0.2), 0, 1)
+    y_multi = np.where(y_binary == 1, rng.integers(1, NUM_CLASSES, rows), 0)
+    logits = rng.normal(size=(rows, NUM_CLASSES)).astype(np.float32)
+    logits[np.arange(rows), y_multi] += 1.5
+    probs = np.exp(logits)
+    probs /= probs.sum(axis=1, keepdims=True)
+    return y_binary, scores, y_multi, probs
+
+
+def timed_stream(metrics, batch_size, y, probs, **kwargs):
+    start = time.perf_counter()
+    for i in range(0, len(y), batch_size):
+        batch = slice(i, i + batch_size)
+        metrics.update(y[batch], probs=probs[batch],
+                       **{key: value[batch] for key, value in kwargs.items()})
+    result = metrics.result()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="串流評估指標的耗時與正確性測試")
+    parser.add_argument("--rows", type=int, default=WEEK_ROWS)
+    parser.add_argument("--batch-size", type=int, default=65_536)
+    args = parser.parse_args()
+
+    y_binary, scores, y_multi, probs = make_predictions(args.rows)
+
+    binary = StreamingMetrics(2, num_types=NUM_CLASSES)
+    result, seconds = timed_stream(binary, args.batch_size, y_binary, scores, y_type=y_multi)
+    start = time.perf_counter()
+    best = best_threshold(binary.sweep())
+    sweep_seconds = time.perf_counter() - start
+    print(f"⏱️ 二元：{seconds:.3f} 秒；門檻掃描 {sweep_seconds * 1000:.1f} ms"
+          f"（最佳 F1 {best['f1']:.4f} @ {best['threshold']:.4f}）")
+    start = time.perf_counter()
+    reference = {"f1": skm.f1_score(y_binary, scores >= 0.5),
+                 "roc_auc": skm.roc_auc_score(y_binary, scores),
+                 "pr_auc": skm.average_precision_score(y_binary, scores)}
+    print(f"   scikit-learn 完整向量：{time.perf_counter() - start:.3f} 秒")
+    for name, value in reference.items():
+        print(f"   {name:<8} streaming {result[name]:.6f}   sklearn {value:.6f}")
+
+    multi = StreamingMetrics(NUM_CLASSES)
+    result, seconds = timed_stream(multi, args.batch_size, y_multi, probs)
+    print(f"⏱️ {NUM_CLASSES} 類：{seconds:.3f} 秒")
+    start = time.perf_counter()
+    reference = {"f1": skm.f1_score(y_multi, probs.argmax(axis=1), average="macro"),
+                 "roc_auc": skm.roc_auc_score(y_multi, probs, multi_class="ovr", average="macro")}
+    print(f"   scikit-learn 完整向量：{time.perf_counter() - start:.3f} 秒")
+    for name, value in reference.items():
+        print(f"   {name:<8} streaming {result[name]:.6f}   sklearn {value:.6f}")
@@ -0,0 +1,129 @@
+# 滾動通訊圖（data/rolling_graph）重播一整天流量的吞吐量與記憶體測試
+#
+# 依時間順序分批加入流量、移除超過 horizon 的流量，並模擬線上評分時的 embedding 更新
+# （取出受影響節點的 k-hop 子圖與節點特徵，不含 GNN 計算）。每小時（資料時間）印出
+# 存活的節點 / 邊 / 流量數與圖佔用的記憶體（numpy 陣列 + dict / 鄰接表），
+# 流量穩定時記憶體應維持在固定範圍。（不用 tracemalloc，避免拖慢計時）
+#
+# 預設以 CICIDS2017 週三的規模（約 69 萬筆、8 小時）產生測試資料；
+# 也可用 --csv 指定含 IP / Port / Timestamp 欄位的真實單日 CSV（GeneratedLabelledFlows 版）。
+#
+# 用法（於專案根目錄執行）：
+# python -m benchmarks.bench_rolling_graph
+# python -m benchmarks.bench_rolling_graph --csv data/raw/Wednesday-workingHours.pcap_ISCX.csv --horizon 5min
+
+import argparse
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_make_graph import make_flows
+from data.make_graph import ENDPOINT_COLUMNS, parse_timestamps, to_seconds
+from data.rolling_graph import RollingGraph
+from utils.helpers import feature_columns
+
+DAY_ROWS = 692_703
+DAY_SECONDS = 8 * 3600
+
+
+def synthetic_day(rows, n_features=20, seed=0):
+    """
+    make_flows 的流量加上均勻分布於 8 小時上班時段的時間（秒）
+    """
+    df = make_flows(rows, n_features=n_features, seed=seed)
+    rng = np.random.default_rng(seed)
+    timestamps = np.sort(rng.integers(0, DAY_SECONDS, rows))
+    return df, [f"f{i}" for i in range(n_features)], timestamps
+
+
+def csv_day(path):
+    df = pd.read_csv(path, encoding='latin1', low_memory=False)
+    df.columns = df.columns.str.strip()
+    features = feature_columns(df)
+    values = df[features].to_numpy(dtype=np.float64)
+    df[features] = np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0)
+    timestamps = parse_timestamps(df['Timestamp'])
+    order = np.argsort(timestamps, kind='stable')
+    return df.iloc[order].reset_index(drop=True), features, timestamps[order]
+
+
+def graph_memory_mb(graph):
+    """
+    numpy 陣列與 dict / 鄰接表（不含其中的 int 物件）佔用的記憶體
+    """
+    dicts = (sys.getsizeof(graph.ip_ids) + sys.getsizeof(graph.node_ids) + sys.getsizeof(graph.edge_ids)
+             + sum(sys.getsizeof(adj) for adj in graph.out_adj) + sum(sys.getsizeof(adj) for adj in graph.in_adj))
+    return graph.nbytes() / 1024 ** 2, dicts / 1024 ** 2
+
+
+def replay(df, features, timestamps, horizon_seconds, batch_size, hops, max_neighbors, node_key):
+    graph = RollingGraph(len(features), horizon_seconds, node_key=node_key)
+    src_ip = df[ENDPOINT_COLUMNS["src_ip"]].astype(str).to_numpy()
+    dst_ip = df[ENDPOINT_COLUMNS["dst_ip"]].astype(str).to_numpy()
+    src_port = df[ENDPOINT_COLUMNS["src_port"]].to_numpy(dtype=np.int64)
+    dst_port = df[ENDPOINT_COLUMNS["dst_port"]].to_numpy(dtype=np.int64)
+    attrs = df[features].to_numpy(dtype=np.float32)
+
+    update_seconds, refresh_seconds, affected_sizes = 0.0, 0.0, []
+    next_report = timestamps[0] + 3600
+    print(f"{'hour':>5}{'flows':>10}{'nodes':>10}{'edges':>10}{'live flows':>12}"
+          f"{'array MB':>10}{'dict MB':>10}")
+    for start in range(0, len(df), batch_size):
+        batch = slice(start, start + batch_size)
+        t0 = time.perf_counter()
+        graph.expire(int(timestamps[batch][-1]))
+        src, dst, _ = graph.insert(src_ip[batch], src_port[batch], dst_ip[batch], dst_port[batch],
+                                   attrs[batch], timestamps[batch])
+        t1 = time.perf_counter()
+        affected = graph.affected_nodes(hops, max_neighbors)
+        computation = graph.k_hop(affected, hops, max_neighbors)
+        graph.subgraph_edges(computation)
+        graph.node_features(computation)
+        t2 = time.perf_counter()
+        update_seconds += t1 - t0
+        refresh_seconds += t2 - t1
+        affected_sizes.append(len(affected))
+
+        if timestamps[batch][-1] >= next_report or start + batch_size >= len(df):
+            stats = graph.stats()
+            array_mb, dict_mb = graph_memory_mb(graph)
+            hour = (timestamps[batch][-1] - timestamps[0]) / 3600
+            print(f"{hour:>5.1f}{min(start + batch_size, len(df)):>10}{stats['nodes']:>10}"
+                  f"{stats['edges']:>10}{stats['flows']:>12}{array_mb:>10.1f}{dict_mb:>10.1f}")
+            next_report += 3600
+    return graph, update_seconds, refresh_seconds, np.array(affected_sizes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="滾動通訊圖重播一整天流量的吞吐量與記憶體測試")
+    parser.add_argument("--csv", default=None, help="真實單日 CSV（預設產生合成資料）")
+    parser.add_argument("--rows", type=int, default=DAY_ROWS, help="合成資料筆數")
+    parser.add_argument("--features", type=int, default=20, help="合成資料特徵數")
+    parser.add_argument("--horizon", default="5min")
+    parser.add_argument("--batch-size", type=int, default=256, help="每批加入的流量數（同評分服務的 max_batch）")
+    parser.add_argument("--hops", type=int, default=2)
+    parser.add_argument("--max-neighbors", type=int, default=32)
+    parser.add_argument("--node-key", choices=["endpoint", "host"], default="endpoint")
+    args = parser.parse_args()
+
+    if args.csv:
+        df, features, timestamps = csv_day(args.csv)
+    else:
+        df, features, timestamps = synthetic_day(args.rows, n_features=args.features)
+    print(f"資料 shape: {df.shape}，時間跨度 {(timestamps[-1] - timestamps[0]) / 3600:.1f} 小時")
+
+    graph, update_seconds, refresh_seconds, affected = replay(
+        df, features, timestamps, to_seconds(args.horizon), args.batch_size,
+        args.hops, args.max_neighbors, args.node_key)
+    total = update_seconds + refresh_seconds
+    stats = graph.stats()
+    print(f"⏱️ 加入 / 過期：{update_seconds:.2f} 秒（{len(df) / update_seconds:,.0f} flows/s）")
+    print(f"⏱️ 受影響子圖：{refresh_seconds:.2f} 秒；每批受影響節點 平均 {affected.mean():.0f}、"
+          f"p99 {np.percentile(affected, 99):.0f}")
+    print(f"⏱️ 合計 {total:.2f} 秒（{len(df) / total:,.0f} flows/s）")
+    print(f"📊 結束時容量：節點 {stats['node_capacity']}、邊 {stats['edge_capacity']}、"
+          f"流量 {stats['event_capacity']}；行程峰值 RSS "
+          f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB（含測試資料）")
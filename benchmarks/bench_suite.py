@@ -0,0 +1,253 @@
+# 端到端效能回歸測試：以合成 CICIDS2017 資料（benchmarks/synthetic_data.py）量測各階段
+#
+# 每個資料量（預設 100k / 1m / 10m 筆）在獨立的行程中依序執行：
+#   merge → clean → scale → select → split（記憶體內流程，與 run_preprocessing_pipeline 相同）
+#   → stream_check（不超過 STREAM_CHECK_MAX_ROWS 筆時：串流前處理的輸出須與記憶體內結果一致，
+#     見 preprocess/streaming.compare_with_in_memory）
+#   → graph（build_graph + save_graph）→ train（1 個 epoch；未安裝 torch 時略過）
+#   → metrics（StreamingMetrics 逐批累加全部流量的分數）
+#   → figures（等待背景繪圖完成：只量到沒有和其他階段重疊的部分）
+# 各階段的耗時 / CPU 時間 / 峰值 RSS 由 utils.profiling.Profiler 量測，逐筆寫入
+# <work-dir>/<資料量>/trace.jsonl。
+#
+# 基準值存在 benchmarks/baseline.json（與機器有關：換機器或 CI runner 時需重建）；
+# 任一階段比基準慢超過 --tolerance（且超過 COMPARE_METRICS 的絕對下限）時，
+# 或串流輸出與記憶體內結果不一致時，以非 0 狀態碼結束。
+#
+# 用法（於專案根目錄執行）：
+# python -m benchmarks.bench_suite --update-baseline          # 建立 / 更新基準值
+# python -m benchmarks.bench_suite                            # 與基準比較
+# python -m benchmarks.bench_suite --sizes 100k 1m --tolerance 0.3
+# python -m benchmarks.bench_suite --sizes 100k --repeat 3   # 各指標取 3 次中的最小值
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.synthetic_data import ensure_dataset, parse_rows
+from utils.helpers import add_label_binary
+from utils.profiling import (
+    COMPARE_METRICS, TRACE_FILE, Profiler, compare_stages, print_stage_stats)
+
+DEFAULT_SIZES = ["100k", "1m", "10m"]
+BASELINE_PATH = "benchmarks/baseline.json"
+METRICS_BATCH = 65_536
+# 串流一致性檢查的資料量上限（需要同時保留記憶體內結果與串流輸出）
+STREAM_CHECK_MAX_ROWS = 1_000_000
+# 檢查時串流前處理的分塊記憶體上限（MB）：刻意設小，讓每個檔案都分成多塊
+STREAM_CHECK_MEMORY_MB = 16
+
+
+def machine_info():
+    """
+    基準值所在機器的摘要（比較時若不同會提醒）
+    """
+    return {"platform": platform.platform(), "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(), "python": platform.python_version()}
+
+
+def run_size(size, work_dir, seed=0, epochs=1):
+    """
+    在單一資料量上執行所有階段（在獨立的 worker 行程中執行，峰值 RSS 不受其他資料量影響）
+    回傳 Profiler.stages
+    """
+    from data.make_graph import build_graph, save_graph
+    from eda.render import FigureRenderer
+    from evaluate.metrics import StreamingMetrics
+    from preprocess.streaming import compare_with_in_memory, stream_preprocess
+    from run_preprocessing_pipeline import (
+        pipeline_paths, run_in_memory_selection_and_split, run_in_memory_upstream)
+
+    rows = parse_rows(size)
+    size_dir = os.path.join(work_dir, size)
+    raw_dir = os.path.join(size_dir, "raw")
+    processed_dir = os.path.join(size_dir, "processed")
+    ensure_dataset(raw_dir, rows, seed=seed)
+
+    trace_path = os.path.join(size_dir, TRACE_FILE)
+    if os.path.exists(trace_path):
+        os.remove(trace_path)
+    profiler = Profiler(trace_path=trace_path, context={"size": size, "rows": rows})
+    paths = pipeline_paths(processed_dir)
+    params = {"corr_threshold": 0.05, "high_corr_threshold": 0.9, "split_mode": "random",
+              "split_window": "1h", "split_stratify": "binary", "split_seed": 42,
+              "intermediate_format": "parquet", "split_format": "npy"}
+
+    renderer = FigureRenderer()
+    df, upstream = run_in_memory_upstream(raw_dir, processed_dir, paths, profiler,
+                                          renderer=renderer)
+    if rows <= STREAM_CHECK_MAX_ROWS:
+        # 除了耗時，另記錄是否一致與最大誤差
+        with profiler.stage("stream_check", rows_in=len(df)) as record:
+            streamed_path = os.path.join(size_dir, "stream_check.parquet")
+            stream_preprocess(raw_dir, streamed_path, max_memory_mb=STREAM_CHECK_MEMORY_MB)
+            try:
+                record["max_diff"] = compare_with_in_memory(streamed_path, df)
+                record["passed"] = True
+            except AssertionError as e:
+                print(f"❌ 串流輸出與記憶體內結果不一致：{e}")
+                record["passed"], record["error"] = False, str(e)
+            os.remove(streamed_path)
+    features, _ = run_in_memory_selection_and_split(
+        df, upstream["scale_key"], processed_dir, paths, params, profiler, save=("splits",),
+        renderer=renderer)
+
+    if 'Label_Binary' not in df.columns:
+        add_label_binary(df)
+    graph_path = os.path.join(size_dir, "graph.npz")
+    with profiler.stage("graph", rows_in=len(df)) as record:
+        graph = build_graph(df, features)
+        save_graph(graph, graph_path)
+        record["rows_out"] = graph["edge_index"].shape[1]
+    del graph
+
+    if importlib.util.find_spec("torch") is None:
+        print("⚠️ 未安裝 torch，略過 train 階段")
+    else:
+        from train.engine import run_training
+
+        with profiler.stage("train") as record:
+            result = run_training("graphsage", {
+                "graph_path": graph_path,
+                "split_index_path": os.path.join(processed_dir, "split_index.npz"),
+                "checkpoint_dir": os.path.join(size_dir, "checkpoints"),
+                "epochs": epochs, "seed": seed,
+            })
+            record["epochs"] = len(result["history"])
+
+    # 模擬模型輸出：攻擊流量的分數較高，逐批累加（與評估腳本相同的用法）
+    labels = df['Label_Binary'].to_numpy()
+    rng = np.random.default_rng(seed)
+    with profiler.stage("metrics", rows_in=len(labels)) as record:
+        metrics = StreamingMetrics(2)
+        for start in range(0, len(labels), METRICS_BATCH):
+            y_true = labels[start:start + METRICS_BATCH]
+            scores = np.clip(rng.normal(0.3 + 0.4 * y_true, 0.2), 0, 1)
+            metrics.update(y_true, scores)
+        record["rows_out"] = int(metrics.cm.sum())
+        record["f1"] = metrics.result()["f1"]
+
+    with profiler.stage("figures") as record:
+        record["failed"] = renderer.wait()
+
+    print_stage_stats(profiler.stages)
+    return profiler.stages
+
+
+def best_of(runs):
+    """
+    多次執行的各階段指標取最小值（雜訊只會讓時間變長，最小值最接近真實成本）
+    """
+    stages = dict(runs[0])
+    for run in runs[1:]:
+        for name, stats in run.items():
+            if name not in stages:
+                stages[name] = stats
+                continue
+            stages[name] = {**stages[name], **{
+                metric: min(stages[name][metric], stats[metric]) for metric in COMPARE_METRICS
+                if stages[name].get(metric) is not None and stats.get(metric) is not None}}
+    return stages
+
+
+def run_suite(sizes, work_dir, seed=0, epochs=1, repeat=1):
+    """
+    依序執行各資料量；每次執行都使用新的 spawn 行程（避免前一次殘留的記憶體與快取）
+    repeat > 1 時每個資料量執行多次，各指標取最小值
+    回傳 {資料量: 各階段指標}
+    """
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for size in sizes:
+        runs = []
+        for i in range(repeat):
+            print(f"\n🚀 資料量 {size}（第 {i + 1}/{repeat} 次）")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                runs.append(pool.submit(run_size, size, work_dir, seed, epochs).result())
+        results[size] = best_of(runs)
+    return results
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    """
+    寫入基準值；只更新這次有跑的資料量，其他資料量保留原本的基準
+    """
+    baseline = load_baseline(path) or {"sizes": {}}
+    baseline["machine"] = machine_info()
+    baseline["sizes"].update(results)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+    print(f"✅ 已更新基準值 {path}（{', '.join(results)}）")
+
+
+def compare_to_baseline(baseline, results, tolerance):
+    """
+    各資料量分別與基準比較；回傳所有退步的 (資料量, 階段, 指標, 舊值, 新值)
+    """
+    if baseline["machine"] != machine_info():
+        print(f"⚠️ 基準值來自不同機器：{baseline['machine']}，結果僅供參考")
+    regressions = []
+    for size, stages in results.items():
+        if size not in baseline["sizes"]:
+            print(f"⚠️ 基準值沒有資料量 {size}，略過比較（可加上 --update-baseline 建立）")
+            continue
+        print(f"\n📊 資料量 {size} 與基準比較")
+        regressions += [(size, *item) for item in
+                        compare_stages(baseline["sizes"][size], stages, tolerance)]
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成資料上的端到端效能回歸測試")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES,
+                        help="資料量（如 100k、1m、10m）")
+    parser.add_argument("--work-dir", default="data/benchmarks",
+                        help="合成資料與各資料量輸出的資料夾（合成資料會沿用）")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="視為退步的增加比例（預設 25%%）")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="以這次的結果更新基準值（不做比較）")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="每個資料量執行的次數，各指標取最小值（降低雜訊）")
+    parser.add_argument("--epochs", type=int, default=1, help="train 階段的 epoch 數")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.work_dir, seed=args.seed, epochs=args.epochs,
+                        repeat=args.repeat)
+    mismatched = [size for size, stages in results.items()
+                  if stages.get("stream_check", {}).get("passed") is False]
+    if mismatched:
+        print(f"\n❌ 串流前處理與記憶體內結果不一致：{', '.join(mismatched)}")
+        sys.exit(1)
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        sys.exit(0)
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"⚠️ 找不到基準值 {args.baseline}，請先執行 --update-baseline")
+        sys.exit(1)
+    regressions = compare_to_baseline(baseline, results, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} 項指標超出容許範圍（{args.tolerance:.0%}）")
+        for size, name, metric, before, after in regressions:
+            print(f"  {size} {name} {metric}: {before:.2f} → {after:.2f}")
+        sys.exit(1)
+    print("\n✅ 所有資料量皆在基準容許範圍內")
@@ -0,0 +1,386 @@
+# 合成 CICIDS2017 形狀的原始 CSV（授權資料不能放進 CI，效能回歸測試改用這份資料）
+#
+# - 檔名、欄位與原始檔相同：8 個 *WorkingHours*.pcap_ISCX.csv，欄名前有空白、
+#   「Fwd Header Length」重複出現（讀入後為 Fwd Header Length.1）
+#   - schema="flows"（預設）：GeneratedLabelledFlows 版，含 Flow ID / Source IP / Source Port /
+#     Destination IP / Protocol / Timestamp（建圖需要），共 85 欄
+#   - schema="ml"：MachineLearningCVE 版的 79 欄（Destination Port + 77 個特徵 + Label）
+# - 各檔的筆數與標籤比例依原始資料（整週 2,830,743 筆、15 類）等比例縮放，
+#   稀有類別（Heartbleed、Infiltration、Sql Injection）至少保留 MIN_CLASS_ROWS 筆；
+#   攻擊流量集中在原始資料的攻擊時段，時間為日在前、下午以 12 小時制記錄
+# - 特徵由每個類別固定的分布產生（與 seed 無關，不同筆數的資料分布一致），欄位間的關係與原始資料相同
+#   （如 Flow Bytes/s = 位元組數 / Flow Duration）；Flow Duration 為 0 時自然產生 +Inf / NaN，
+#   另外注入少量 -Inf，清理流程的每個分支都會執行；Web Attack 標籤寫成原始檔的亂碼（U+FFFD）
+# 大量資料以分塊產生與寫出，記憶體用量與總筆數無關。
+#
+# 用法（於專案根目錄執行）：
+# python -m benchmarks.synthetic_data --rows 1m --output-dir data/synthetic/raw
+# python -m benchmarks.synthetic_data --rows 100k --schema ml --output-dir /tmp/cicids_ml
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from utils.cache import code_version
+
+MANIFEST_FILE = "synthetic.json"
+REAL_ROWS = 2_830_743
+MIN_CLASS_ROWS = 10
+CHUNK_ROWS = 200_000
+# 分布參數的固定 seed：不同 --seed / 筆數產生的資料，各類別的特徵分布都相同
+PROFILE_SEED = 2017
+
+FEATURE_COLUMNS = [
+    'Flow Duration', 'Total Fwd Packets', 'Total Backward Packets',
+    'Total Length of Fwd Packets', 'Total Length of Bwd Packets',
+    'Fwd Packet Length Max', 'Fwd Packet Length Min', 'Fwd Packet Length Mean', 'Fwd Packet Length Std',
+    'Bwd Packet Length Max', 'Bwd Packet Length Min', 'Bwd Packet Length Mean', 'Bwd Packet Length Std',
+    'Flow Bytes/s', 'Flow Packets/s', 'Flow IAT Mean', 'Flow IAT Std', 'Flow IAT Max', 'Flow IAT Min',
+    'Fwd IAT Total', 'Fwd IAT Mean', 'Fwd IAT Std', 'Fwd IAT Max', 'Fwd IAT Min',
+    'Bwd IAT Total', 'Bwd IAT Mean', 'Bwd IAT Std', 'Bwd IAT Max', 'Bwd IAT Min',
+    'Fwd PSH Flags', 'Bwd PSH Flags', 'Fwd URG Flags', 'Bwd URG Flags',
+    'Fwd Header Length', 'Bwd Header Length', 'Fwd Packets/s', 'Bwd Packets/s',
+    'Min Packet Length', 'Max Packet Length', 'Packet Length Mean', 'Packet Length Std',
+    'Packet Length Variance', 'FIN Flag Count', 'SYN Flag Count', 'RST Flag Count', 'PSH Flag Count',
+    'ACK Flag Count', 'URG Flag Count', 'CWE Flag Count', 'ECE Flag Count', 'Down/Up Ratio',
+    'Average Packet Size', 'Avg Fwd Segment Size', 'Avg Bwd Segment Size', 'Fwd Header Length',
+    'Fwd Avg Bytes/Bulk', 'Fwd Avg Packets/Bulk', 'Fwd Avg Bulk Rate',
+    'Bwd Avg Bytes/Bulk', 'Bwd Avg Packets/Bulk', 'Bwd Avg Bulk Rate',
+    'Subflow Fwd Packets', 'Subflow Fwd Bytes', 'Subflow Bwd Packets', 'Subflow Bwd Bytes',
+    'Init_Win_bytes_forward', 'Init_Win_bytes_backward', 'act_data_pkt_fwd', 'min_seg_size_forward',
+    'Active Mean', 'Active Std', 'Active Max', 'Active Min', 'Idle Mean', 'Idle Std', 'Idle Max', 'Idle Min',
+]
+SCHEMAS = {
+    "ml": ['Destination Port'] + FEATURE_COLUMNS + ['Label'],
+    "flows": ['Flow ID', 'Source IP', 'Source Port', 'Destination IP', 'Destination Port', 'Protocol',
+              'Timestamp'] + FEATURE_COLUMNS + ['Label'],
+}
+
+WEB = "Web Attack � "
+# (檔名, 日期, 資料時段, {標籤: (原始筆數, 攻擊時段)})
+DAYS = [
+    ("Monday-WorkingHours.pcap_ISCX.csv", "3/7/2017", ("08:55", "17:00"),
+     {"BENIGN": (529_918, None)}),
+    ("Tuesday-WorkingHours.pcap_ISCX.csv", "4/7/2017", ("08:55", "17:00"),
+     {"BENIGN": (432_074, None), "FTP-Patator": (7_938, ("09:20", "10:20")),
+      "SSH-Patator": (5_897, ("14:00", "15:00"))}),
+    ("Wednesday-workingHours.pcap_ISCX.csv", "5/7/2017", ("08:55", "17:00"),
+     {"BENIGN": (440_031, None), "DoS slowloris": (5_796, ("09:47", "10:10")),
+      "DoS Slowhttptest": (5_499, ("10:14", "10:35")), "DoS Hulk": (231_073, ("10:43", "11:00")),
+      "DoS GoldenEye": (10_293, ("11:10", "11:23")), "Heartbleed": (11, ("15:12", "15:32"))}),
+    ("Thursday-WorkingHours-Morning-WebAttacks.pcap_ISCX.csv", "6/7/2017", ("08:55", "12:30"),
+     {"BENIGN": (168_186, None), WEB + "Brute Force": (1_507, ("09:20", "10:00")),
+      WEB + "XSS": (652, ("10:15", "10:35")), WEB + "Sql Injection": (21, ("10:40", "10:42"))}),
+    ("Thursday-WorkingHours-Afternoon-Infilteration.pcap_ISCX.csv", "6/7/2017", ("12:30", "17:00"),
+     {"BENIGN": (288_566, None), "Infiltration": (36, ("14:19", "15:45"))}),
+    ("Friday-WorkingHours-Morning.pcap_ISCX.csv", "7/7/2017", ("08:55", "12:30"),
+     {"BENIGN": (189_067, None), "Bot": (1_966, ("10:02", "11:02"))}),
+    ("Friday-WorkingHours-Afternoon-PortScan.pcap_ISCX.csv", "7/7/2017", ("12:30", "15:00"),
+     {"BENIGN": (127_537, None), "PortScan": (158_930, ("13:55", "14:35"))}),
+    ("Friday-WorkingHours-Afternoon-DDos.pcap_ISCX.csv", "7/7/2017", ("15:00", "17:00"),
+     {"BENIGN": (97_718, None), "DDoS": (128_027, ("15:56", "16:16"))}),
+]
+CLASSES = [label for _, _, _, labels in DAYS for label in labels if label != "BENIGN"]
+CLASSES = ["BENIGN"] + CLASSES
+
+# 端點：內部主機、受害伺服器與攻擊來源（同原始資料的網段）
+INTERNAL_HOSTS = [f"192.168.10.{i}" for i in [3, 5, 8, 9, 12, 14, 15, 16, 17, 19, 25, 50, 51]]
+VICTIM = "192.168.10.50"
+ATTACKER = "172.16.0.1"
+N_EXTERNAL = 2_000
+COMMON_PORTS = np.array([80, 443, 53, 22, 21, 8080, 139, 445, 123, 3389])
+COMMON_PORT_WEIGHTS = np.array([0.30, 0.35, 0.20, 0.02, 0.01, 0.04, 0.02, 0.03, 0.02, 0.01])
+# 各攻擊的目的 Port（None = 隨機，如 PortScan / Infiltration）
+ATTACK_PORTS = {"FTP-Patator": 21, "SSH-Patator": 22, "Heartbleed": 444, "Bot": 8080,
+                "PortScan": None, "Infiltration": None}
+INIT_WIN_CHOICES = np.array([-1, 0, 256, 8192, 29200, 65535])
+# 注入比例（每個分塊至少各一筆）：Flow Duration 為 0（→ +Inf）、0 秒且無 payload（→ NaN）、-Inf
+INF_RATE, NAN_RATE, NEG_INF_RATE = 1e-3, 5e-4, 2e-5
+
+
+def parse_rows(text):
+    """
+    筆數字串轉整數：100k、1m、2.5M、10000
+    """
+    text = str(text).strip().lower().replace("_", "")
+    for suffix, scale in [("k", 1_000), ("m", 1_000_000)]:
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * scale)
+    return int(text)
+
+
+def class_profiles():
+    """
+    各類別特徵分布的參數（固定 seed；攻擊類別與 BENIGN 有明顯但重疊的差異）
+    """
+    rng = np.random.default_rng(PROFILE_SEED)
+    n = len(CLASSES)
+    profile = {
+        "duration_mu": rng.uniform(7, 15, n),        # log(微秒)
+        "fwd_lam": rng.uniform(1, 12, n),
+        "bwd_lam": rng.uniform(0, 10, n),
+        "fwd_len_mu": rng.uniform(2, 6, n),          # log(bytes / packet)
+        "bwd_len_mu": rng.uniform(2, 7, n),
+        "payload_p": rng.uniform(0.5, 1.0, n),
+        "flag_p": rng.uniform(0, 0.6, (n, 6)),       # FIN / SYN / RST / PSH / ACK / URG
+        "active_p": rng.uniform(0, 0.3, n),
+        "win_offset": rng.integers(0, len(INIT_WIN_CHOICES), n),
+    }
+    profile["duration_mu"][0], profile["fwd_lam"][0], profile["payload_p"][0] = 11.0, 4.0, 0.9
+    return profile
+
+
+def allocate_rows(rows, min_class_rows=MIN_CLASS_ROWS):
+    """
+    依原始比例分配各檔、各標籤的筆數；每個攻擊類別至少 min_class_rows 筆（由 BENIGN 扣除）
+    回傳 {檔名: {標籤: 筆數}}
+    """
+    plan = {}
+    for name, _, _, labels in DAYS:
+        counts = {label: int(round(real * rows / REAL_ROWS)) for label, (real, _) in labels.items()}
+        for label in counts:
+            if label != "BENIGN" and counts[label] < min_class_rows:
+                counts["BENIGN"] -= min_class_rows - counts[label]
+                counts[label] = min_class_rows
+        counts["BENIGN"] = max(counts["BENIGN"], 1)
+        plan[name] = counts
+    return plan
+
+
+def _clock(date, hhmm):
+    return pd.Timestamp(pd.to_datetime(date, format="%d/%m/%Y")) + pd.Timedelta(hhmm + ":00")
+
+
+def day_timeline(date, hours, labels, counts, rng):
+    """
+    產生一個檔案的 (標籤 index, Unix 秒數)，依時間排序
+    BENIGN 均勻分布在整個時段，各攻擊集中在其攻擊時段
+    """
+    class_ids, seconds = [], []
+    day_start, day_end = (_clock(date, h).value // 10 ** 9 for h in hours)
+    for label, n in counts.items():
+        window = labels[label][1]
+        start, end = (day_start, day_end) if window is None else (_clock(date, h).value // 10 ** 9 for h in window)
+        class_ids.append(np.full(n, CLASSES.index(label), dtype=np.int64))
+        seconds.append(rng.integers(start, end, n))
+    class_ids, seconds = np.concatenate(class_ids), np.concatenate(seconds)
+    order = np.argsort(seconds, kind="stable")
+    return class_ids[order], seconds[order]
+
+
+def format_timestamps(seconds):
+    """
+    原始檔的時間格式：日/月/年、不補 0、12 小時制且不標示上下午（例如 13:05 記為 1:05:00）
+    只格式化相異的秒數再對應回各列
+    """
+    uniques, codes = np.unique(seconds, return_inverse=True)
+    times = pd.to_datetime(uniques, unit="s")
+    hours = times.hour.to_numpy()
+    hours = np.where(hours > 12, hours - 12, hours)
+    text = [f"{d}/{m}/{y} {h}:{mi:02d}:{s:02d}" for d, m, y, h, mi, s in
+            zip(times.day, times.month, times.year, hours, times.minute, times.second)]
+    return np.array(text, dtype=object)[codes]
+
+
+def _endpoints(class_ids, rng, external):
+    """
+    來源 / 目的 IP 與 Port：BENIGN 多為內部主機連外（熱門主機佔大部分流量），
+    攻擊來自攻擊者（經 NAT 的 172.16.0.1）打向受害伺服器；Bot / Infiltration 為內部主機連出
+    """
+    n = len(class_ids)
+    weights = 1.0 / np.arange(1, len(external) + 1) ** 0.8
+    internal = np.array(INTERNAL_HOSTS, dtype=object)
+    src = internal[rng.integers(0, len(internal), n)]
+    dst = external[rng.choice(len(external), n, p=weights / weights.sum())]
+    dst_port = COMMON_PORTS[rng.choice(len(COMMON_PORTS), n, p=COMMON_PORT_WEIGHTS)]
+    # 約兩成 BENIGN 為內部主機之間的流量
+    lateral = rng.random(n) < 0.2
+    dst = np.where(lateral, internal[rng.integers(0, len(internal), n)], dst)
+
+    for class_id, label in enumerate(CLASSES[1:], start=1):
+        rows = class_ids == class_id
+        count = int(rows.sum())
+        if not count:
+            continue
+        port = ATTACK_PORTS.get(label, 80)
+        if label in ("Bot", "Infiltration"):
+            dst[rows] = "205.174.165.73"
+        else:
+            src[rows] = ATTACKER
+            dst[rows] = "192.168.10.51" if label == "Heartbleed" else VICTIM
+        dst_port[rows] = rng.integers(1, 65_536, count) if port is None else port
+    src_port = rng.integers(32_768, 61_000, n)
+    return src, src_port, dst, dst_port
+
+
+def make_chunk(class_ids, seconds, rng, profile, external, schema="flows"):
+    """
+    產生一個分塊的 DataFrame（欄位順序同 SCHEMAS[schema]，特徵欄與原始檔同型態）
+    """
+    n = len(class_ids)
+    c = class_ids
+
+    def uniform():
+        return rng.random(n)
+
+    def win_choice():
+        return INIT_WIN_CHOICES[(profile["win_offset"][c] + rng.integers(0, 2, n)) % len(INIT_WIN_CHOICES)]
+
+    duration = np.maximum(rng.lognormal(profile["duration_mu"][c], 1.5), 1).astype(np.int64)
+    fwd_pk = 1 + rng.poisson(profile["fwd_lam"][c])
+    bwd_pk = rng.poisson(profile["bwd_lam"][c])
+    has_payload = uniform() < profile["payload_p"][c]
+    fwd_mean = np.where(has_payload, rng.lognormal(profile["fwd_len_mu"][c], 0.8), 0.0)
+    bwd_mean = np.where(has_payload & (bwd_pk > 0), rng.lognormal(profile["bwd_len_mu"][c], 0.8), 0.0)
+
+    # 注入：Flow Duration 為 0 → 速率為 +Inf；同時沒有 payload → 0 / 0 = NaN
+    zero = rng.choice(n, max(1, int(n * INF_RATE)) + max(1, int(n * NAN_RATE)), replace=False)
+    empty = zero[:max(1, int(n * NAN_RATE))]
+    duration[zero] = 0
+    fwd_mean[empty], bwd_mean[empty] = 0.0, 0.0
+
+    total_fwd = np.round(fwd_pk * fwd_mean)
+    total_bwd = np.round(bwd_pk * bwd_mean)
+    packets = fwd_pk + bwd_pk
+    with np.errstate(divide="ignore", invalid="ignore"):
+        flow_bytes = (total_fwd + total_bwd) / duration * 1e6
+        flow_packets = packets / duration * 1e6
+    flow_bytes[rng.choice(n, max(1, int(n * NEG_INF_RATE)), replace=False)] = -np.inf
+
+    def lengths(mean, count):
+        low, high = mean * rng.uniform(0, 1, n), mean * rng.uniform(1, 2.5, n)
+        std = np.where(count > 1, (high - low) / 3, 0.0)
+        return np.round(high), np.round(low), mean, std
+
+    def iats(total, count):
+        gaps = np.maximum(count - 1, 1)
+        mean = np.where(count > 1, total / gaps, 0.0)
+        return total, mean, mean * uniform(), mean * (1 + uniform()), mean * uniform() * 0.5
+
+    fwd_max, fwd_min, _, fwd_std = lengths(fwd_mean, fwd_pk)
+    bwd_max, bwd_min, _, bwd_std = lengths(bwd_mean, bwd_pk)
+    flow_iat = iats(duration.astype(np.float64), packets)
+    fwd_iat = iats(np.where(fwd_pk > 1, np.round(duration * rng.uniform(0.5, 1, n)), 0.0), fwd_pk)
+    bwd_iat = iats(np.where(bwd_pk > 1, np.round(duration * rng.uniform(0.5, 1, n)), 0.0), bwd_pk)
+    header = np.where(uniform() < 0.7, 32, 20)
+    safe_duration = np.maximum(duration, 1) / 1e6
+    packet_mean = (total_fwd + total_bwd) / packets
+    packet_std = np.sqrt((fwd_std ** 2 * fwd_pk + bwd_std ** 2 * bwd_pk) / packets)
+    flags = (rng.random((n, 6)) < profile["flag_p"][c]).astype(np.int64)
+    active = uniform() < profile["active_p"][c]
+    active_mean = np.where(active, rng.lognormal(11, 1.5, n), 0.0)
+    idle_mean = np.where(active, rng.lognormal(16, 1.0, n), 0.0)
+    zeros = np.zeros(n, dtype=np.int64)
+
+    features = [
+        duration, fwd_pk, bwd_pk, total_fwd, total_bwd,
+        fwd_max, fwd_min, fwd_mean, fwd_std, bwd_max, bwd_min, bwd_mean, bwd_std,
+        flow_bytes, flow_packets, *flow_iat[1:], *fwd_iat, *bwd_iat,
+        (uniform() < 0.05).astype(np.int64), zeros, zeros, zeros,
+        fwd_pk * header, bwd_pk * header, fwd_pk / safe_duration, bwd_pk / safe_duration,
+        np.where(bwd_pk > 0, np.minimum(fwd_min, bwd_min), fwd_min), np.maximum(fwd_max, bwd_max),
+        packet_mean, packet_std, packet_std ** 2, *flags.T, zeros, zeros, bwd_pk // fwd_pk,
+        packet_mean, fwd_mean, bwd_mean, fwd_pk * header,
+        zeros, zeros, zeros, zeros, zeros, zeros,
+        fwd_pk, total_fwd, bwd_pk, total_bwd, win_choice(), win_choice(),
+        np.where(fwd_mean > 0, fwd_pk - 1, 0), header,
+        active_mean, active_mean * uniform() * 0.3, active_mean * (1 + uniform()), active_mean * uniform(),
+        idle_mean, idle_mean * uniform() * 0.3, idle_mean * (1 + uniform()), idle_mean * uniform(),
+    ]
+    # 浮點特徵四捨五入到小數 3 位（同原始檔的精度；to_csv 不必逐值套用 float_format）
+    data = {f"f{i}": np.round(values, 3) if values.dtype.kind == "f" else values
+            for i, values in enumerate(features)}
+    labels = np.array(CLASSES, dtype=object)[c]
+
+    src, src_port, dst, dst_port = _endpoints(c, rng, external)
+    if schema == "ml":
+        columns = {"Destination Port": dst_port, **data, "Label": labels}
+    else:
+        protocol = np.where(np.isin(dst_port, [53, 123]), 17, 6)
+        protocol[rng.random(n) < 1e-3] = 0
+        flow_id = (pd.Series(src, dtype=object) + "-" + pd.Series(dst, dtype=object) + "-"
+                   + pd.Series(src_port).astype(str) + "-" + pd.Series(dst_port).astype(str) + "-"
+                   + pd.Series(protocol).astype(str)).to_numpy()
+        columns = {"Flow ID": flow_id, "Source IP": src, "Source Port": src_port,
+                   "Destination IP": dst, "Destination Port": dst_port, "Protocol": protocol,
+                   "Timestamp": format_timestamps(seconds), **data, "Label": labels}
+    return pd.DataFrame(columns)
+
+
+def header_line(schema):
+    """
+    原始檔的標頭：除第一欄外欄名前都有空白（merge 時會去除），Fwd Header Length 出現兩次
+    """
+    columns = SCHEMAS[schema]
+    return ",".join([columns[0]] + [" " + column for column in columns[1:]]) + "\n"
+
+
+def write_dataset(output_dir, rows, seed=0, schema="flows", chunk_rows=CHUNK_ROWS):
+    """
+    寫出 8 個原始 CSV 與 synthetic.json（筆數、seed、各檔各標籤筆數）；回傳 manifest
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    profile = class_profiles()
+    profile_rng = np.random.default_rng(PROFILE_SEED)
+    external = np.array([f"{a}.{b}.{c}.{d}" for a, b, c, d in zip(
+        profile_rng.integers(1, 224, N_EXTERNAL), profile_rng.integers(0, 256, N_EXTERNAL),
+        profile_rng.integers(0, 256, N_EXTERNAL), profile_rng.integers(1, 255, N_EXTERNAL))], dtype=object)
+    plan = allocate_rows(rows)
+    write_options = pa_csv.WriteOptions(include_header=False, quoting_style="none")
+
+    start = time.perf_counter()
+    for name, date, hours, labels in DAYS:
+        class_ids, seconds = day_timeline(date, hours, labels, plan[name], rng)
+        path = os.path.join(output_dir, name)
+        with open(path, "wb") as f:
+            f.write(header_line(schema).encode("utf-8"))
+            for i in range(0, len(class_ids), chunk_rows):
+                chunk = make_chunk(class_ids[i:i + chunk_rows], seconds[i:i + chunk_rows], rng,
+                                   profile, external, schema=schema)
+                # pyarrow 的 CSV writer 比 DataFrame.to_csv 快約 10 倍；欄位值不含逗號，不需引號
+                pa_csv.write_csv(pa.Table.from_pandas(chunk, preserve_index=False), f, write_options)
+        print(f"已寫出 {name}（{len(class_ids):,} 筆）")
+
+    manifest = {"rows": sum(sum(counts.values()) for counts in plan.values()), "requested_rows": rows,
+                "seed": seed, "schema": schema, "generator": code_version(sys.modules[__name__]),
+                "files": plan}
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    print(f"✅ 合成資料 {manifest['rows']:,} 筆 → {output_dir}（{time.perf_counter() - start:.1f} 秒）")
+    return manifest
+
+
+def ensure_dataset(output_dir, rows, seed=0, schema="flows"):
+    """
+    資料夾內已有相同設定（筆數、seed、schema、產生器版本）的合成資料時直接沿用，否則重新產生
+    """
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if (manifest.get("requested_rows"), manifest.get("seed"), manifest.get("schema"),
+                manifest.get("generator")) == (rows, seed, schema, code_version(sys.modules[__name__])):
+            print(f"♻️ 沿用合成資料 {output_dir}（{manifest['rows']:,} 筆）")
+            return manifest
+    return write_dataset(output_dir, rows, seed=seed, schema=schema)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="產生 CICIDS2017 形狀的合成原始 CSV")
+    parser.add_argument("--rows", default="100k", help="總筆數（如 100k、1m、10m）")
+    parser.add_argument("--output-dir", default="data/synthetic/raw")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--schema", choices=list(SCHEMAS), default="flows",
+                        help="flows：GeneratedLabelledFlows 版（含端點與時間，建圖需要）；"
+                             "ml：MachineLearningCVE 版 79 欄")
+    args = parser.parse_args()
+
+    write_dataset(args.output_dir, parse_rows(args.rows), seed=args.seed, schema=args.schema)
@@ -1 +1,613 @@
 # 將原始資料轉成 PyG graph 格式的腳本
+#
+# 節點為端點（IP:Port，或 --node-key host 時只用 IP），邊為兩端點之間的通訊：
+# 1. 以 pd.factorize 將 Source / Destination 端點向量化對應到連續的整數節點 ID（不建 Python dict）
+# 2. 同一對 (src, dst) 的多筆平行流量以排序 + reduceat 分組彙總成一條邊
+#    （邊特徵為各流量特徵的平均，edge_flows 記錄流量數）；aggregate=False 時每筆流量各自為一條邊
+# 3. edge_index 依 (src, dst) 排序（COO），並附 CSR 的 rowptr
+# 4. 節點特徵：出 / 入度、出 / 入流量數（log1p）與相連邊特徵的平均
+# 5. 邊標籤：edge_label（二元，任一流量為攻擊即為 1）、edge_label_multi（多類別，
+#    有攻擊流量時取最多的攻擊類別，否則為 BENIGN 的 Label_enc）
+# 6. --benign-keep < 1 時隨機保留部分 BENIGN 邊（負樣本抽樣）：合併平行流量時以整條邊為單位，
+#    否則以流量為單位；攻擊流量與 --protect-splits 指定集合（預設 val / test）的流量一律保留，
+#    評估仍在完整的分布上進行。被捨棄的流量在 flow_edge 中為 -1；節點 ID 不變（只連到被捨棄邊的節點成為孤立節點）
+#
+# 時間窗模式（--window）：依 Timestamp 產生一連串的快照圖（tumbling 或 --step 指定的 sliding），
+# 節點與邊使用整週共用的全域 ID；每個時間窗由上一個時間窗「加入新進流量、移除過期流量」遞增更新，
+# 不重新建圖。每個時間窗存成一組 .npy（可 mmap），並以 index.json 索引，訓練時可逐窗串流讀取。
+#
+# 輸入需含識別欄（Source IP / Source Port / Destination IP / Destination Port，
+# GeneratedLabelledFlows 版 CSV 才有），通常為 data/processed/preprocessed.parquet。
+#
+# 用法（於專案根目錄執行）：
+# python -m data.make_graph --input data/processed/preprocessed.parquet \
+#     --features data/processed/selected_features.json --output data/processed/graph.npz
+# python -m data.make_graph --features data/processed/selected_features.json --benign-keep 0.2 \
+#     --protect-splits data/processed/split_index.npz
+# python -m data.make_graph --features data/processed/selected_features.json \
+#     --window 1h --step 15min --shard-dir data/processed/windows
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from preprocess.split_shards import SplitShards
+from utils.helpers import LABEL_COLUMNS, META_COLUMNS, add_label_binary, read_table, table_columns
+from utils.profiling import Profiler
+
+ENDPOINT_COLUMNS = {
+    "src_ip": "Source IP",
+    "src_port": "Source Port",
+    "dst_ip": "Destination IP",
+    "dst_port": "Destination Port",
+}
+NODE_KEYS = ["endpoint", "host"]
+WINDOW_INDEX_FILE = "index.json"
+# CICIDS2017 部分檔案的下午時段以 12 小時制記錄且沒有 AM/PM（13:05 寫成 1:05）；
+# 擷取時間為 8 點後的上班時段，早於此時數的時間視為下午
+CICIDS_DAY_START_HOUR = 8
+TIMESTAMP_FORMATS = ["%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M"]
+
+
+def factorize_endpoints(df, node_key="endpoint"):
+    """
+    將來源 / 目的端點對應到連續的節點 ID（兩端共用同一組 ID）
+    回傳 (src, dst, node_ip, node_port, ips)：src / dst 為每筆流量的節點 ID（int64），
+    node_ip 為每個節點的 IP 在 ips（相異 IP 字串）中的位置，node_port 為 Port（host 模式皆為 -1）
+    """
+    # 兩端各自 factorize 後，再合併兩邊（數量很少）的相異 IP，避免串接整欄字串
+    src_codes, src_uniques = pd.factorize(df[ENDPOINT_COLUMNS["src_ip"]])
+    dst_codes, dst_uniques = pd.factorize(df[ENDPOINT_COLUMNS["dst_ip"]])
+    unique_codes, ip_uniques = pd.factorize(np.concatenate(
+        [np.asarray(src_uniques, dtype=object), np.asarray(dst_uniques, dtype=object)]))
+    ip_codes = np.concatenate([unique_codes[:len(src_uniques)][src_codes],
+                               unique_codes[len(src_uniques):][dst_codes]]).astype(np.int64)
+    n = len(df)
+
+    if node_key == "host":
+        keys = ip_codes
+    else:
+        ports = np.concatenate([
+            df[ENDPOINT_COLUMNS["src_port"]].to_numpy(dtype=np.int64),
+            df[ENDPOINT_COLUMNS["dst_port"]].to_numpy(dtype=np.int64)])
+        # Port 介於 0 ~ 65535，以 IP 代碼 * 65536 + Port 組成單一整數鍵
+        keys = (ip_codes << 16) | ports
+
+    node_ids, node_keys = pd.factorize(keys)
+    node_ids = node_ids.astype(np.int64)
+    node_keys = np.asarray(node_keys, dtype=np.int64)
+    if node_key == "host":
+        node_ip, node_port = node_keys, np.full(len(node_keys), -1, dtype=np.int64)
+    else:
+        node_ip, node_port = node_keys >> 16, node_keys & 0xFFFF
+    return node_ids[:n], node_ids[n:], node_ip, node_port, np.asarray(ip_uniques, dtype=str)
+
+
+def _group_by(keys):
+    """
+    依 keys 排序分組，回傳 (排序索引, 各組起點, 各組筆數, 各組的鍵)
+    """
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[starts, len(sorted_keys)])
+    return order, starts, counts, sorted_keys[starts]
+
+
+def node_features(edge_src, edge_dst, edge_flows, edge_attr, n_nodes):
+    """
+    節點特徵：出 / 入度、出 / 入流量數（log1p）與相連邊（出 + 入）特徵的平均
+    另回傳 CSR 的 rowptr（edge_src 需已排序）
+    """
+    out_degree = np.bincount(edge_src, minlength=n_nodes)
+    in_degree = np.bincount(edge_dst, minlength=n_nodes)
+    rowptr = np.concatenate([[0], np.cumsum(out_degree)]).astype(np.int64)
+
+    out_flows = np.bincount(edge_src, weights=edge_flows, minlength=n_nodes)
+    in_flows = np.bincount(edge_dst, weights=edge_flows, minlength=n_nodes)
+    degree = np.maximum(out_degree + in_degree, 1)
+    n_features = edge_attr.shape[1]
+    x = np.empty((n_nodes, 4 + n_features), dtype=np.float32)
+    x[:, 0], x[:, 1] = np.log1p(out_degree), np.log1p(in_degree)
+    x[:, 2], x[:, 3] = np.log1p(out_flows), np.log1p(in_flows)
+    for j in range(n_features):
+        x[:, 4 + j] = (np.bincount(edge_src, weights=edge_attr[:, j], minlength=n_nodes)
+                       + np.bincount(edge_dst, weights=edge_attr[:, j], minlength=n_nodes)) / degree
+    return x, rowptr
+
+
+def node_feature_names(features):
+    return np.array(["log_out_degree", "log_in_degree", "log_out_flows", "log_in_flows"]
+                    + [f"mean_{col}" for col in features], dtype=str)
+
+
+def _multi_class_labels(edge_of_flow, label_enc, label_binary, n_edges):
+    """
+    每條邊的多類別標籤：有攻擊流量時取流量數最多的攻擊類別，否則取最多的類別
+    """
+    # Label_enc 可能為 -1（transform 時未見過的類別），平移 1 後再組合鍵
+    shifted = label_enc + 1
+    n_classes = int(shifted.max()) + 1
+    pairs, pair_counts = np.unique(edge_of_flow * n_classes + shifted, return_counts=True)
+    pair_edge, pair_label = pairs // n_classes, pairs % n_classes
+
+    is_attack = np.zeros(n_classes, dtype=bool)
+    is_attack[shifted[label_binary == 1]] = True
+    order = np.lexsort((-pair_counts, ~is_attack[pair_label], pair_edge))
+    first = np.flatnonzero(np.r_[True, pair_edge[order][1:] != pair_edge[order][:-1]])
+    labels = np.empty(n_edges, dtype=np.int64)
+    labels[pair_edge[order][first]] = pair_label[order][first] - 1
+    return labels
+
+
+def protected_flows(split_index_path, n_rows, splits=("val", "test")):
+    """
+    指定集合的流量遮罩（長度 n_rows 的 bool 陣列），負樣本抽樣時這些流量一律保留
+    split_index_path：split_index.npz，或切分 shard 的資料夾（見 preprocess/split_shards.py）
+    """
+    mask = np.zeros(n_rows, dtype=bool)
+    if os.path.isdir(split_index_path):
+        shards = SplitShards(split_index_path)
+        for name in splits:
+            mask[shards.row_positions(name)] = True
+    else:
+        with np.load(split_index_path) as index:
+            for name in splits:
+                mask[index[name]] = True
+    return mask
+
+
+def _benign_keep_mask(sorted_binary, sorted_protected, starts, counts, benign_keep, per_edge, seed):
+    """
+    負樣本抽樣：依 (src, dst) 排序後的流量是否保留（bool 陣列）
+    per_edge=True 時以整條邊為單位（邊上全為 BENIGN 且沒有受保護的流量才可能被捨棄），否則以流量為單位
+    """
+    rng = np.random.default_rng(seed)
+    droppable = (sorted_binary == 0) & ~sorted_protected
+    if per_edge:
+        droppable_edge = np.minimum.reduceat(droppable, starts)
+        drop_edge = droppable_edge & (rng.random(len(starts)) >= benign_keep)
+        return ~np.repeat(drop_edge, counts)
+    return ~(droppable & (rng.random(len(sorted_binary)) >= benign_keep))
+
+
+def build_graph(df, features, node_key="endpoint", aggregate=True, benign_keep=1.0, protected=None,
+                seed=0):
+    """
+    由流量 DataFrame 建立圖
+    參數:
+        df: DataFrame, 需含端點欄位、features 與 Label_Binary / Label_enc
+        features: list, 作為邊特徵的欄位
+        node_key: "endpoint"（IP:Port 為節點）或 "host"（IP 為節點）
+        aggregate: bool, True 時同一對 (src, dst) 的流量合併為一條邊
+        benign_keep: float, BENIGN 邊（aggregate=False 時為流量）保留的比例，1.0 為不抽樣
+        protected: 與 df 等長的 bool 陣列（例如 protected_flows 的結果），這些流量一律保留
+        seed: 負樣本抽樣的亂數種子
+    回傳:
+        dict of numpy arrays：
+        x (節點特徵), edge_index (2, E), rowptr (CSR), edge_attr, edge_label, edge_label_multi,
+        edge_flows (每條邊的流量數), flow_edge (每筆流量所屬的邊 ID，與 df 列順序相同；被捨棄的流量為 -1),
+        node_ip（ips 中的位置）, node_port, ips, 以及 feature_names / node_feature_names
+    """
+    if node_key not in NODE_KEYS:
+        raise ValueError(f"node_key 必須是 {NODE_KEYS} 之一")
+    if not 0.0 < benign_keep <= 1.0:
+        raise ValueError("benign_keep 必須介於 0（不含）與 1 之間")
+    src, dst, node_ip, node_port, ips = factorize_endpoints(df, node_key=node_key)
+    n_nodes = len(node_ip)
+    label_binary = df['Label_Binary'].to_numpy(dtype=np.int64)
+    label_enc = df['Label_enc'].to_numpy(dtype=np.int64)
+
+    # 依 (src, dst) 排序：排序後的順序即為 COO / CSR 的邊順序
+    order, starts, edge_flows, edge_keys = _group_by(src * n_nodes + dst)
+    del src, dst
+    if benign_keep < 1.0:
+        # 只在排序索引上移除被捨棄的流量，再重算各邊的起點與流量數（不複製 df）
+        sorted_protected = (np.zeros(len(order), dtype=bool) if protected is None
+                            else np.asarray(protected, dtype=bool)[order])
+        kept = _benign_keep_mask(label_binary[order], sorted_protected, starts, edge_flows,
+                                 benign_keep, aggregate, seed)
+        order = order[kept]
+        kept_flows = np.add.reduceat(kept.astype(np.int64), starts)
+        edge_keys, edge_flows = edge_keys[kept_flows > 0], kept_flows[kept_flows > 0]
+        starts = np.cumsum(edge_flows) - edge_flows
+    n_kept = len(order)
+    flow_attr = np.empty((n_kept, len(features)), dtype=np.float32)
+    for j, col in enumerate(features):
+        flow_attr[:, j] = df[col].to_numpy(dtype=np.float32)[order]
+    flow_edge = np.full(len(df), -1, dtype=np.int64)
+
+    if aggregate:
+        edge_src, edge_dst = edge_keys // n_nodes, edge_keys % n_nodes
+        edge_attr = np.add.reduceat(flow_attr, starts, axis=0, dtype=np.float64)
+        edge_attr = (edge_attr / edge_flows[:, None]).astype(np.float32)
+        flow_edge[order] = np.repeat(np.arange(len(starts)), edge_flows)
+        edge_label = np.maximum.reduceat(label_binary[order], starts)
+        edge_label_multi = _multi_class_labels(flow_edge[order], label_enc[order],
+                                               label_binary[order], len(starts))
+    else:
+        sorted_key = np.repeat(edge_keys, edge_flows)
+        edge_flows = np.ones(n_kept, dtype=np.int64)
+        edge_src, edge_dst = sorted_key // n_nodes, sorted_key % n_nodes
+        edge_attr = flow_attr
+        flow_edge[order] = np.arange(n_kept)
+        edge_label = label_binary[order]
+        edge_label_multi = label_enc[order]
+
+    x, rowptr = node_features(edge_src, edge_dst, edge_flows, edge_attr, n_nodes)
+
+    return {
+        "x": x,
+        "edge_index": np.vstack([edge_src, edge_dst]).astype(np.int64),
+        "rowptr": rowptr,
+        "edge_attr": edge_attr,
+        "edge_label": edge_label.astype(np.int64),
+        "edge_label_multi": edge_label_multi.astype(np.int64),
+        "edge_flows": edge_flows.astype(np.int64),
+        "flow_edge": flow_edge,
+        "node_ip": node_ip,
+        "node_port": node_port,
+        "ips": ips,
+        "feature_names": np.array(features, dtype=str),
+        "node_feature_names": node_feature_names(features),
+    }
+
+
+def print_graph_summary(graph):
+    n_nodes, n_edges = len(graph["x"]), graph["edge_index"].shape[1]
+    n_attack = int(graph["edge_label"].sum())
+    print(f"節點 {n_nodes}、邊 {n_edges}（攻擊邊 {n_attack}，{n_attack / max(n_edges, 1):.2%}）、"
+          f"流量 {int(graph['edge_flows'].sum())}，節點特徵 {graph['x'].shape[1]} 維、"
+          f"邊特徵 {graph['edge_attr'].shape[1]} 維")
+
+
+def save_graph(graph, output_path):
+    """
+    以未壓縮的 .npz 儲存（讀取時可直接對應成 numpy 陣列）
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    np.savez(output_path, **graph)
+    print(f"✅ 圖已儲存到 {output_path}")
+
+
+def load_graph(path):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def to_pyg(graph):
+    """
+    轉成 torch_geometric.data.Data（需安裝 torch 與 torch-geometric）
+    """
+    import torch
+    from torch_geometric.data import Data
+
+    return Data(
+        x=torch.from_numpy(graph["x"]),
+        edge_index=torch.from_numpy(graph["edge_index"]),
+        edge_attr=torch.from_numpy(graph["edge_attr"]),
+        edge_label=torch.from_numpy(graph["edge_label"]),
+        edge_label_multi=torch.from_numpy(graph["edge_label_multi"]),
+        edge_flows=torch.from_numpy(graph["edge_flows"]),
+    )
+
+
+def parse_timestamps(values, fix_12h=True):
+    """
+    將 Timestamp 欄轉成 Unix 秒數（int64）
+    CICIDS2017 的時間為日在前（dd/mm/yyyy）；只解析相異的字串（同一秒的流量很多），再對應回各列。
+    fix_12h=True 時，早於 CICIDS_DAY_START_HOUR 的時間視為下午（+12 小時）
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = values.reset_index(drop=True)
+        codes = np.arange(len(values))
+    else:
+        codes, uniques = pd.factorize(values.astype(str))
+        uniques = pd.Series(uniques)
+        parsed = pd.Series(pd.NaT, index=uniques.index, dtype="datetime64[ns]")
+        for fmt in TIMESTAMP_FORMATS:
+            missing = parsed.isna()
+            if not missing.any():
+                break
+            parsed[missing] = pd.to_datetime(uniques[missing], format=fmt, errors="coerce")
+        missing = parsed.isna()
+        if missing.any():
+            parsed[missing] = pd.to_datetime(uniques[missing], format="mixed", dayfirst=True)
+
+    if fix_12h:
+        parsed = parsed.where(parsed.dt.hour >= CICIDS_DAY_START_HOUR,
+                              parsed + pd.Timedelta(hours=12))
+    seconds = parsed.to_numpy(dtype="datetime64[s]").astype(np.int64)
+    return seconds[codes]
+
+
+def to_seconds(duration):
+    """
+    時間長度（如 "1h"、"15min"、秒數）轉成秒數
+    """
+    if isinstance(duration, (int, float, np.integer, np.floating)):
+        return int(duration)
+    return int(pd.Timedelta(duration).total_seconds())
+
+
+def window_starts(t_min, t_max, window_seconds, step_seconds):
+    """
+    各時間窗的起點（對齊 step 的整數倍）；時間窗為 [start, start + window)
+    """
+    first = (t_min // step_seconds) * step_seconds
+    return np.arange(first, t_max + 1, step_seconds, dtype=np.int64)
+
+
+def assign_windows(timestamps, window_seconds):
+    """
+    tumbling 時間窗編號（對齊 Unix 時間的整數倍，window = 1 天時即為日期）
+    """
+    return timestamps // window_seconds
+
+
+class _WindowState:
+    """
+    時間窗內各條全域邊的累計量：流量數、特徵總和、各類別流量數
+    加入 / 移除一段連續的流量（已依時間排序）時只更新受影響的邊
+    """
+
+    def __init__(self, n_edges, n_features, n_classes):
+        self.flows = np.zeros(n_edges, dtype=np.int64)
+        self.sums = np.zeros((n_edges, n_features), dtype=np.float64)
+        self.classes = np.zeros((n_edges, n_classes), dtype=np.int32)
+
+    def update(self, edges, attrs, classes, sign):
+        if len(edges) == 0:
+            return
+        order, starts, counts, keys = _group_by(edges)
+        self.flows[keys] += sign * counts
+        self.sums[keys] += sign * np.add.reduceat(attrs[order], starts, axis=0, dtype=np.float64)
+        n_classes = self.classes.shape[1]
+        pairs, pair_counts = np.unique(edges * n_classes + classes, return_counts=True)
+        self.classes[pairs // n_classes, pairs % n_classes] += sign * pair_counts.astype(np.int32)
+        if sign < 0:
+            # 完全移出時間窗的邊歸零，避免加減累積浮點誤差
+            self.sums[keys[self.flows[keys] == 0]] = 0.0
+
+
+def _window_graph(state, edge_src, edge_dst, is_attack):
+    """
+    由目前時間窗的累計量產生快照圖；節點重新編號為窗內的區域 ID（node_ids 對應回全域 ID）
+    """
+    active = np.flatnonzero(state.flows)
+    edge_flows = state.flows[active]
+    edge_attr = (state.sums[active] / edge_flows[:, None]).astype(np.float32)
+    class_counts = state.classes[active]
+    attack_counts = np.where(is_attack[None, :], class_counts, -1)
+    edge_label = (attack_counts.max(axis=1) > 0).astype(np.int64)
+    edge_label_multi = np.where(edge_label == 1, attack_counts.argmax(axis=1),
+                                class_counts.argmax(axis=1)) - 1
+
+    # 全域邊 ID 依 (src, dst) 排序，np.unique 的區域 ID 保留順序，窗內的邊仍為 CSR 排序
+    node_ids, local = np.unique(np.concatenate([edge_src[active], edge_dst[active]]),
+                                return_inverse=True)
+    local_src, local_dst = local[:len(active)], local[len(active):]
+    x, rowptr = node_features(local_src, local_dst, edge_flows, edge_attr, len(node_ids))
+    return {
+        "x": x,
+        "edge_index": np.vstack([local_src, local_dst]).astype(np.int64),
+        "rowptr": rowptr,
+        "edge_attr": edge_attr,
+        "edge_label": edge_label,
+        "edge_label_multi": edge_label_multi.astype(np.int64),
+        "edge_flows": edge_flows,
+        "edge_ids": active.astype(np.int64),
+        "node_ids": node_ids.astype(np.int64),
+    }
+
+
+def build_window_graphs(df, features, output_dir, window="1h", step=None,
+                        node_key="endpoint", fix_12h=True):
+    """
+    依 Timestamp 產生時間窗快照圖，逐窗寫成 .npy shard（可 mmap）並建立 index.json
+    參數:
+        df: DataFrame, 需含端點欄位、Timestamp、features 與 Label_Binary / Label_enc
+        window: 時間窗長度（如 "1h"）
+        step: 時間窗間隔；None 為 tumbling（= window），小於 window 時為 sliding
+    每個時間窗由上一個時間窗遞增更新：只加入新進入的流量、移除已過期的流量。
+    額外記憶體約為 全域邊數 × (特徵數 × 8 + 類別數 × 4) bytes。
+    回傳 index（dict）
+    """
+    window_seconds = to_seconds(window)
+    step_seconds = to_seconds(step) if step is not None else window_seconds
+    if not 0 < step_seconds <= window_seconds:
+        raise ValueError("step 必須大於 0 且不超過 window")
+
+    timestamps = parse_timestamps(df['Timestamp'], fix_12h=fix_12h)
+    src, dst, node_ip, node_port, ips = factorize_endpoints(df, node_key=node_key)
+    n_nodes = len(node_ip)
+
+    # 全域邊 ID：整段期間同一對 (src, dst) 共用一個 ID，依 (src, dst) 排序
+    edge_keys, flow_edge = np.unique(src * n_nodes + dst, return_inverse=True)
+    edge_src, edge_dst = edge_keys // n_nodes, edge_keys % n_nodes
+    del src, dst
+
+    # 流量依時間排序：每個時間窗對應到一段連續區間，加入 / 過期的流量也都是連續區間
+    order = np.argsort(timestamps, kind='stable')
+    t_sorted = timestamps[order]
+    e_sorted = flow_edge.reshape(-1)[order]
+    attr_sorted = df[features].to_numpy(dtype=np.float32)[order]
+    # Label_enc 可能為 -1（transform 時未見過的類別），平移 1 後作為類別欄位
+    class_sorted = df['Label_enc'].to_numpy(dtype=np.int64)[order] + 1
+    binary_sorted = df['Label_Binary'].to_numpy(dtype=np.int64)[order]
+    n_classes = int(class_sorted.max()) + 1
+    is_attack = np.zeros(n_classes, dtype=bool)
+    is_attack[class_sorted[binary_sorted == 1]] = True
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, "node_ip.npy"), node_ip)
+    np.save(os.path.join(output_dir, "node_port.npy"), node_port)
+    np.save(os.path.join(output_dir, "ips.npy"), ips)
+    np.save(os.path.join(output_dir, "edge_index.npy"), np.vstack([edge_src, edge_dst]))
+
+    state = _WindowState(len(edge_keys), len(features), n_classes)
+    windows = []
+    prev_lo = prev_hi = 0
+    for start in window_starts(t_sorted[0], t_sorted[-1], window_seconds, step_seconds):
+        lo = int(np.searchsorted(t_sorted, start, side='left'))
+        hi = int(np.searchsorted(t_sorted, start + window_seconds, side='left'))
+        expired = slice(prev_lo, min(lo, prev_hi))
+        added = slice(max(prev_hi, lo), hi)
+        state.update(e_sorted[expired], attr_sorted[expired], class_sorted[expired], -1)
+        state.update(e_sorted[added], attr_sorted[added], class_sorted[added], +1)
+        prev_lo, prev_hi = lo, hi
+        if hi == lo:
+            continue
+
+        graph = _window_graph(state, edge_src, edge_dst, is_attack)
+        shard = f"window_{len(windows):05d}"
+        os.makedirs(os.path.join(output_dir, shard), exist_ok=True)
+        for key, value in graph.items():
+            np.save(os.path.join(output_dir, shard, f"{key}.npy"), value)
+        windows.append({
+            "id": len(windows),
+            "dir": shard,
+            "start": int(start),
+            "end": int(start + window_seconds),
+            "start_time": str(np.datetime64(int(start), "s")),
+            "n_flows": hi - lo,
+            "n_nodes": len(graph["node_ids"]),
+            "n_edges": len(graph["edge_ids"]),
+            "n_attack_edges": int(graph["edge_label"].sum()),
+        })
+
+    index = {
+        "window_seconds": window_seconds,
+        "step_seconds": step_seconds,
+        "node_key": node_key,
+        "features": list(features),
+        "node_feature_names": node_feature_names(features).tolist(),
+        "n_nodes": n_nodes,
+        "n_edges": len(edge_keys),
+        "n_flows": len(df),
+        "windows": windows,
+    }
+    with open(os.path.join(output_dir, WINDOW_INDEX_FILE), "w") as f:
+        json.dump(index, f, indent=2)
+    print(f"✅ 已產生 {len(windows)} 個時間窗（窗長 {window_seconds} 秒、間隔 {step_seconds} 秒）→ {output_dir}")
+    return index
+
+
+def load_window_index(shard_dir):
+    with open(os.path.join(shard_dir, WINDOW_INDEX_FILE), "r") as f:
+        return json.load(f)
+
+
+def load_window(shard_dir, window, mmap=True):
+    """
+    讀取單一時間窗；window 為 index 中的項目或編號，mmap=True 時以 memmap 開啟（不載入記憶體）
+    """
+    if not isinstance(window, dict):
+        window = load_window_index(shard_dir)["windows"][window]
+    window_dir = os.path.join(shard_dir, window["dir"])
+    mmap_mode = "r" if mmap else None
+    return {name[:-len(".npy")]: np.load(os.path.join(window_dir, name), mmap_mode=mmap_mode)
+            for name in sorted(os.listdir(window_dir)) if name.endswith(".npy")}
+
+
+def iter_windows(shard_dir, mmap=True):
+    """
+    依時間順序逐窗讀取：yield (index 項目, 圖)
+    """
+    for window in load_window_index(shard_dir)["windows"]:
+        yield window, load_window(shard_dir, window, mmap=mmap)
+
+
+def load_graph_frame(input_path, features=None, extra_columns=()):
+    """
+    讀取前處理後的資料表中建圖需要的欄位（端點、特徵、標籤與 extra_columns）
+    features: 邊特徵欄位；None 時使用標籤與識別欄以外的全部欄位（preprocessed 中皆為數值特徵）
+    回傳 (DataFrame, features)
+    """
+    columns = table_columns(input_path)
+    missing = [col for col in list(ENDPOINT_COLUMNS.values()) + list(extra_columns)
+               if col not in columns]
+    if missing:
+        raise ValueError(f"{input_path} 缺少欄位 {missing}"
+                         "（需使用含 IP / Port / Timestamp 的 GeneratedLabelledFlows 版 CSV）")
+    if features is None:
+        features = [col for col in columns if col not in LABEL_COLUMNS + META_COLUMNS]
+    needed = list(ENDPOINT_COLUMNS.values()) + list(extra_columns) + list(features)
+    if 'Label_Binary' not in columns:
+        df = add_label_binary(read_table(input_path, columns=needed + ['Label', 'Label_enc']))
+    else:
+        df = read_table(input_path, columns=needed + ['Label_enc', 'Label_Binary'])
+    return df, list(features)
+
+
+def graph_from_table(input_path, features=None, node_key="endpoint", aggregate=True,
+                     benign_keep=1.0, split_index_path=None):
+    """
+    讀取前處理後的資料表（只讀需要的欄位）並建圖
+    split_index_path：負樣本抽樣時，其中 val / test 的流量一律保留
+    """
+    df, features = load_graph_frame(input_path, features)
+    protected = (protected_flows(split_index_path, len(df))
+                 if split_index_path and benign_keep < 1.0 else None)
+    return build_graph(df, features, node_key=node_key, aggregate=aggregate,
+                       benign_keep=benign_keep, protected=protected)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="將流量資料轉成圖（節點為端點、邊為通訊）")
+    parser.add_argument("--input", default="data/processed/preprocessed.parquet")
+    parser.add_argument("--features", default=None,
+                        help="選定特徵 JSON（預設使用全部數值特徵）")
+    parser.add_argument("--output", default="data/processed/graph.npz")
+    parser.add_argument("--node-key", choices=NODE_KEYS, default="endpoint")
+    parser.add_argument("--no-aggregate", action="store_true",
+                        help="不合併平行流量，每筆流量各自為一條邊")
+    parser.add_argument("--benign-keep", type=float, default=1.0,
+                        help="BENIGN 邊保留的比例（負樣本抽樣，1.0 為不抽樣；不適用於 --window）")
+    parser.add_argument("--protect-splits", default="data/processed/split_index.npz",
+                        help="split_index.npz 或切分 shard 資料夾：其中 val / test 的流量不被抽樣捨棄"
+                             "（檔案不存在時不保護）")
+    parser.add_argument("--seed", type=int, default=0, help="負樣本抽樣的亂數種子")
+    parser.add_argument("--window", default=None,
+                        help="時間窗長度（如 1h、15min）；指定時改為產生時間窗快照圖")
+    parser.add_argument("--step", default=None,
+                        help="時間窗間隔（預設等於 --window，即 tumbling；較小時為 sliding）")
+    parser.add_argument("--shard-dir", default="data/processed/windows",
+                        help="時間窗快照圖的輸出資料夾")
+    parser.add_argument("--trace", default=None,
+                        help="各階段量測的 trace 檔（JSON Lines，見 utils/profiling.py）")
+    parser.add_argument("--profile", action="store_true", help="以 cProfile 找出建圖的熱點")
+    parser.add_argument("--profile-dir", default="data/profiles/graph")
+    args = parser.parse_args()
+
+    features = None
+    if args.features:
+        with open(args.features, "r") as f:
+            features = json.load(f)
+
+    profiler = Profiler(trace_path=args.trace, context={"input": args.input},
+                        cprofile=args.profile, profile_dir=args.profile_dir)
+    extra_columns = ['Timestamp'] if args.window else ()
+    with profiler.stage("graph_load") as record:
+        df, features = load_graph_frame(args.input, features, extra_columns=extra_columns)
+        record["rows_out"] = len(df)
+    with profiler.stage("graph_build", rows_in=len(df)) as record:
+        if args.window:
+            index = build_window_graphs(df, features, args.shard_dir, window=args.window,
+                                        step=args.step, node_key=args.node_key)
+            record["rows_out"], record["windows"] = index["n_edges"], len(index["windows"])
+        else:
+            protected = None
+            if args.benign_keep < 1.0 and os.path.exists(args.protect_splits):
+                protected = protected_flows(args.protect_splits, len(df))
+            elif args.benign_keep < 1.0:
+                print(f"⚠️ 找不到 {args.protect_splits}，負樣本抽樣也會捨棄 val / test 的 BENIGN 流量")
+            graph = build_graph(df, features, node_key=args.node_key, aggregate=not args.no_aggregate,
+                                benign_keep=args.benign_keep, protected=protected, seed=args.seed)
+            print_graph_summary(graph)
+            record["rows_out"] = graph["edge_index"].shape[1]
+            save_graph(graph, args.output)
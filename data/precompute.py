@@ -0,0 +1,197 @@
+# SGC / SIGN 的預先傳播特徵：一次算出 Â^k X（k = 0..K）並存成可 memmap 的 .npy
+#
+# Â 為加上自環、對稱正規化的無向鄰接矩陣 D^-1/2 (A + I) D^-1/2（與 GCN 相同），X 為 make_graph 的節點特徵。
+# 每一跳的稀疏矩陣乘法依非零元素數平均切成多個列區塊，在 thread pool 中平行計算
+# （scipy 的稀疏矩陣乘法在 C++ 中執行時會釋放 GIL），各區塊直接寫入輸出 memmap 的對應列。
+#
+# 結果快取在 <cache_dir>/propagated/<鍵>/：
+#   index.json       跳數、矩陣形狀、來源圖與特徵清單、耗時
+#   hop_0.npy ...    float32 (節點數, 特徵數)，hop_0 即 X
+# 鍵由圖檔內容 hash、selected_features.json 內容 hash、跳數與本模組的程式碼版本組成；
+# 圖或特徵清單改變時自動重算，相同的圖在多個試驗 / 模型間共用。
+#
+# 用法（於專案根目錄執行；訓練 sgc / sign 模型時會自動呼叫，見 train/engine.py）：
+# python -m data.precompute --graph data/processed/graph.npz \
+#     --features data/processed/selected_features.json --hops 3 --workers 4
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from data.make_graph import load_graph
+from utils.cache import StageCache, code_version
+from utils.profiling import Profiler
+
+PRECOMPUTE_DIR = "propagated"
+PRECOMPUTE_INDEX_FILE = "index.json"
+FEATURE_DTYPE = np.float32
+# 每個 worker 分到的列區塊數（區塊較多時，度數極不平均的節點較不會拖慢單一 worker）
+BLOCKS_PER_WORKER = 4
+
+
+def normalized_adjacency(edge_index, n_nodes, self_loops=True):
+    """
+    對稱正規化的無向鄰接矩陣 D^-1/2 (A + I) D^-1/2（CSR，float32）
+    有向邊視為無向；兩端點之間不論有幾條邊（兩個方向）權重皆為 1
+    """
+    src, dst = edge_index
+    rows = np.concatenate([src, dst])
+    cols = np.concatenate([dst, src])
+    if self_loops:
+        loops = np.arange(n_nodes, dtype=rows.dtype)
+        rows, cols = np.concatenate([rows, loops]), np.concatenate([cols, loops])
+    adj = sp.csr_matrix((np.ones(len(rows), dtype=FEATURE_DTYPE), (rows, cols)),
+                        shape=(n_nodes, n_nodes))
+    adj.sum_duplicates()
+    adj.data[:] = 1
+
+    degree = np.diff(adj.indptr).astype(np.float64)
+    inv_sqrt = np.zeros(n_nodes, dtype=np.float64)
+    inv_sqrt[degree > 0] = degree[degree > 0] ** -0.5
+    # 每個非零元素 (i, j) 乘上 d_i^-1/2 · d_j^-1/2
+    row_of = np.repeat(np.arange(n_nodes), np.diff(adj.indptr))
+    adj.data = (inv_sqrt[row_of] * inv_sqrt[adj.indices]).astype(FEATURE_DTYPE)
+    return adj
+
+
+def row_blocks(indptr, n_blocks):
+    """
+    依非零元素數將列切成 n_blocks 段（每段的乘法工作量相近），回傳 [(起始列, 結束列), ...]
+    """
+    n_rows = len(indptr) - 1
+    targets = np.linspace(0, indptr[-1], n_blocks + 1)
+    bounds = np.unique(np.r_[0, np.searchsorted(indptr, targets[1:-1]), n_rows])
+    return [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def propagate(adj, x, hops, output_dir, workers=None):
+    """
+    依序計算 Â^k X（k = 1..hops），每一跳的列區塊在 thread pool 中平行計算，
+    直接寫入 output_dir/hop_<k>.npy（memmap，不在記憶體中保留所有跳的結果）
+    """
+    workers = workers or os.cpu_count() or 1
+    blocks = row_blocks(adj.indptr, workers * BLOCKS_PER_WORKER)
+    block_adj = [adj[lo:hi] for lo, hi in blocks]
+
+    previous = np.lib.format.open_memmap(
+        os.path.join(output_dir, "hop_0.npy"), mode="w+", dtype=FEATURE_DTYPE, shape=x.shape)
+    previous[:] = x
+
+    def multiply(i):
+        lo, hi = blocks[i]
+        current[lo:hi] = block_adj[i] @ source
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for k in range(1, hops + 1):
+            start = time.perf_counter()
+            source = np.asarray(previous)
+            current = np.lib.format.open_memmap(
+                os.path.join(output_dir, f"hop_{k}.npy"), mode="w+", dtype=FEATURE_DTYPE,
+                shape=x.shape)
+            list(pool.map(multiply, range(len(blocks))))
+            current.flush()
+            previous = current
+            print(f"  hop {k}：{time.perf_counter() - start:.2f} 秒（{len(blocks)} 個列區塊、{workers} 個執行緒）")
+
+
+def precompute_key(graph_path, features_path, hops, cache_dir):
+    """
+    快取鍵：圖檔與特徵清單的內容 hash、跳數、程式碼版本
+    """
+    cache = StageCache(cache_dir)
+    inputs = [cache.file_digest(graph_path)]
+    if features_path and os.path.exists(features_path):
+        inputs.append(cache.file_digest(features_path))
+    return cache.key("precompute", inputs, params={"hops": hops, "self_loops": True},
+                     code=code_version(sys.modules[__name__]))
+
+
+def precompute_features(graph_path, features_path=None, hops=2, cache_dir="data/processed/precompute",
+                        workers=None, graph=None):
+    """
+    取得（必要時計算）圖的預先傳播特徵，回傳 PropagatedFeatures
+    graph: 已載入的圖（省去重讀；鍵仍以 graph_path 的內容計算）
+    """
+    key = precompute_key(graph_path, features_path, hops, cache_dir)
+    output_dir = os.path.join(cache_dir, PRECOMPUTE_DIR, key[:16])
+    if os.path.exists(os.path.join(output_dir, PRECOMPUTE_INDEX_FILE)):
+        print(f"♻️ 預先傳播特徵已快取：{output_dir}")
+        return PropagatedFeatures(output_dir)
+
+    start = time.perf_counter()
+    graph = graph if graph is not None else load_graph(graph_path)
+    x = graph["x"]
+    print(f"🚀 預先傳播 {hops} 跳（節點 {len(x)}、特徵 {x.shape[1]} 維）...")
+    adj = normalized_adjacency(graph["edge_index"], len(x))
+
+    # 寫到暫存資料夾，完成後才換名（中途失敗不會留下不完整的快取）
+    tmp_dir = f"{output_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    propagate(adj, x, hops, tmp_dir, workers=workers)
+    index = {
+        "key": key, "hops": hops, "n_nodes": int(x.shape[0]), "n_features": int(x.shape[1]),
+        "feature_dtype": np.dtype(FEATURE_DTYPE).name, "nnz": int(adj.nnz),
+        "graph_path": os.path.abspath(graph_path),
+        "features_path": os.path.abspath(features_path) if features_path else None,
+        "node_feature_names": [str(name) for name in graph["node_feature_names"]],
+        "elapsed_seconds": round(time.perf_counter() - start, 2),
+    }
+    with open(os.path.join(tmp_dir, PRECOMPUTE_INDEX_FILE), "w") as f:
+        json.dump(index, f, indent=2)
+    try:
+        os.replace(tmp_dir, output_dir)
+    except OSError:
+        # 另一個行程已先寫好相同鍵的結果
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"✅ 預先傳播特徵已儲存到 {output_dir}（{index['elapsed_seconds']} 秒）")
+    return PropagatedFeatures(output_dir)
+
+
+class PropagatedFeatures:
+    """
+    預先傳播特徵的讀取介面（唯讀 memmap）
+    gather(nodes) 回傳 (len(nodes), 跳數 + 1, 特徵數) 的 float32 陣列；nodes 已排序時讀取的頁面較集中
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        with open(os.path.join(output_dir, PRECOMPUTE_INDEX_FILE), "r") as f:
+            self.index = json.load(f)
+        self.hops = self.index["hops"]
+        self.n_features = self.index["n_features"]
+        self.arrays = [np.load(os.path.join(output_dir, f"hop_{k}.npy"), mmap_mode="r")
+                       for k in range(self.hops + 1)]
+
+    def gather(self, nodes):
+        out = np.empty((len(nodes), self.hops + 1, self.n_features), dtype=FEATURE_DTYPE)
+        for k, array in enumerate(self.arrays):
+            out[:, k] = array[nodes]
+        return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="預先計算 SGC / SIGN 的多跳傳播特徵")
+    parser.add_argument("--graph", default="data/processed/graph.npz")
+    parser.add_argument("--features", default="data/processed/selected_features.json",
+                        help="選定特徵 JSON（納入快取鍵）")
+    parser.add_argument("--hops", type=int, default=2)
+    parser.add_argument("--cache-dir", default="data/processed/precompute")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="稀疏矩陣乘法的執行緒數（預設 CPU 核心數）")
+    parser.add_argument("--trace", default=None,
+                        help="量測的 trace 檔（JSON Lines，見 utils/profiling.py）")
+    args = parser.parse_args()
+
+    profiler = Profiler(trace_path=args.trace, context={"graph": args.graph})
+    with profiler.stage("precompute") as record:
+        features = precompute_features(args.graph, args.features, hops=args.hops,
+                                       cache_dir=args.cache_dir, workers=args.workers)
+        record["rows_out"] = features.index["n_nodes"]
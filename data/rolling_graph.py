@@ -0,0 +1,417 @@
+# 持續偵測用的滾動通訊圖：只保留最近 horizon 秒內的流量，記憶體不隨時間成長
+#
+# 節點鍵與 data/make_graph.factorize_endpoints 相同：IP 先對應到整數代碼，
+# endpoint 模式以 (IP 代碼 << 16) | Port 為節點鍵，host 模式直接用 IP 代碼；
+# 同一對 (src, dst) 的流量合併為一條邊，邊特徵為窗內流量特徵的平均，節點特徵定義同 make_graph.node_features。
+#
+# 實作重點：
+# 1. 節點 / 邊 / IP 都存在以 ID 索引的 numpy 陣列中（容量不足時加倍），
+#    過期後不再被引用的 ID 放回 free list 重複使用，陣列大小只取決於 horizon 內同時存在的數量
+# 2. 流量事件依時間附加在陣列尾端，過期時以 searchsorted 找出要移除的前段、整段向量化扣除；
+#    前段空間超過一半時才整體搬移（攤銷 O(1)）
+# 3. 節點保留相連邊特徵平均的「總和」，邊的平均改變時只加上差值，不需重算整個鄰域
+# 4. 有變動的節點標記為 dirty；GNN 的節點 embedding 快取在圖中，
+#    只有 dirty 節點的 k-hop 鄰域需要重新計算（affected_nodes）
+#
+# 流量時間需大致遞增（重播或即時接收）；早於目前最新時間的流量視為最新時間加入。
+
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from data.make_graph import NODE_KEYS
+
+INITIAL_CAPACITY = 1024
+# 節點 / 邊鍵組合時，節點 ID 佔的位元數
+NODE_ID_BITS = 32
+
+
+def _grow(array, size):
+    """
+    容量不足 size 時加倍（至少到 size），保留既有內容
+    """
+    if len(array) >= size:
+        return array
+    grown = np.zeros((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class RollingGraph:
+    """
+    insert 加入一批流量、expire 移除過期流量；node_features / k_hop / subgraph_edges 取出局部圖給 GNN，
+    affected_nodes / set_embeddings / stale_nodes 管理節點 embedding 快取（embedding 陣列）
+    """
+
+    _NODE_ARRAYS = ("node_key", "node_ip", "node_port", "out_degree", "in_degree",
+                    "out_flows", "in_flows", "attr_sum", "embedding", "embedding_valid")
+    _EDGE_ARRAYS = ("edge_src", "edge_dst", "edge_flows", "edge_attr_sum")
+    _EVENT_ARRAYS = ("event_time", "event_edge", "event_attr")
+
+    def __init__(self, n_features, horizon_seconds, node_key="endpoint", capacity=INITIAL_CAPACITY):
+        if node_key not in NODE_KEYS:
+            raise ValueError(f"node_key 需為 {NODE_KEYS} 之一：{node_key}")
+        self.n_features = n_features
+        self.horizon_seconds = horizon_seconds
+        self.node_key_mode = node_key
+
+        # IP：字串 → 代碼，引用數歸零時回收
+        self.ip_ids = {}
+        self.ips = np.empty(capacity, dtype=object)
+        self.ip_refs = np.zeros(capacity, dtype=np.int64)
+
+        # 節點
+        self.node_ids = {}
+        self.node_key = np.zeros(capacity, dtype=np.int64)
+        self.node_ip = np.zeros(capacity, dtype=np.int64)
+        self.node_port = np.zeros(capacity, dtype=np.int64)
+        self.out_degree = np.zeros(capacity, dtype=np.int64)
+        self.in_degree = np.zeros(capacity, dtype=np.int64)
+        self.out_flows = np.zeros(capacity, dtype=np.int64)
+        self.in_flows = np.zeros(capacity, dtype=np.int64)
+        self.attr_sum = np.zeros((capacity, n_features), dtype=np.float64)
+        self.embedding = np.zeros((capacity, 0), dtype=np.float32)
+        self.embedding_valid = np.zeros(capacity, dtype=bool)
+        self.out_adj = []                  # 節點 → {鄰居: 邊 ID}
+        self.in_adj = []
+        self.dirty = set()
+
+        # 邊
+        self.edge_ids = {}
+        self.edge_src = np.zeros(capacity, dtype=np.int64)
+        self.edge_dst = np.zeros(capacity, dtype=np.int64)
+        self.edge_flows = np.zeros(capacity, dtype=np.int64)
+        self.edge_attr_sum = np.zeros((capacity, n_features), dtype=np.float64)
+
+        # 流量事件（依時間遞增）：live 範圍為 [event_head, event_tail)
+        self.event_time = np.zeros(capacity, dtype=np.int64)
+        self.event_edge = np.zeros(capacity, dtype=np.int64)
+        self.event_attr = np.zeros((capacity, n_features), dtype=np.float32)
+        self.event_head = self.event_tail = 0
+        self.last_time = np.iinfo(np.int64).min
+
+        self.free = {"ip": [], "node": [], "edge": []}
+        self.top = {"ip": 0, "node": 0, "edge": 0}
+
+    # ---------- ID 配置與回收 ----------
+
+    def _allocate(self, kind, count):
+        """
+        配置 count 個 ID：先取 free list，不足再從尾端新增（必要時擴充陣列）
+        """
+        free = self.free[kind]
+        reused = free[len(free) - min(count, len(free)):]
+        del free[len(free) - len(reused):]
+        start = self.top[kind]
+        self.top[kind] += count - len(reused)
+        ids = np.concatenate([np.array(reused, dtype=np.int64),
+                              np.arange(start, self.top[kind], dtype=np.int64)])
+        if kind == "ip":
+            self.ips = _grow(self.ips, self.top[kind])
+            self.ip_refs = _grow(self.ip_refs, self.top[kind])
+        elif kind == "node":
+            for name in self._NODE_ARRAYS:
+                setattr(self, name, _grow(getattr(self, name), self.top[kind]))
+            while len(self.out_adj) < self.top[kind]:
+                self.out_adj.append({})
+                self.in_adj.append({})
+        else:
+            for name in self._EDGE_ARRAYS:
+                setattr(self, name, _grow(getattr(self, name), self.top[kind]))
+        return ids
+
+    def _ip_codes(self, ips):
+        """
+        相異 IP 字串 → IP 代碼（新 IP 配置代碼）
+        """
+        codes = np.fromiter((self.ip_ids.get(ip, -1) for ip in ips), dtype=np.int64, count=len(ips))
+        new = np.flatnonzero(codes < 0)
+        if len(new):
+            codes[new] = self._allocate("ip", len(new))
+            for i, code in zip(new.tolist(), codes[new].tolist()):
+                self.ip_ids[ips[i]] = code
+                self.ips[code] = ips[i]
+        return codes
+
+    def _node_ids_for(self, keys):
+        """
+        相異節點鍵 → 節點 ID（新節點配置 ID 並增加 IP 引用數）
+        """
+        ids = np.fromiter((self.node_ids.get(key, -1) for key in keys.tolist()),
+                          dtype=np.int64, count=len(keys))
+        new = np.flatnonzero(ids < 0)
+        if len(new):
+            nodes = self._allocate("node", len(new))
+            ids[new] = nodes
+            new_keys = keys[new]
+            self.node_ids.update(zip(new_keys.tolist(), nodes.tolist()))
+            self.node_key[nodes] = new_keys
+            if self.node_key_mode == "host":
+                self.node_ip[nodes], self.node_port[nodes] = new_keys, -1
+            else:
+                self.node_ip[nodes], self.node_port[nodes] = new_keys >> 16, new_keys & 0xFFFF
+            np.add.at(self.ip_refs, self.node_ip[nodes], 1)
+            self.embedding_valid[nodes] = False
+        return ids
+
+    def _edge_ids_for(self, keys):
+        """
+        相異邊鍵（src << 32 | dst）→ 邊 ID（新邊配置 ID、加入鄰接表並更新度數）
+        """
+        ids = np.fromiter((self.edge_ids.get(key, -1) for key in keys.tolist()),
+                          dtype=np.int64, count=len(keys))
+        new = np.flatnonzero(ids < 0)
+        if len(new):
+            edges = self._allocate("edge", len(new))
+            ids[new] = edges
+            src, dst = keys[new] >> NODE_ID_BITS, keys[new] & ((1 << NODE_ID_BITS) - 1)
+            self.edge_src[edges], self.edge_dst[edges] = src, dst
+            self.edge_ids.update(zip(keys[new].tolist(), edges.tolist()))
+            for u, v, e in zip(src.tolist(), dst.tolist(), edges.tolist()):
+                self.out_adj[u][v] = e
+                self.in_adj[v][u] = e
+            np.add.at(self.out_degree, src, 1)
+            np.add.at(self.in_degree, dst, 1)
+        return ids
+
+    def _edge_mean(self, edges):
+        flows = self.edge_flows[edges]
+        return np.divide(self.edge_attr_sum[edges], np.maximum(flows, 1)[:, None]) * (flows > 0)[:, None]
+
+    def _apply_flows(self, edge_of_flow, attrs, sign):
+        """
+        將一批流量加入（sign=1）或移除（sign=-1）對應的邊，並以邊平均的差值更新兩端節點的特徵總和
+        回傳相異的邊 ID
+        """
+        index, edges = pd.factorize(edge_of_flow)
+        edges = np.asarray(edges, dtype=np.int64)
+        old_mean = self._edge_mean(edges)
+
+        sums = np.zeros((len(edges), self.n_features), dtype=np.float64)
+        np.add.at(sums, index, attrs.astype(np.float64))
+        counts = np.bincount(index, minlength=len(edges))
+        self.edge_attr_sum[edges] += sign * sums
+        self.edge_flows[edges] += sign * counts
+
+        delta = self._edge_mean(edges) - old_mean
+        src, dst = self.edge_src[edges], self.edge_dst[edges]
+        np.add.at(self.attr_sum, src, delta)
+        np.add.at(self.attr_sum, dst, delta)
+        np.add.at(self.out_flows, src, sign * counts)
+        np.add.at(self.in_flows, dst, sign * counts)
+        self.dirty.update(src.tolist())
+        self.dirty.update(dst.tolist())
+        return edges
+
+    # ---------- 加入 / 過期 ----------
+
+    def insert(self, src_ip, src_port, dst_ip, dst_port, attrs, timestamps):
+        """
+        加入一批流量（各參數為等長陣列，attrs 為 (n, n_features)、timestamps 為秒）
+        回傳 (src 節點 ID, dst 節點 ID, 邊 ID)，皆為每筆流量一個
+        """
+        n = len(attrs)
+        if n == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+
+        ip_index, ip_uniques = pd.factorize(np.concatenate([np.asarray(src_ip, dtype=object),
+                                                            np.asarray(dst_ip, dtype=object)]))
+        ip_codes = self._ip_codes(list(ip_uniques))[ip_index]
+        if self.node_key_mode == "host":
+            keys = ip_codes
+        else:
+            ports = np.concatenate([np.asarray(src_port, dtype=np.int64),
+                                    np.asarray(dst_port, dtype=np.int64)])
+            keys = (ip_codes << 16) | ports
+        key_index, key_uniques = pd.factorize(keys)
+        nodes = self._node_ids_for(np.asarray(key_uniques, dtype=np.int64))[key_index]
+        src, dst = nodes[:n], nodes[n:]
+
+        edge_index, edge_uniques = pd.factorize((src << NODE_ID_BITS) | dst)
+        edges = self._edge_ids_for(np.asarray(edge_uniques, dtype=np.int64))[edge_index]
+        self._apply_flows(edges, attrs, 1)
+
+        timestamps = np.maximum.accumulate(np.maximum(np.asarray(timestamps, dtype=np.int64),
+                                                      self.last_time))
+        self.last_time = int(timestamps[-1])
+        self._append_events(timestamps, edges, attrs)
+        return src, dst, edges
+
+    def _append_events(self, timestamps, edges, attrs):
+        n = len(edges)
+        if self.event_tail + n > len(self.event_time) and self.event_head > 0:
+            self._compact_events()
+        for name in self._EVENT_ARRAYS:
+            setattr(self, name, _grow(getattr(self, name), self.event_tail + n))
+        window = slice(self.event_tail, self.event_tail + n)
+        self.event_time[window], self.event_edge[window], self.event_attr[window] = \
+            timestamps, edges, attrs
+        self.event_tail += n
+
+    def _compact_events(self):
+        live = slice(self.event_head, self.event_tail)
+        n = self.event_tail - self.event_head
+        for name in self._EVENT_ARRAYS:
+            array = getattr(self, name)
+            array[:n] = array[live]
+        self.event_head, self.event_tail = 0, n
+
+    def expire(self, now):
+        """
+        移除早於 now - horizon 的流量；流量歸零的邊、沒有相連邊的節點與不再被引用的 IP 回收
+        回傳移除的流量數
+        """
+        cutoff = now - self.horizon_seconds
+        live_times = self.event_time[self.event_head:self.event_tail]
+        n = int(np.searchsorted(live_times, cutoff, side="left"))
+        if n == 0:
+            return 0
+        expired = slice(self.event_head, self.event_head + n)
+        edges = self._apply_flows(self.event_edge[expired], self.event_attr[expired], -1)
+        self.event_head += n
+        if self.event_head > len(self.event_time) // 2:
+            self._compact_events()
+
+        dead = edges[self.edge_flows[edges] == 0]
+        if len(dead):
+            self._remove_edges(dead)
+        return n
+
+    def _remove_edges(self, edges):
+        src, dst = self.edge_src[edges], self.edge_dst[edges]
+        for u, v, key in zip(src.tolist(), dst.tolist(),
+                             ((src << NODE_ID_BITS) | dst).tolist()):
+            del self.out_adj[u][v]
+            del self.in_adj[v][u]
+            del self.edge_ids[key]
+        np.subtract.at(self.out_degree, src, 1)
+        np.subtract.at(self.in_degree, dst, 1)
+        self.edge_attr_sum[edges] = 0
+        self.free["edge"].extend(edges.tolist())
+
+        candidates = np.unique(np.concatenate([src, dst]))
+        dead = candidates[(self.out_degree[candidates] + self.in_degree[candidates]) == 0]
+        if len(dead):
+            self._remove_nodes(dead)
+
+    def _remove_nodes(self, nodes):
+        for key in self.node_key[nodes].tolist():
+            del self.node_ids[key]
+        self.dirty.difference_update(nodes.tolist())
+        # 浮點誤差不帶到下一個使用同 ID 的節點
+        self.attr_sum[nodes] = 0
+        self.embedding_valid[nodes] = False
+        self.free["node"].extend(nodes.tolist())
+
+        ips = self.node_ip[nodes]
+        np.subtract.at(self.ip_refs, ips, 1)
+        dead_ips = np.unique(ips[self.ip_refs[ips] == 0])
+        for code in dead_ips.tolist():
+            del self.ip_ids[self.ips[code]]
+            self.ips[code] = None
+        self.free["ip"].extend(dead_ips.tolist())
+
+    # ---------- 局部圖與 embedding 快取 ----------
+
+    def node_features(self, nodes):
+        """
+        與 make_graph.node_features 相同的節點特徵：出 / 入度、出 / 入流量數（log1p）、相連邊特徵平均
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        degree = np.maximum(self.out_degree[nodes] + self.in_degree[nodes], 1)
+        x = np.empty((len(nodes), 4 + self.n_features), dtype=np.float32)
+        x[:, 0], x[:, 1] = np.log1p(self.out_degree[nodes]), np.log1p(self.in_degree[nodes])
+        x[:, 2], x[:, 3] = np.log1p(self.out_flows[nodes]), np.log1p(self.in_flows[nodes])
+        x[:, 4:] = self.attr_sum[nodes] / degree[:, None]
+        return x
+
+    def k_hop(self, seeds, hops, max_neighbors=None):
+        """
+        seeds 的 k-hop 鄰域（不分方向），回傳節點 ID 陣列（seeds 依原順序在前）
+        max_neighbors：每個節點最多展開幾個最近加入的鄰居（限制大型主機的展開成本）
+        """
+        nodes = list(dict.fromkeys(np.asarray(seeds, dtype=np.int64).tolist()))
+        seen = set(nodes)
+        frontier = nodes
+        for _ in range(hops):
+            next_frontier = []
+            for node in frontier:
+                for adj in (self.out_adj[node], self.in_adj[node]):
+                    neighbors = reversed(adj) if max_neighbors is None \
+                        else islice(reversed(adj), max_neighbors)
+                    for neighbor in neighbors:
+                        if neighbor not in seen:
+                            seen.add(neighbor)
+                            next_frontier.append(neighbor)
+            nodes.extend(next_frontier)
+            frontier = next_frontier
+        return np.array(nodes, dtype=np.int64)
+
+    def subgraph_edges(self, nodes):
+        """
+        nodes 之間的所有邊，回傳 (區域 edge_index (2, m), 邊 ID)
+        """
+        local = {node: i for i, node in enumerate(np.asarray(nodes).tolist())}
+        src, dst, edge_ids = [], [], []
+        for u, i in local.items():
+            adj = self.out_adj[u]
+            # 從鄰接表與節點集合中較小的一方查找
+            if len(adj) <= len(local):
+                pairs = ((v, e) for v, e in adj.items() if v in local)
+            else:
+                pairs = ((v, adj[v]) for v in local if v in adj)
+            for v, e in pairs:
+                src.append(i)
+                dst.append(local[v])
+                edge_ids.append(e)
+        return np.array([src, dst], dtype=np.int64).reshape(2, -1), np.array(edge_ids, dtype=np.int64)
+
+    def edge_features(self, edges):
+        """
+        邊特徵：窗內流量特徵的平均
+        """
+        return self._edge_mean(np.asarray(edges, dtype=np.int64)).astype(np.float32)
+
+    def affected_nodes(self, hops, max_neighbors=None):
+        """
+        自上次呼叫以來有變動的節點的 k-hop 鄰域（需重新計算 embedding 的節點），並清空 dirty 標記
+        """
+        dirty = np.fromiter(self.dirty, dtype=np.int64, count=len(self.dirty))
+        self.dirty = set()
+        return self.k_hop(dirty, hops, max_neighbors)
+
+    def set_embeddings(self, nodes, embeddings):
+        if self.embedding.shape[1] != embeddings.shape[1]:
+            self.embedding = np.zeros((len(self.node_key), embeddings.shape[1]), dtype=np.float32)
+            self.embedding_valid[:] = False
+        self.embedding[nodes] = embeddings
+        self.embedding_valid[nodes] = True
+
+    def stale_nodes(self, nodes):
+        """
+        nodes 中沒有有效 embedding 快取的節點
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return nodes[~self.embedding_valid[nodes]]
+
+    # ---------- 狀態 ----------
+
+    def stats(self):
+        return {
+            "nodes": len(self.node_ids),
+            "edges": len(self.edge_ids),
+            "ips": len(self.ip_ids),
+            "flows": self.event_tail - self.event_head,
+            "node_capacity": len(self.node_key),
+            "edge_capacity": len(self.edge_src),
+            "event_capacity": len(self.event_time),
+        }
+
+    def nbytes(self):
+        """
+        numpy 陣列佔用的位元組數（不含 dict / 鄰接表）
+        """
+        names = self._NODE_ARRAYS + self._EDGE_ARRAYS + self._EVENT_ARRAYS + ("ips", "ip_refs")
+        return sum(getattr(self, name).nbytes for name in names)
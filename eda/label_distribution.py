@@ -1,70 +1,118 @@
 # 顯示與分析 Label 分布情況（例如類別不平衡）
+#
+# 計數優先取前處理已算好的結果（version.json 中清理報告的 label_counts），
+# 沒有時才讀取資料檔的 Label 欄位；圖表由計數直接繪製，不需逐筆資料。
+# 前處理流程會自動輸出 figures/label_distribution.png（見 run_preprocessing_pipeline.py）
+#
+# 用法（於專案根目錄執行）：
+# python -m eda.label_distribution                                   # data/processed/cleaned.parquet
+# python -m eda.label_distribution --stats data/versions/<版本>/version.json
+# python -m eda.label_distribution --input data/processed/preprocessed.parquet --output label.png
+
+import argparse
+import json
+import os                         # 處理檔案路徑
 
-import matplotlib.pyplot as plt   # 匯入繪圖套件 matplotlib.pyplot，方便畫圖
 import matplotlib                 # 匯入 matplotlib，用來設定字體或其他全域參數
-import pandas as pd               # 處理表格資料
 import matplotlib.pyplot as plt   # 繪製圖表
-import seaborn as sns             # 美化統計圖表
-import os                         # 處理檔案路徑
+import numpy as np
+import pandas as pd               # 處理表格資料
+
+from utils.helpers import read_table  # 中間檔讀取（Parquet / CSV）
+from preprocess.plot_correlation import FIGURE_DPI
 
 # 設定字體（以下示範 macOS 系統常用的蘋果系字體）
 matplotlib.rcParams['font.family'] = [
     'Apple LiGothic', 'Arial Unicode MS', 'DejaVu Sans']
 
 
-def analyze_label_distribution(input_path, output_path=None):
+def label_counts(input_path):
     """
-    分析 CSV 檔案中的 Label 分布情況：
-    - 印出各類別的數量與比例
-    - 畫出 Label 分布柱狀圖
-    - 指定 output_path，則儲存圖片檔
-    參數:
-        input_path: str, 清理好的 CSV 檔案路徑（需含 'Label' 欄位）
-        output_path: str or None, 圖片儲存路徑（預設 None，不儲存）
+    讀取資料檔的 Label 欄位（只讀這一欄）並計數，回傳依數量由大到小排序的 Series
+    """
+    counts = read_table(input_path, columns=['Label'])['Label'].value_counts()
+    return counts[counts > 0]  # category 欄位會列出筆數為 0 的類別
+
+
+def load_label_counts(stats_path):
     """
+    從前處理版本的 version.json 讀取清理報告中的標籤計數（不需讀取資料）
+    找不到時回傳 None（較舊的版本沒有記錄）
+    """
+    with open(stats_path, "r") as f:
+        stats = json.load(f)
+    counts = stats.get("cleaning", {}).get("label_counts")
+    if not counts:
+        return None
+    return pd.Series(counts, dtype=np.int64).sort_values(ascending=False)
 
-    # 讀取資料
-    df = pd.read_csv(input_path)
 
+def print_label_distribution(counts):
+    """
+    印出各類別的數量與比例（counts 為 {類別: 筆數} 或 Series）
+    """
+    counts = pd.Series(counts, dtype=np.int64).sort_values(ascending=False)
     # 顯示各類別的樣本數量
     print("Label 數量統計:")
-    print(df['Label'].value_counts())
+    print(counts)
     # 顯示各類別的樣本比例（%）
     print("Label 比例 (%):")
-    print(df['Label'].value_counts(normalize=True) * 100)
-
-    # 繪製類別分布圖
-    plt.figure(figsize=(10, 5))
-    sns.countplot(
-        data=df,
-        x='Label',
-        order=df['Label'].value_counts().index  # 依照數量排序
-    )
-    plt.title("Label 分布圖")
-    plt.xticks(rotation=45)  # 旋轉 X 軸文字避免重疊
-    plt.tight_layout()
-
-    if output_path:
+    print(counts / counts.sum() * 100)
+
+
+def plot_label_distribution(counts, save_path=None):
+    """
+    由標籤計數畫出 Label 分布柱狀圖（依數量排序）；指定 save_path 時存檔，否則顯示
+    可在背景行程中執行（見 eda/render.py）
+    """
+    counts = pd.Series(counts, dtype=np.int64).sort_values(ascending=False)
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.bar(counts.index.astype(str), counts.to_numpy())
+    ax.set_title("Label 分布圖")
+    ax.set_ylabel("count")
+    ax.tick_params(axis='x', labelrotation=45)  # 旋轉 X 軸文字避免重疊
+    plt.setp(ax.get_xticklabels(), ha='right')
+    fig.tight_layout()
+
+    if save_path:
         # 確保資料夾存在
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        plt.savefig(output_path)
-        print(f"Label 分布圖已儲存至: {output_path}")
+        os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+        fig.savefig(save_path, dpi=FIGURE_DPI)
+        plt.close(fig)
+        print(f"Label 分布圖已儲存至: {save_path}")
+    else:
+        plt.show()
 
-    plt.show()
+
+def analyze_label_distribution(input_path=None, output_path=None, stats_path=None):
+    """
+    分析 Label 分布情況：
+    - 印出各類別的數量與比例
+    - 畫出 Label 分布柱狀圖
+    - 指定 output_path，則儲存圖片檔
+    參數:
+        input_path: str or None, 資料路徑（.parquet / .csv，需含 'Label' 欄位）
+        output_path: str or None, 圖片儲存路徑（預設 None，不儲存）
+        stats_path: str or None, 前處理版本的 version.json（有 label_counts 時不讀取資料）
+    回傳標籤計數 Series
+    """
+    counts = load_label_counts(stats_path) if stats_path else None
+    if counts is None:
+        counts = label_counts(input_path)
+    print_label_distribution(counts)
+    plot_label_distribution(counts, output_path)
+    return counts
 
 
 if __name__ == "__main__":
-    # 取得目前執行的 .py 檔案的絕對路徑，並取得該檔案所在資料夾路徑
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    # 設定輸入檔案路徑：往上兩層進入 data/processed 資料夾，讀取 cleaned.csv
-    input_csv = os.path.join(BASE_DIR, "../data/processed/cleaned.csv")
-    # 設定輸出圖片路徑：同樣在 data/processed，命名為 label_distribution.png
-    output_png = os.path.join(
-        BASE_DIR, "../data/processed/label_distribution.png")
-    # 印出圖片輸出路徑，方便確認儲存位置
-    print(f"輸出圖片路徑: {output_png}")
+    parser = argparse.ArgumentParser(description="Label 分布統計與柱狀圖")
+    parser.add_argument("--input", default="data/processed/cleaned.parquet",
+                        help="資料檔（沒有 --stats 或統計中沒有 label_counts 時讀取其 Label 欄位）")
+    parser.add_argument("--stats", default=None,
+                        help="前處理版本的 version.json（使用其中的標籤計數）")
+    parser.add_argument("--output", default="data/processed/figures/label_distribution.png")
+    args = parser.parse_args()
 
-    # 呼叫自訂義的分析函式 analyze_label_distribution，
-    # 傳入輸入檔案路徑和圖片輸出路徑
-    # 函式會分析 Label 分布、繪圖，並將圖片存至 output_png
-    analyze_label_distribution(input_csv, output_png)
+    # 印出圖片輸出路徑，方便確認儲存位置
+    print(f"輸出圖片路徑: {args.output}")
+    analyze_label_distribution(args.input, args.output, stats_path=args.stats)
@@ -0,0 +1,83 @@
+# 背景繪圖：圖表在另一個行程中繪製與存檔，不佔用前處理主流程的時間
+#
+# 送到背景行程的只有聚合後的資料（標籤計數、相關係數 Series / 矩陣），序列化成本可忽略；
+# 繪圖函式需為模組層級的函式（spawn 行程以名稱重新匯入）。
+#
+# 用法：
+#   renderer = FigureRenderer()
+#   renderer.submit(plot_label_distribution, counts, "figures/label_distribution.png")
+#   ...
+#   renderer.wait()      # 建立版本快照前等待所有圖表寫完
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _init_worker():
+    """
+    背景行程使用不需要視窗的 Agg backend（plt.show 不會阻塞）
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _warm_up():
+    """
+    預先匯入繪圖模組（pyplot 與各繪圖函式所在模組），第一張圖送到時不必再等匯入
+    """
+    import matplotlib.pyplot  # noqa: F401
+    import eda.label_distribution  # noqa: F401
+    import preprocess.plot_correlation  # noqa: F401
+
+
+class FigureRenderer:
+    """
+    以單一背景行程依序繪製圖表
+    - 建立時即啟動背景行程並預先匯入 matplotlib，與合併 / 清理等前段階段同時進行
+    - submit：送出繪圖工作後立即返回
+    - wait：等待所有工作完成並關閉背景行程，繪圖失敗只印出警告、不中斷流程
+    background=False 時在目前行程直接繪製（除錯或不允許多行程的環境）
+    """
+
+    def __init__(self, background=True):
+        self.background = background
+        self._pool = None
+        self._futures = []
+        if background:
+            self._start()
+
+    def _start(self):
+        """
+        啟動背景行程；spawn 行程的啟動與 matplotlib 匯入約需 1 秒以上，送出預熱工作讓這段時間
+        與主流程重疊（預熱失敗不影響繪圖工作，錯誤會在之後的 submit 顯示）
+        """
+        self._pool = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker)
+        self._pool.submit(_warm_up)
+
+    def submit(self, func, *args, **kwargs):
+        if not self.background:
+            func(*args, **kwargs)
+            return
+        if self._pool is None:
+            self._start()
+        self._futures.append((func.__name__, self._pool.submit(func, *args, **kwargs)))
+
+    def wait(self):
+        """
+        等待所有圖表完成，回傳失敗的數量
+        """
+        failed = 0
+        for name, future in self._futures:
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                print(f"⚠️ 繪圖失敗（{name}）：{type(e).__name__}: {e}")
+        self._futures = []
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        return failed
+
@@ -0,0 +1,417 @@
+# 多個 checkpoint 的平行批次評估與 ensemble
+#
+# - 圖與切分只在主行程讀一次：節點特徵、edge_index、邊特徵、標籤與要評估的邊 ID 放進共享記憶體
+#   （multiprocessing.shared_memory），各 worker 直接對應成 numpy / torch 陣列，不複製、不重新建圖
+# - 各 checkpoint 在 process pool 中同時評分（每個 worker 限制 torch 執行緒數），
+#   類別機率直接寫入共享的輸出陣列 (模型數, 邊數, 類別數)
+# - sgc / sign 的預先傳播特徵在主行程先確保已快取（data/precompute.py），worker 以 memmap 共用
+# - ensemble：mean 為各模型類別機率的平均；stack 以各模型在驗證集的機率訓練 logistic regression，
+#   再套用到測試集
+# - 比較報告：各模型與 ensemble 的指標（StreamingMetrics）、推論時間、rows/sec（流量）與 edges/sec，
+#   寫成 comparison.csv 與 report.json，各階段量測寫入 trace.jsonl
+#
+# 用法（於專案根目錄執行）：
+# python -m evaluate.batch_evaluate experiments/checkpoints/*/best.pt
+# python -m evaluate.batch_evaluate experiments/checkpoints/{gcn,graphsage,sign}/best.pt \
+#     --ensemble mean stack --workers 3 --output experiments/evaluation
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from data.make_graph import load_graph
+from evaluate.metrics import StreamingMetrics
+from utils.profiling import TRACE_FILE, Profiler
+
+ENSEMBLE_METHODS = ["mean", "stack"]
+REPORT_METRICS = ["accuracy", "precision", "recall", "f1", "roc_auc", "pr_auc"]
+PROB_DTYPE = np.float32
+TASK_LABELS = {"binary": "edge_label", "multi": "edge_label_multi"}
+
+# worker 行程中已對應的共享陣列（由 _init_worker 設定）
+_SHARED = {}
+
+
+# ---------- 共享記憶體 ----------
+
+def share_arrays(arrays):
+    """
+    將 numpy 陣列複製到共享記憶體，回傳 (SharedMemory 清單, specs, {名稱: 共享陣列})
+    specs 為 {名稱: (共享記憶體名稱, shape, dtype)}，傳給 worker 以 attach_arrays 對應
+    共享陣列需在 release_arrays 之前釋放（仍有 view 時無法關閉共享記憶體）
+    """
+    blocks, specs, shared = [], {}, {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared[name] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[name][...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs, shared
+
+
+def attach_arrays(specs):
+    """
+    依 specs 對應共享記憶體（不複製），回傳 (SharedMemory 清單, {名稱: 陣列})
+    """
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return blocks, arrays
+
+
+def release_arrays(blocks):
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+# ---------- worker 行程 ----------
+
+def _init_worker(specs, threads):
+    """
+    對應共享陣列，並限制數值函式庫的執行緒數（需在匯入 torch 前設定）
+    """
+    for var in ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]:
+        os.environ[var] = str(threads)
+    blocks, arrays = attach_arrays(specs)
+    _SHARED.update(arrays)
+    _SHARED["_blocks"] = blocks
+    _SHARED["_threads"] = threads
+
+
+def _worker_data(config, job):
+    """
+    由共享陣列組成模型需要的圖：sgc / sign 為含預先傳播特徵的 SimpleNamespace，其他為 PyG Data
+    """
+    import torch
+    from types import SimpleNamespace
+
+    edge_index = torch.from_numpy(_SHARED["edge_index"])
+    edge_attr = torch.from_numpy(_SHARED["edge_attr"])
+    if job["precompute_dir"] is not None:
+        from data.precompute import PropagatedFeatures
+
+        features = PropagatedFeatures(job["precompute_dir"])
+        return SimpleNamespace(edge_index=edge_index, edge_attr=edge_attr, features=features,
+                               num_nodes=len(_SHARED["x"]), num_edges=edge_index.size(1),
+                               num_node_features=features.n_features)
+    from torch_geometric.data import Data
+
+    return Data(x=torch.from_numpy(_SHARED["x"]), edge_index=edge_index, edge_attr=edge_attr)
+
+
+def score_checkpoint(job):
+    """
+    在 worker 中評分一個 checkpoint：依序對 job["splits"] 的邊計算類別機率，寫入共享的輸出陣列
+    回傳 {"seconds": {集合: 秒數}, "num_classes", "model"}
+    """
+    import torch
+
+    from train.engine import (DEFAULT_CONFIG, PRECOMPUTED_MODELS, PropagatedEdgeLoader, build_model,
+                              make_loader, predict_logits)
+
+    torch.set_num_threads(_SHARED["_threads"])
+    checkpoint = torch.load(job["path"], map_location="cpu", weights_only=False)
+    # 評分在 worker 行程內進行，不再另開 DataLoader worker
+    config = {**DEFAULT_CONFIG, **checkpoint["config"], "num_workers": 0}
+    model = build_model(config["model"], **config["model_args"])
+    model.load_state_dict(checkpoint["model"])
+    data = _worker_data(config, job)
+    labels = torch.from_numpy(_SHARED[TASK_LABELS[config["task"]]])
+    num_classes = config["model_args"]["num_classes"]
+
+    seconds = {}
+    for split in job["splits"]:
+        edge_ids = torch.from_numpy(_SHARED[f"{split}_edges"])
+        out = _SHARED[f"{split}_probs"][job["index"]]
+        start = time.perf_counter()
+        if config["model"] in PRECOMPUTED_MODELS:
+            loader = PropagatedEdgeLoader(data, labels, edge_ids, config["eval_batch_size"], shuffle=False)
+        elif config["full_batch"]:
+            loader = None
+        else:
+            loader = make_loader(data, labels, edge_ids, config, shuffle=False,
+                                 batch_size=config["eval_batch_size"])
+        position = 0
+        # 各批依 edge_ids 的順序產生（不打亂），直接寫入對應的列
+        for logits, y in predict_logits(model, data, labels, edge_ids, config, loader=loader):
+            out[position:position + len(y), :num_classes] = torch.softmax(logits, dim=-1).numpy()
+            position += len(y)
+        seconds[split] = time.perf_counter() - start
+    return {"seconds": seconds, "num_classes": num_classes, "model": config["model"]}
+
+
+# ---------- 主行程 ----------
+
+def read_checkpoint_configs(paths):
+    """
+    讀取各 checkpoint 的 config（模型名稱、任務、建構參數）
+    """
+    import torch
+
+    from train.engine import DEFAULT_CONFIG
+
+    configs = []
+    for path in paths:
+        checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+        configs.append({**DEFAULT_CONFIG, **checkpoint["config"]})
+    return configs
+
+
+def model_names(paths):
+    """
+    報告中的模型名稱：checkpoint 所在的資料夾名稱（重複時加上編號）
+    """
+    names = [os.path.basename(os.path.dirname(os.path.abspath(path))) or path for path in paths]
+    return [name if names.count(name) == 1 else f"{name}_{i}" for i, name in enumerate(names)]
+
+
+def ensure_precomputed(config, graph_path, graph, workers=None):
+    """
+    sgc / sign：在主行程先取得（必要時計算）預先傳播特徵，回傳快取資料夾；其他模型回傳 None
+    """
+    from data.precompute import precompute_features
+    from train.engine import PRECOMPUTED_MODELS
+
+    if config["model"] not in PRECOMPUTED_MODELS:
+        return None
+    features = precompute_features(graph_path, config["features_path"], hops=config["hops"],
+                                   cache_dir=config["precompute_dir"], workers=workers, graph=graph)
+    return features.output_dir
+
+
+def split_metrics(probs, y, num_classes, batch_size=65536):
+    """
+    由類別機率逐批累加 StreamingMetrics，回傳指標 dict
+    """
+    metrics = StreamingMetrics(num_classes)
+    for start in range(0, len(y), batch_size):
+        metrics.update(y[start:start + batch_size], probs=probs[start:start + batch_size])
+    return metrics.result()
+
+
+def mean_ensemble(probs):
+    """
+    各模型類別機率的平均：probs 為 (模型數, 邊數, 類別數)
+    """
+    return probs.mean(axis=0, dtype=np.float64).astype(PROB_DTYPE)
+
+
+def stack_ensemble(val_probs, val_y, test_probs, seed=0):
+    """
+    stacking：以各模型在驗證集的類別機率（串接成特徵）訓練 logistic regression，回傳測試集的類別機率
+    val_probs / test_probs 為 (模型數, 邊數, 類別數)
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    def features(probs):
+        return np.transpose(probs, (1, 0, 2)).reshape(probs.shape[1], -1)
+
+    if len(np.unique(val_y)) < 2:
+        raise ValueError("驗證集只有一個類別，無法訓練 stacking 模型")
+    meta = LogisticRegression(max_iter=1000, random_state=seed)
+    meta.fit(features(val_probs), val_y)
+    # 驗證集沒有出現的類別機率為 0
+    out = np.zeros(test_probs.shape[1:], dtype=PROB_DTYPE)
+    out[:, meta.classes_] = meta.predict_proba(features(test_probs))
+    return out
+
+
+def build_report(shared, configs, results, failed, names, paths, split, ensembles, rows, seed=0):
+    """
+    由共享的類別機率計算各模型與 ensemble 的指標與吞吐量，回傳比較報告的列
+    ensemble 的推論時間為各成員時間的總和（依序執行所有成員的成本）；stack 另加上驗證集的評分時間
+    """
+    edge_ids = shared[f"{split}_edges"]
+    edges = len(edge_ids)
+    report = []
+    for i, config in enumerate(configs):
+        if i in failed:
+            report.append({"name": names[i], "kind": "model", "model": config["model"],
+                           "checkpoint": paths[i], "error": failed[i]})
+            continue
+        num_classes = results[i]["num_classes"]
+        y = shared[TASK_LABELS[config["task"]]][edge_ids]
+        scores = split_metrics(shared[f"{split}_probs"][i, :, :num_classes], y, num_classes)
+        report.append(_result_row(names[i], "model", scores, results[i]["seconds"][split], edges, rows,
+                                  checkpoint=paths[i], model=results[i]["model"]))
+
+    members = sorted(results)
+    if not ensembles:
+        return report
+    if len(members) < 2:
+        print("⚠️ 成功評估的模型少於 2 個，略過 ensemble")
+        return report
+    labels = shared[TASK_LABELS[configs[members[0]]["task"]]]
+    y = labels[edge_ids]
+    num_classes = max(results[i]["num_classes"] for i in members)
+    probs = shared[f"{split}_probs"][members][:, :, :num_classes]
+    seconds = sum(results[i]["seconds"][split] for i in members)
+    label = "+".join(names[i] for i in members)
+    if "mean" in ensembles:
+        scores = split_metrics(mean_ensemble(probs), y, num_classes)
+        report.append(_result_row(f"mean({label})", "ensemble", scores, seconds, edges, rows,
+                                  model="mean"))
+    if "stack" in ensembles:
+        val_probs = shared["val_probs"][members][:, :, :num_classes]
+        stacked = stack_ensemble(val_probs, labels[shared["val_edges"]], probs, seed=seed)
+        scores = split_metrics(stacked, y, num_classes)
+        val_seconds = sum(results[i]["seconds"].get("val", 0.0) for i in members)
+        report.append(_result_row(f"stack({label})", "ensemble", scores, seconds + val_seconds,
+                                  edges, rows, model="stack"))
+    return report
+
+
+def _result_row(name, kind, scores, seconds, edges, rows, checkpoint=None, model=None):
+    row = {"name": name, "kind": kind, "model": model, "checkpoint": checkpoint}
+    row.update({metric: scores.get(metric) for metric in REPORT_METRICS})
+    row.update({"seconds": round(seconds, 4), "edges": edges, "rows": rows,
+                "edges_per_sec": edges / seconds if seconds > 0 else None,
+                "rows_per_sec": rows / seconds if seconds > 0 else None})
+    return row
+
+
+def batch_evaluate(checkpoint_paths, graph_path=None, split_index_path=None, split="test",
+                   ensembles=(), workers=None, output_dir="experiments/evaluation", seed=0):
+    """
+    平行評估多個 checkpoint（同一張圖、同一個切分），並計算 ensemble
+    graph_path / split_index_path：預設取第一個 checkpoint 訓練時的設定
+    ensembles：ENSEMBLE_METHODS 的子集；成員需為同一個任務（類別數相同）
+    回傳比較報告的列（list of dict）
+    """
+    from train.engine import edge_splits
+
+    for method in ensembles:
+        if method not in ENSEMBLE_METHODS:
+            raise ValueError(f"ensemble 必須是 {ENSEMBLE_METHODS} 之一")
+    os.makedirs(output_dir, exist_ok=True)
+    profiler = Profiler(trace_path=os.path.join(output_dir, TRACE_FILE),
+                        context={"checkpoints": len(checkpoint_paths)})
+    names = model_names(checkpoint_paths)
+
+    with profiler.stage("load") as stage:
+        configs = read_checkpoint_configs(checkpoint_paths)
+        graph_path = graph_path or configs[0]["graph_path"]
+        split_index_path = split_index_path or configs[0]["split_index_path"]
+        graph = load_graph(graph_path)
+        n_edges = graph["edge_index"].shape[1]
+        splits = edge_splits(graph["flow_edge"], split_index_path, n_edges)
+        # stacking 需要各模型在驗證集的機率
+        scored_splits = [split] + (["val"] if "stack" in ensembles and split != "val" else [])
+        tasks = {config["task"] for config in configs}
+        if ensembles and len(tasks) > 1:
+            raise ValueError(f"ensemble 的成員需為同一個任務，目前為 {sorted(tasks)}")
+        max_classes = max(config["model_args"]["num_classes"] for config in configs)
+        precompute_dirs = [ensure_precomputed(config, graph_path, graph) for config in configs]
+        stage["rows_out"] = len(splits[split])
+
+    arrays = {
+        "x": graph["x"], "edge_index": graph["edge_index"], "edge_attr": graph["edge_attr"],
+        "edge_label": graph["edge_label"], "edge_label_multi": graph["edge_label_multi"],
+    }
+    for name in scored_splits:
+        arrays[f"{name}_edges"] = splits[name]
+        arrays[f"{name}_probs"] = np.zeros((len(configs), len(splits[name]), max_classes),
+                                           dtype=PROB_DTYPE)
+    edges = len(splits[split])
+    rows = int(graph["edge_flows"][splits[split]].sum())
+    del graph
+
+    workers = min(workers or os.cpu_count() or 1, len(configs))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    blocks, specs, shared = share_arrays(arrays)
+    del arrays
+    results, failed = {}, {}
+    try:
+        with profiler.stage("score", rows_in=edges * len(configs)) as stage:
+            print(f"🚀 以 {workers} 個 worker（各 {threads} 個執行緒）評估 {len(configs)} 個 checkpoint，"
+                  f"{split} {edges} 條邊（{rows} 筆流量）")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                     initializer=_init_worker, initargs=(specs, threads)) as pool:
+                futures = {
+                    pool.submit(score_checkpoint, {"index": i, "path": path, "splits": scored_splits,
+                                                   "precompute_dir": precompute_dirs[i]}): i
+                    for i, path in enumerate(checkpoint_paths)}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        results[i] = future.result()
+                        print(f"✅ {names[i]}：{results[i]['seconds'][split]:.2f} 秒")
+                    except Exception as e:
+                        failed[i] = f"{type(e).__name__}: {e}"
+                        print(f"❌ {names[i]}：{failed[i]}")
+            stage["failed"] = len(failed)
+
+        with profiler.stage("report", rows_in=edges) as stage:
+            report = build_report(shared, configs, results, failed, names, checkpoint_paths, split,
+                                  ensembles, rows, seed=seed)
+            stage["rows_out"] = len(report)
+        shared = None
+    finally:
+        release_arrays(blocks)
+
+    save_report(report, output_dir, {
+        "graph_path": graph_path, "split_index_path": split_index_path, "split": split,
+        "workers": workers, "threads_per_worker": threads, "ensembles": list(ensembles),
+        "stages": profiler.stages,
+    })
+    print_comparison(report)
+    return report
+
+
+def save_report(report, output_dir, context):
+    """
+    寫出 comparison.csv（一列一個模型 / ensemble）與 report.json（含評估設定與各階段量測）
+    """
+    pd.DataFrame(report).to_csv(os.path.join(output_dir, "comparison.csv"), index=False)
+    with open(os.path.join(output_dir, "report.json"), "w") as f:
+        json.dump({**context, "results": report}, f, indent=2, default=str)
+    print(f"✅ 比較報告已儲存到 {output_dir}")
+
+
+def print_comparison(report, metric="f1"):
+    print(f"{'name':<36}{'f1':>8}{'roc_auc':>9}{'pr_auc':>8}{'seconds':>9}{'edges/s':>11}{'rows/s':>11}")
+    for row in report:
+        if row.get("error"):
+            print(f"{row['name']:<36}  ❌ {row['error']}")
+            continue
+        values = [row.get(name) for name in ["f1", "roc_auc", "pr_auc"]]
+        print(f"{row['name']:<36}" + "".join(f"{v:>{w}.4f}" if v is not None else f"{'-':>{w}}"
+                                              for v, w in zip(values, [8, 9, 8]))
+              + f"{row['seconds']:>9.2f}{row['edges_per_sec'] or 0:>11.0f}{row['rows_per_sec'] or 0:>11.0f}")
+    scored = [row for row in report if row.get(metric) is not None]
+    if scored:
+        best = max(scored, key=lambda row: row[metric])
+        print(f"🏆 {metric} 最高：{best['name']}（{best[metric]:.4f}）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="平行評估多個 checkpoint 並比較（可加上 ensemble）")
+    parser.add_argument("checkpoints", nargs="+", help="train.engine 輸出的 best.pt")
+    parser.add_argument("--graph-path", default=None, help="預設為第一個 checkpoint 訓練時的圖")
+    parser.add_argument("--split-index-path", default=None,
+                        help="split_index.npz 或切分 shard 資料夾（預設為第一個 checkpoint 訓練時的設定）")
+    parser.add_argument("--split", choices=["train", "val", "test"], default="test")
+    parser.add_argument("--ensemble", nargs="*", choices=ENSEMBLE_METHODS, default=[],
+                        help="mean：機率平均；stack：以驗證集訓練 logistic regression")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="同時評分的 checkpoint 數（預設 CPU 核心數與 checkpoint 數的較小者）")
+    parser.add_argument("--output", default="experiments/evaluation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    batch_evaluate(args.checkpoints, graph_path=args.graph_path, split_index_path=args.split_index_path,
+                   split=args.split, ensembles=args.ensemble, workers=args.workers,
+                   output_dir=args.output, seed=args.seed)
+    print(f"⏱️ 共耗時 {time.perf_counter() - start:.1f} 秒")
@@ -1 +1,274 @@
 # 評估指標與工具函式
+#
+# 所有指標都由「可累加」的計數計算，預測結果可逐批（mini-batch / 時間窗）累加，不需保留完整的預測向量：
+# - 混淆矩陣：bincount(y_true * C + y_pred)
+# - 分數直方圖：將攻擊機率量化成 bins 個區間，bincount(y * bins + 區間)；
+#   由高分往低分累加即為每個門檻下的 TP / FP（一次掃過所有門檻），據此計算 ROC-AUC / PR-AUC
+# - 多類別時每個類別各有一組 one-vs-rest 直方圖，ROC-AUC / PR-AUC 取 macro 平均
+
+import numpy as np
+
+# 分數量化的區間數（門檻間隔 1 / SCORE_BINS）
+SCORE_BINS = 10_000
+
+
+def confusion_matrix(y_true, y_pred, num_classes):
+    """
+    以 bincount 計算混淆矩陣（列為真實類別、欄為預測類別）
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    y_pred = np.asarray(y_pred, dtype=np.int64)
+    counts = np.bincount(y_true * num_classes + y_pred, minlength=num_classes * num_classes)
+    return counts.reshape(num_classes, num_classes)
+
+
+def per_class_scores(cm):
+    """
+    每個類別的 Precision / Recall / F1 與樣本數（support）
+    """
+    cm = np.asarray(cm, dtype=np.float64)
+    tp = np.diag(cm)
+    predicted = cm.sum(axis=0)
+    actual = cm.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, actual, out=np.zeros_like(tp), where=actual > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros_like(tp), where=(precision + recall) > 0)
+    return {"precision": precision, "recall": recall, "f1": f1, "support": actual.astype(np.int64)}
+
+
+def classification_scores(cm):
+    """
+    由混淆矩陣計算 Accuracy / Precision / Recall / F1
+    二元分類時 Precision / Recall / F1 針對攻擊類別（1）；多類別時為 macro 平均
+    """
+    cm = np.asarray(cm, dtype=np.float64)
+    total = cm.sum()
+    per_class = per_class_scores(cm)
+    precision, recall, f1 = per_class["precision"], per_class["recall"], per_class["f1"]
+
+    if len(cm) == 2:
+        precision, recall, f1 = precision[1], recall[1], f1[1]
+    else:
+        present = per_class["support"] > 0
+        precision, recall, f1 = (float(v[present].mean()) if present.any() else 0.0
+                                 for v in (precision, recall, f1))
+    return {
+        "accuracy": float(np.trace(cm) / total) if total else 0.0,
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1": float(f1),
+    }
+
+
+def _score_bins(scores, bins):
+    """
+    分數 [0, 1] → 區間編號（intp，原地截斷以減少大型 (n, C) 陣列的暫存）
+    """
+    scores = np.asarray(scores)
+    if scores.dtype.kind != "f":
+        scores = scores.astype(np.float64)
+    score_bins = (scores * bins).astype(np.intp)
+    np.clip(score_bins, 0, bins - 1, out=score_bins)
+    return score_bins
+
+
+def score_histogram(y_true, scores, bins=SCORE_BINS):
+    """
+    二元標籤的分數直方圖：回傳 (2, bins)，第 0 列為負類、第 1 列為正類在各分數區間的數量
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    counts = np.bincount(y_true * bins + _score_bins(scores, bins), minlength=2 * bins)
+    return counts.reshape(2, bins)
+
+
+def one_vs_rest_histograms(y_true, probs, bins=SCORE_BINS):
+    """
+    多類別的 one-vs-rest 分數直方圖：probs 為 (n, C) 的類別機率，回傳 (C, 2, bins)
+    """
+    probs = np.asarray(probs)
+    n, num_classes = probs.shape
+    y_true = np.asarray(y_true, dtype=np.int64)
+    score_bins = _score_bins(probs, bins)
+    # 先統計全部樣本，再另外統計每列真實類別那一欄（正類），負類 = 全部 - 正類
+    rows = np.flatnonzero((y_true >= 0) & (y_true < num_classes))
+    positive = np.bincount(y_true[rows] * bins + score_bins[rows, y_true[rows]],
+                           minlength=num_classes * bins).reshape(num_classes, bins)
+    score_bins += np.arange(num_classes, dtype=np.intp) * bins
+    total = np.bincount(score_bins.ravel(), minlength=num_classes * bins).reshape(num_classes, bins)
+    return np.stack([total - positive, positive], axis=1)
+
+
+def threshold_sweep(hist):
+    """
+    由分數直方圖一次算出所有門檻（k / bins，分數 >= 門檻判為正類）下的 TP / FP / FN / TN 與
+    Precision / Recall / F1 / FPR；回傳的陣列依門檻由低到高排列
+    """
+    hist = np.asarray(hist, dtype=np.int64)
+    bins = hist.shape[1]
+    # 由高分往低分累加：第 k 個元素為分數區間 >= k 的數量
+    fp = np.cumsum(hist[0][::-1])[::-1]
+    tp = np.cumsum(hist[1][::-1])[::-1]
+    negatives, positives = hist[0].sum(), hist[1].sum()
+    fn, tn = positives - tp, negatives - fp
+
+    precision = np.divide(tp, tp + fp, out=np.ones(bins), where=(tp + fp) > 0)
+    recall = tp / positives if positives else np.zeros(bins)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros(bins), where=(precision + recall) > 0)
+    return {
+        "threshold": np.arange(bins) / bins,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "precision": precision, "recall": recall, "f1": f1,
+        "fpr": fp / negatives if negatives else np.zeros(bins),
+    }
+
+
+def best_threshold(sweep, metric="f1"):
+    """
+    回傳使 metric 最大的門檻與該門檻下的各項指標
+    """
+    k = int(np.argmax(sweep[metric]))
+    return {name: float(values[k]) for name, values in sweep.items()}
+
+
+def roc_auc(hist):
+    """
+    ROC 曲線下面積（梯形法；同一分數區間內的樣本視為同分）；只有單一類別時為 NaN
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    negatives, positives = hist[0].sum(), hist[1].sum()
+    if negatives == 0 or positives == 0:
+        return float("nan")
+    fpr = np.concatenate([[0.0], np.cumsum(hist[0][::-1]) / negatives])
+    tpr = np.concatenate([[0.0], np.cumsum(hist[1][::-1]) / positives])
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+def pr_auc(hist):
+    """
+    PR 曲線下面積（average precision：各門檻的 Precision 以 Recall 增量加權）；沒有正類時為 NaN
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    positives = hist[1].sum()
+    if positives == 0:
+        return float("nan")
+    tp = np.cumsum(hist[1][::-1])
+    fp = np.cumsum(hist[0][::-1])
+    predicted = tp + fp
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    return float(np.sum(np.diff(np.concatenate([[0.0], tp])) / positives * precision))
+
+
+class StreamingMetrics:
+    """
+    逐批累加的評估指標：update 只更新混淆矩陣與分數直方圖（記憶體固定），result 時才計算指標
+    num_classes == 2 時以攻擊機率（probs 的第 1 欄或一維分數）計算 ROC-AUC / PR-AUC；
+    多類別時為各類別 one-vs-rest 的 macro 平均
+    num_types：另外依攻擊類型（如 Label_enc）統計偵測率，二元模型可看出各攻擊類型的漏報
+    """
+
+    def __init__(self, num_classes, bins=SCORE_BINS, num_types=None, threshold=0.5):
+        self.num_classes = num_classes
+        self.bins = bins
+        self.threshold = threshold
+        self.cm = np.zeros((num_classes, num_classes), dtype=np.int64)
+        hist_shape = (2, bins) if num_classes == 2 else (num_classes, 2, bins)
+        self.hist = np.zeros(hist_shape, dtype=np.int64)
+        self.num_types = num_types
+        if num_types is not None:
+            # 每個攻擊類型被判為各類別的數量（二元模型為 正常 / 攻擊）
+            self.type_counts = np.zeros((num_types, num_classes), dtype=np.int64)
+
+    def update(self, y_true, probs=None, y_pred=None, y_type=None):
+        """
+        y_true：真實類別；probs：(n, C) 類別機率（二元時也可為一維的攻擊機率）；
+        y_pred：預測類別（省略時由 probs 取得：二元為攻擊機率 >= threshold，多類別為 argmax）
+        y_type：攻擊類型（需在建立時指定 num_types）
+        """
+        y_true = np.asarray(y_true, dtype=np.int64)
+        if probs is not None:
+            probs = np.asarray(probs)
+            if self.num_classes == 2:
+                scores = probs[:, 1] if probs.ndim == 2 else probs
+                self.hist += score_histogram(y_true, scores, self.bins)
+                if y_pred is None:
+                    y_pred = (scores >= self.threshold).astype(np.int64)
+            else:
+                self.hist += one_vs_rest_histograms(y_true, probs, self.bins)
+                if y_pred is None:
+                    y_pred = probs.argmax(axis=1)
+        if y_pred is None:
+            raise ValueError("update 需提供 probs 或 y_pred")
+        self.cm += confusion_matrix(y_true, y_pred, self.num_classes)
+        if y_type is not None:
+            if self.num_types is None:
+                raise ValueError("依攻擊類型統計需在建立時指定 num_types")
+            keys = np.asarray(y_type, dtype=np.int64) * self.num_classes + np.asarray(y_pred, dtype=np.int64)
+            self.type_counts += np.bincount(keys, minlength=self.num_types * self.num_classes
+                                            ).reshape(self.num_types, self.num_classes)
+
+    def merge(self, other):
+        """
+        合併另一個 StreamingMetrics 的計數（如多個 worker 各自累加）
+        """
+        self.cm += other.cm
+        self.hist += other.hist
+        if self.num_types is not None:
+            self.type_counts += other.type_counts
+        return self
+
+    def result(self):
+        scores = classification_scores(self.cm)
+        if self.hist.any():
+            if self.num_classes == 2:
+                scores["roc_auc"], scores["pr_auc"] = roc_auc(self.hist), pr_auc(self.hist)
+            else:
+                present = self.hist[:, 1].sum(axis=1) > 0
+                scores["roc_auc"] = float(np.nanmean([roc_auc(h) for h in self.hist[present]]))
+                scores["pr_auc"] = float(np.nanmean([pr_auc(h) for h in self.hist[present]]))
+        return scores
+
+    def per_class(self):
+        return per_class_scores(self.cm)
+
+    def sweep(self):
+        """
+        二元分類的門檻掃描（見 threshold_sweep）
+        """
+        if self.num_classes != 2:
+            raise ValueError("門檻掃描只適用於二元分類")
+        return threshold_sweep(self.hist)
+
+    def per_type(self):
+        """
+        各攻擊類型的樣本數與被判為非正常類別（類別 0 以外）的比例（偵測率）
+        """
+        support = self.type_counts.sum(axis=1)
+        detected = support - self.type_counts[:, 0]
+        rate = np.divide(detected, support, out=np.zeros(len(support)), where=support > 0)
+        return {"support": support, "detected": detected, "detection_rate": rate}
+
+
+def print_metrics_report(metrics, class_names=None, type_names=None):
+    """
+    印出 StreamingMetrics 的整體指標、各類別指標與（若有）各攻擊類型的偵測率
+    """
+    scores = metrics.result()
+    print("📊 " + "，".join(f"{name} {value:.4f}" for name, value in scores.items()))
+
+    per_class = metrics.per_class()
+    names = class_names if class_names is not None else [str(c) for c in range(metrics.num_classes)]
+    print(f"{'class':<28}{'precision':>10}{'recall':>10}{'f1':>10}{'support':>10}")
+    for c, name in enumerate(names):
+        print(f"{str(name):<28}{per_class['precision'][c]:>10.4f}{per_class['recall'][c]:>10.4f}"
+              f"{per_class['f1'][c]:>10.4f}{per_class['support'][c]:>10}")
+
+    if metrics.num_types is not None:
+        per_type = metrics.per_type()
+        names = type_names if type_names is not None else [str(t) for t in range(metrics.num_types)]
+        print(f"{'type':<28}{'support':>10}{'detected':>10}{'rate':>10}")
+        for t, name in enumerate(names):
+            if per_type["support"][t]:
+                print(f"{str(name):<28}{per_type['support'][t]:>10}{per_type['detected'][t]:>10}"
+                      f"{per_type['detection_rate'][t]:>10.4f}")
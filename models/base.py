@@ -0,0 +1,34 @@
+# 邊分類模型的共用結構：GNN 編碼節點 → 以 (h_src, h_dst, 邊特徵) 分類每條邊（流量）
+
+import torch
+from torch import nn
+
+
+class EdgeClassifier(nn.Module):
+    """
+    convs: 依序套用的圖卷積層（輸出維度皆為 hidden）
+    邊的表示為兩端節點表示與邊特徵的串接，經 MLP 輸出各類別的 logits
+    """
+
+    def __init__(self, convs, hidden, edge_dim, num_classes, dropout=0.3):
+        super().__init__()
+        self.convs = nn.ModuleList(convs)
+        self.dropout = nn.Dropout(dropout)
+        self.head = nn.Sequential(
+            nn.Linear(2 * hidden + edge_dim, hidden),
+            nn.ReLU(),
+            nn.Dropout(dropout),
+            nn.Linear(hidden, num_classes),
+        )
+
+    def encode(self, x, edge_index):
+        for conv in self.convs:
+            x = self.dropout(torch.relu(conv(x, edge_index)))
+        return x
+
+    def classify(self, h, edge_label_index, edge_label_attr):
+        src, dst = edge_label_index
+        return self.head(torch.cat([h[src], h[dst], edge_label_attr], dim=-1))
+
+    def forward(self, x, edge_index, edge_label_index, edge_label_attr):
+        return self.classify(self.encode(x, edge_index), edge_label_index, edge_label_attr)
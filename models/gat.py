@@ -0,0 +1,15 @@
+# GAT 邊分類模型（多頭注意力，各頭輸出串接後維度為 hidden）
+
+from torch_geometric.nn import GATConv
+
+from models.base import EdgeClassifier
+
+
+def build_gat(in_channels, edge_dim, num_classes, hidden=64, num_layers=2, dropout=0.3,
+              heads=4, **kwargs):
+    if hidden % heads != 0:
+        raise ValueError("hidden 必須能被 heads 整除")
+    convs = [GATConv(in_channels if i == 0 else hidden, hidden // heads, heads=heads,
+                     dropout=dropout)
+             for i in range(num_layers)]
+    return EdgeClassifier(convs, hidden, edge_dim, num_classes, dropout=dropout)
@@ -0,0 +1,10 @@
+# GCN 邊分類模型
+
+from torch_geometric.nn import GCNConv
+
+from models.base import EdgeClassifier
+
+
+def build_gcn(in_channels, edge_dim, num_classes, hidden=64, num_layers=2, dropout=0.3, **kwargs):
+    convs = [GCNConv(in_channels if i == 0 else hidden, hidden) for i in range(num_layers)]
+    return EdgeClassifier(convs, hidden, edge_dim, num_classes, dropout=dropout)
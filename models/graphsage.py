@@ -0,0 +1,11 @@
+# GraphSAGE 邊分類模型（mean aggregation，適合鄰居抽樣的 mini-batch 訓練）
+
+from torch_geometric.nn import SAGEConv
+
+from models.base import EdgeClassifier
+
+
+def build_graphsage(in_channels, edge_dim, num_classes, hidden=64, num_layers=2, dropout=0.3,
+                    **kwargs):
+    convs = [SAGEConv(in_channels if i == 0 else hidden, hidden) for i in range(num_layers)]
+    return EdgeClassifier(convs, hidden, edge_dim, num_classes, dropout=dropout)
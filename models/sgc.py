@@ -0,0 +1,23 @@
+# SGC 邊分類模型：Â^K X 已預先算好（data/precompute.py），只訓練一層線性分類器
+
+from torch import nn
+
+from models.base import EdgeClassifier
+
+
+class SGCEdgeClassifier(EdgeClassifier):
+    """
+    x 為預先傳播特徵 (節點數, 跳數 + 1, 特徵數)，只使用最後一跳；
+    邊的表示為兩端節點的 Â^K X 與邊特徵的串接，經單一線性層輸出 logits
+    """
+
+    def __init__(self, in_channels, edge_dim, num_classes):
+        super().__init__([], in_channels, edge_dim, num_classes, dropout=0.0)
+        self.head = nn.Linear(2 * in_channels + edge_dim, num_classes)
+
+    def encode(self, x, edge_index=None):
+        return x[:, -1]
+
+
+def build_sgc(in_channels, edge_dim, num_classes, **kwargs):
+    return SGCEdgeClassifier(in_channels, edge_dim, num_classes)
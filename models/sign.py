@@ -0,0 +1,27 @@
+# SIGN 邊分類模型：各跳的 Â^k X 已預先算好（data/precompute.py），訓練時不做訊息傳遞
+
+import torch
+from torch import nn
+
+from models.base import EdgeClassifier
+
+
+class SIGNEdgeClassifier(EdgeClassifier):
+    """
+    x 為預先傳播特徵 (節點數, 跳數 + 1, 特徵數)：每一跳各自經線性層，串接後再合併為 hidden 維的節點表示，
+    之後與其他模型相同（兩端節點表示 + 邊特徵 → MLP）
+    """
+
+    def __init__(self, in_channels, hops, hidden, edge_dim, num_classes, dropout=0.3):
+        super().__init__([], hidden, edge_dim, num_classes, dropout=dropout)
+        self.hop_layers = nn.ModuleList(nn.Linear(in_channels, hidden) for _ in range(hops + 1))
+        self.combine = nn.Linear((hops + 1) * hidden, hidden)
+
+    def encode(self, x, edge_index=None):
+        h = torch.cat([self.dropout(torch.relu(layer(x[:, k])))
+                       for k, layer in enumerate(self.hop_layers)], dim=-1)
+        return self.dropout(torch.relu(self.combine(h)))
+
+
+def build_sign(in_channels, edge_dim, num_classes, hidden=64, hops=2, dropout=0.3, **kwargs):
+    return SIGNEdgeClassifier(in_channels, hops, hidden, edge_dim, num_classes, dropout=dropout)
@@ -1,75 +1,180 @@
-# 功能： 讀取原始合併檔，做缺值處理、欄位挑選、標籤編碼，輸出清理乾淨但未標準化的 CSV
+# 功能： 讀取原始合併檔，做缺值處理、欄位挑選、標籤編碼，輸出清理乾淨但未標準化的資料與清理報告
 
 import os  # 匯入 os 模組，用來處理檔案與路徑相關操作
+import numpy as np  # 向量化找出 NaN / Inf 與計算中位數
 import pandas as pd  # 匯入 pandas 做資料處理
-from sklearn.preprocessing import LabelEncoder  # 用於標籤編碼
 
+from utils.helpers import read_table, write_table  # 中間檔讀寫（Parquet / CSV）
 
-def clean_data(input_path, output_path):
+# 原始檔以 ISO-8859-1 讀入後會出現亂碼的標籤 → 修正後的名稱
+GARBLED_LABELS = {
+    'Web Attack ï¿½ Brute Force': 'Web Attack - Brute Force',
+    'Web Attack ï¿½ Sql Injection': 'Web Attack - Sql Injection',
+    'Web Attack ï¿½ XSS': 'Web Attack - XSS'
+}
+
+
+def repair_labels(labels):
     """
-    清理資料主函式
-    參數:
-        input_path: str, 原始合併後的 CSV 檔案路徑
-        output_path: str, 清理後（但未標準化）的資料儲存路徑
+    修正亂碼標籤；category 型態直接改 category 名稱，不需逐筆取代
+    """
+    if isinstance(labels.dtype, pd.CategoricalDtype):
+        categories = labels.cat.categories
+        renamed = [GARBLED_LABELS.get(c, c) for c in categories]
+        if len(set(renamed)) == len(categories):
+            return labels.cat.rename_categories(renamed)
+        return labels.astype(str).replace(GARBLED_LABELS).astype('category')
+    return labels.replace(GARBLED_LABELS)
+
+
+def encode_labels(labels):
     """
+    標籤編碼（結果與 sklearn LabelEncoder.fit_transform 相同：類別依字母排序編號）
+    以 category 代碼查表，不需對數百萬個字串逐一排序
+    回傳 (編碼後的 int64 陣列, 類別清單)
+    """
+    categorical = labels.astype('category')
+    present = np.unique(categorical.cat.codes.to_numpy())
+    present = present[present >= 0]
+    classes = np.array(sorted(categorical.cat.categories[present]), dtype=object)
+    lookup = np.full(len(categorical.cat.categories), -1, dtype=np.int64)
+    lookup[categorical.cat.categories.get_indexer(classes)] = np.arange(len(classes))
+    return lookup[categorical.cat.codes.to_numpy()], classes
+
 
-    # 讀取資料
-    df = pd.read_csv(input_path)
-    print(f"讀取資料，shape: {df.shape}")
+def clean_frame(df):
+    """
+    清理資料（記憶體內版本）：缺值處理、Inf 清除、標籤修正與編碼
+    以 NumPy 對每種浮點型態的欄位區塊一次找出 NaN / ±Inf、一次算出所有需要的中位數，
+    補值與刪列都不會改變欄位 dtype（整數欄位不可能有 NaN / Inf，不需檢查）
+    參數:
+        df: DataFrame, 原始合併後的資料（含缺值的欄位會直接在原物件上補值）
+    回傳:
+        (清理後但未標準化的 DataFrame, 清理報告 dict)
+        報告內容：輸入 / 輸出 / 刪除筆數、各欄 NaN / +Inf / -Inf 數量、補值用的中位數、
+        整欄皆為 NaN（無法補值，改為刪列）的欄位、
+        標籤類別與各類別筆數（EDA 繪圖直接使用，不必重讀資料）
+    """
+    rows_in = len(df)
+    report = {
+        "rows_in": rows_in,
+        "nan_counts": {},
+        "pos_inf_counts": {},
+        "neg_inf_counts": {},
+        "medians": {},
+        "all_nan_columns": [],
+    }
 
     # 欄位挑選（可依需求修改）
     # selected_columns = ['Feature1', 'Feature2', 'Label']
     # df = df[selected_columns]
 
-    # 缺值處理：數值欄位以中位數補值
-    missing_ratio = df.isnull().sum() / len(df)
-    print("各欄位缺值比例:")
-    print(missing_ratio[missing_ratio > 0])
-
-    numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns
-    for col in numeric_cols:
-        if df[col].isnull().sum() > 0:
-            median_val = df[col].median()
-            df[col].fillna(median_val, inplace=True)
-            print(f"{col} 補中位數 {median_val}")
-
-    # 清理 Inf / -Inf，再次移除缺失值
-    df.replace([float('inf'), float('-inf')], pd.NA, inplace=True)
-    before_drop = len(df)
-    df.dropna(inplace=True)
-    after_drop = len(df)
-    print(f"移除 NaN/Inf 後剩餘筆數: {after_drop} (移除 {before_drop - after_drop} 筆)")
-
-    # 斷言：最後安全檢查
-    assert df.isnull().sum().sum() == 0, "尚有 NaN 存在"
-    assert not df.isin([float('inf'), float('-inf')]).values.any(), "尚有 Inf 存在"
-    print("確認無 NaN / Inf")
+    drop_mask = np.zeros(rows_in, dtype=bool)
+    float_cols = df.select_dtypes(include=['floating']).columns
+    for dtype in df[float_cols].dtypes.unique():
+        cols = [col for col in float_cols if df[col].dtype == dtype]
+        block = df[cols].to_numpy(copy=True)  # pandas 3 的 copy-on-write 下 to_numpy() 為唯讀 view
+
+        # 單次掃描找出 NaN / ±Inf
+        nan_mask = np.isnan(block)
+        inf_mask = np.isinf(block)
+        nan_counts = nan_mask.sum(axis=0)
+        pos_inf_counts = (inf_mask & (block > 0)).sum(axis=0)
+        neg_inf_counts = inf_mask.sum(axis=0) - pos_inf_counts
+
+        # 整欄皆為 NaN 的欄位沒有中位數可補：與原本的 dropna 相同，含 NaN 的列整列移除
+        all_nan = nan_counts == len(block)
+        if len(block) and all_nan.any():
+            drop_mask |= nan_mask[:, all_nan].any(axis=1)
+            report["all_nan_columns"].extend(col for col, flag in zip(cols, all_nan) if flag)
+
+        # 缺值處理：含 NaN 的欄位以中位數補值（一次算出所有欄位的中位數；與 pandas 相同，Inf 會參與排序）
+        fill_idx = np.flatnonzero((nan_counts > 0) & ~all_nan)
+        if len(fill_idx):
+            medians = np.nanmedian(block[:, fill_idx], axis=0)
+            for j, median_val in zip(fill_idx, medians):
+                column = block[:, j]
+                column[nan_mask[:, j]] = median_val
+                df[cols[j]] = column
+                report["medians"][cols[j]] = float(median_val)
+
+        # 含 Inf 的列整列移除
+        drop_mask |= inf_mask.any(axis=1)
+
+        for j, col in enumerate(cols):
+            if nan_counts[j]:
+                report["nan_counts"][col] = int(nan_counts[j])
+            if pos_inf_counts[j]:
+                report["pos_inf_counts"][col] = int(pos_inf_counts[j])
+            if neg_inf_counts[j]:
+                report["neg_inf_counts"][col] = int(neg_inf_counts[j])
+
+    # 非數值欄位（如 Label）有缺值的列也移除
+    other_cols = df.columns.difference(df.select_dtypes(include=['number']).columns)
+    if len(other_cols):
+        drop_mask |= df[other_cols].isna().any(axis=1).to_numpy()
+    if drop_mask.any():
+        # take 直接產生新的 DataFrame（不會被標記為 view，後續新增欄位不會觸發 SettingWithCopy）
+        df = df.take(np.flatnonzero(~drop_mask))
 
     # 修正亂碼標籤
-    df['Label'] = df['Label'].replace({
-        'Web Attack ï¿½ Brute Force': 'Web Attack - Brute Force',
-        'Web Attack ï¿½ Sql Injection': 'Web Attack - Sql Injection',
-        'Web Attack ï¿½ XSS': 'Web Attack - XSS'
-    })
+    df['Label'] = repair_labels(df['Label'])
 
     # 標籤編碼：將 'Label' 欄位轉為整數形式
-    label_encoder = LabelEncoder()
-    df['Label_enc'] = label_encoder.fit_transform(df['Label'])
+    df['Label_enc'], classes = encode_labels(df['Label'])
+
+    report["rows_out"] = len(df)
+    report["rows_dropped"] = rows_in - len(df)
+    report["label_classes"] = classes.tolist()
+    counts = np.bincount(df['Label_enc'].to_numpy(), minlength=len(classes))
+    report["label_counts"] = {label: int(n) for label, n in zip(classes, counts)}
+    return df, report
+
+
+def print_cleaning_report(report):
+    """
+    印出清理報告摘要
+    """
+    print(f"輸入資料筆數: {report['rows_in']}")
+    for col, n in report["nan_counts"].items():
+        if col in report["medians"]:
+            print(f"{col} 缺值 {n} 筆，補中位數 {report['medians'][col]}")
+        else:
+            print(f"⚠️ {col} 整欄皆為 NaN（{n} 筆），無法補值，含缺值的列已移除")
+    for col, n in report["pos_inf_counts"].items():
+        print(f"{col} +Inf {n} 筆")
+    for col, n in report["neg_inf_counts"].items():
+        print(f"{col} -Inf {n} 筆")
+    print(f"移除 NaN/Inf 後剩餘筆數: {report['rows_out']} (移除 {report['rows_dropped']} 筆)")
     print("標籤編碼對照表:")
-    print(df['Label'].unique())
-    print(dict(zip(label_encoder.classes_,
-          label_encoder.transform(label_encoder.classes_))))
+    print({label: i for i, label in enumerate(report["label_classes"])})
+
+
+def clean_data(input_path, output_path):
+    """
+    清理資料主函式
+    參數:
+        input_path: str, 原始合併後的資料路徑（.parquet / .feather / .csv）
+        output_path: str, 清理後（但未標準化）的資料儲存路徑，格式依副檔名決定
+    回傳:
+        清理報告 dict（見 clean_frame）
+    """
+
+    # 讀取資料並清理
+    df, report = clean_frame(read_table(input_path))
+    print_cleaning_report(report)
 
     # 儲存清理後的資料
-    df.to_csv(output_path, index=False)
+    write_table(df, output_path)
     print(f"清理後資料儲存至 {output_path}")
+    return report
 
 
 if __name__ == "__main__":
     # 設定檔案路徑（使用絕對路徑方便跨目錄執行）
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    input_csv = os.path.join(BASE_DIR, "../data/processed/merged.csv")
-    output_csv = os.path.join(BASE_DIR, "../data/processed/cleaned.csv")
+    input_path = os.path.join(BASE_DIR, "../data/processed/merged.parquet")
+    output_path = os.path.join(BASE_DIR, "../data/processed/cleaned.parquet")
 
     # 執行清理流程
-    clean_data(input_csv, output_csv)
+    clean_data(input_path, output_path)
@@ -1,9 +1,33 @@
 # 切分訓練、驗證、測試集
+#
+# 切分只產生各集合的列位置（int64 index 陣列），不複製 DataFrame；寫檔時才依位置逐欄取出
+# 需要的欄位。相同資料與 seed 的切分結果固定。
+#
+# 切分模式：
+# - random（預設）：分層隨機切分 70/10/20；stratify="binary" 依 Label_Binary，
+#   "multi" 依攻擊類別（Label_enc），稀有類別也會依比例分到各集合
+# - host：以來源 IP 為群組隨機分配（同一台主機的流量只會在一個集合），各群組依其多數類別分層
+# - day：依 Timestamp 的日期切分，最後幾天為測試集、其前為驗證集（跨日測試，不打散時間）
+# - window：以 data.make_graph 相同的 tumbling 時間窗為單位，依時間順序累積約 70/10/20 的筆數切開
+#   （時間窗不跨越切點，訓練集不會看到未來的流量）
 
 import os
+import numpy as np
 import pandas as pd
 import json
-from sklearn.model_selection import train_test_split
+
+from data.make_graph import assign_windows, parse_timestamps, to_seconds
+from preprocess.split_shards import SHARD_DIR, write_split_shards
+from utils.helpers import add_label_binary, binary_labels, read_table, table_columns, write_table
+
+SPLIT_MODES = ["random", "host", "day", "window"]
+STRATIFY = ["binary", "multi"]
+SPLITS = ["train", "val", "test"]
+SPLIT_INDEX_FILE = "split_index.npz"
+# 切分結果的格式：npy 為 memmap shard（訓練時不必重新解析），其餘為資料表
+SPLIT_FORMATS = ["npy", "parquet", "feather", "csv"]
+# host 模式的群組欄位
+HOST_COLUMN = 'Source IP'
 
 
 def load_selected_features(json_path):
@@ -15,64 +39,260 @@ def load_selected_features(json_path):
     return selected_features
 
 
-def add_label_binary(df):
+def split_columns(mode="random", stratify="binary"):
     """
-    自動加 Label_Binary 欄位
+    除了特徵與 Label_Binary 之外，切分還需要讀取的欄位
     """
-    df['Label_Binary'] = df['Label'].apply(lambda x: 0 if x == 'BENIGN' else 1)
-    return df
+    columns = []
+    if mode in ("day", "window"):
+        columns.append('Timestamp')
+    if mode == "host":
+        columns.append(HOST_COLUMN)
+    if stratify == "multi":
+        columns.append('Label_enc')
+    return columns
 
 
-def load_data(preprocessed_path, selected_features):
+def load_data(preprocessed_path, selected_features, extra_columns=()):
     """
-    讀取處理好的資料，只保留選定的特徵與 Label_Binary 欄位
+    讀取處理好的資料，只保留選定的特徵與 Label_Binary 欄位（以及 extra_columns，如 Timestamp）
+    只讀取需要的欄位（Parquet / Feather 不會解析其他欄位）
     """
-    df = pd.read_csv(preprocessed_path)
+    label_col = 'Label_Binary' if 'Label_Binary' in table_columns(
+        preprocessed_path) else 'Label'
+    extra_columns = list(extra_columns)
+    df = read_table(preprocessed_path, columns=selected_features + extra_columns + [label_col])
 
     if 'Label_Binary' not in df.columns:
         df = add_label_binary(df)
 
-    return df[selected_features + ['Label_Binary']]
+    return df[selected_features + extra_columns + ['Label_Binary']]
 
 
-def split_data(df, test_size=0.2, val_size=0.1, random_state=42):
+def _label_binary(df):
+    """
+    df 的 Label_Binary（沒有該欄位時由 Label 計算，不修改 df）
+    """
+    if 'Label_Binary' in df.columns:
+        return df['Label_Binary'].to_numpy()
+    return binary_labels(df['Label'])
+
+
+def stratify_labels(df, stratify="binary"):
+    """
+    分層用的標籤陣列：binary 為 Label_Binary，multi 為 Label_enc（沒有時由 Label 編碼）
+    """
+    if stratify not in STRATIFY:
+        raise ValueError(f"stratify 必須是 {STRATIFY} 之一")
+    if stratify == "binary":
+        return _label_binary(df)
+    if 'Label_enc' in df.columns:
+        return df['Label_enc'].to_numpy()
+    return pd.factorize(df['Label'], sort=True)[0]
+
+
+def _by_assignment(assignment, order=None):
+    """
+    每列所屬集合（0 / 1 / 2）→ {"train", "val", "test"} 的列位置
+    order 指定時依該順序排列（時間切分保留時間順序），否則遞增排序
+    """
+    if order is None:
+        return {name: np.flatnonzero(assignment == i) for i, name in enumerate(SPLITS)}
+    assignment = assignment[order]
+    return {name: order[assignment == i] for i, name in enumerate(SPLITS)}
+
+
+def stratified_indices(labels, test_size=0.2, val_size=0.1, seed=42):
+    """
+    分層隨機切分：每個類別的列以 seed 決定的隨機順序排列，前 round(類別筆數 × test_size) 筆為測試集、
+    接著 round(類別筆數 × val_size) 筆為驗證集，其餘為訓練集
+    只對標籤陣列操作，回傳各集合的列位置（遞增排序）
+    """
+    _, codes, counts = np.unique(np.asarray(labels), return_inverse=True, return_counts=True)
+    codes = codes.reshape(-1)
+    rng = np.random.default_rng(seed)
+    # 依類別分組、類別內隨機排列（排序鍵 = 類別編號 + [0, 1) 的亂數，一次 argsort），
+    # rank 為每列在所屬類別內的名次
+    order = np.argsort(codes + rng.random(len(codes)))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[order] = np.arange(len(codes)) - starts[codes[order]]
+
+    n_test = np.round(counts * test_size).astype(np.int64)
+    n_val_end = n_test + np.round(counts * val_size).astype(np.int64)
+    assignment = np.where(rank < n_test[codes], 2, np.where(rank < n_val_end[codes], 1, 0))
+    return _by_assignment(assignment)
+
+
+def group_indices(groups, labels=None, test_size=0.2, val_size=0.1, seed=42):
+    """
+    以群組為單位切分（同一群組的列只會在一個集合）：群組依 seed 隨機排列後，
+    以累積筆數在 1 - test_size - val_size 與 1 - test_size 處切開（群組依其中點歸屬）
+    labels 指定時先依每個群組的多數類別分層，各層分別切分
+    回傳各集合的列位置（遞增排序）
+    """
+    group_codes, uniques = pd.factorize(np.asarray(groups))
+    n_groups = len(uniques)
+    sizes = np.bincount(group_codes, minlength=n_groups)
+    if labels is None:
+        strata = np.zeros(n_groups, dtype=np.int64)
+    else:
+        label_codes, label_values = pd.factorize(np.asarray(labels), sort=True)
+        n_labels = len(label_values)
+        per_group = np.bincount(group_codes * n_labels + label_codes,
+                                minlength=n_groups * n_labels).reshape(n_groups, n_labels)
+        strata = per_group.argmax(axis=1)
+
+    rng = np.random.default_rng(seed)
+    # 依分層排序、層內隨機排列，各層分別計算累積比例
+    order = np.lexsort((rng.random(n_groups), strata))
+    sorted_sizes, sorted_strata = sizes[order], strata[order]
+    stratum_total = np.bincount(sorted_strata, weights=sorted_sizes)
+    stratum_start = np.concatenate([[0], np.cumsum(stratum_total)[:-1]])
+    mid = (np.cumsum(sorted_sizes) - sorted_sizes / 2 - stratum_start[sorted_strata]) \
+        / stratum_total[sorted_strata]
+    group_split = np.empty(n_groups, dtype=np.int64)
+    group_split[order] = np.where(mid >= 1 - test_size, 2,
+                                  np.where(mid >= 1 - test_size - val_size, 1, 0))
+    return _by_assignment(group_split[group_codes])
+
+
+def split_by_time(df, mode, window="1h", test_size=0.2, val_size=0.1, fix_12h=True):
+    """
+    依 Timestamp 切分，不打散時間順序（各集合內的列位置依時間排序）
+    - day：最後 round(天數 × test_size) 天（至少 1 天）為測試集，其前 round(天數 × val_size) 天
+      （至少 1 天）為驗證集，其餘為訓練集
+    - window：以 window 長度的 tumbling 時間窗為單位，依時間順序累積筆數，
+      在最接近 70% / 80% 的時間窗邊界切開
+    回傳各集合的列位置
+    """
+    timestamps = parse_timestamps(df['Timestamp'], fix_12h=fix_12h)
+    unit_seconds = 86_400 if mode == "day" else to_seconds(window)
+    units = assign_windows(timestamps, unit_seconds)
+    order = np.argsort(timestamps, kind='stable')
+    unique_units, counts = np.unique(units, return_counts=True)
+
+    if mode == "day":
+        n_units = len(unique_units)
+        if n_units < 3:
+            raise ValueError(f"day 切分至少需要 3 天的資料（目前 {n_units} 天）")
+        n_test = max(1, round(n_units * test_size))
+        n_val = max(1, round(n_units * val_size))
+        val_start, test_start = n_units - n_test - n_val, n_units - n_test
+    else:
+        cum = np.cumsum(counts) / counts.sum()
+        val_start = int(np.searchsorted(cum, 1 - test_size - val_size, side='left')) + 1
+        test_start = int(np.searchsorted(cum, 1 - test_size, side='left')) + 1
+        test_start = min(max(test_start, val_start + 1), len(unique_units) - 1)
+        val_start = min(val_start, test_start - 1)
+        if val_start < 1:
+            raise ValueError("時間窗數量不足，無法依時間切分；請改用較短的 window")
+
+    position = np.searchsorted(unique_units, units)
+    assignment = np.where(position >= test_start, 2, np.where(position >= val_start, 1, 0))
+
+    def describe(lo, hi):
+        start = np.datetime64(int(unique_units[lo] * unit_seconds), "s")
+        end = np.datetime64(int((unique_units[hi - 1] + 1) * unit_seconds), "s")
+        return f"{start} ~ {end}"
+    print(f"🕒 依時間切分（{mode}）：訓練 {describe(0, val_start)}、"
+          f"驗證 {describe(val_start, test_start)}、測試 {describe(test_start, len(unique_units))}")
+    return _by_assignment(assignment, order=order)
+
+
+def split_indices(df, mode="random", window="1h", stratify="binary", seed=42,
+                  test_size=0.2, val_size=0.1):
     """
-    切分成訓練、驗證、測試集（比例 70/10/20）
+    切分成訓練、驗證、測試集（比例 70/10/20），只回傳列位置，不複製 df
+    mode: random / host / day / window（見檔頭說明；host 需要 Source IP，day / window 需要 Timestamp）
+    stratify: binary / multi（random 與 host 模式的分層依據）
+    回傳 {"train": 列位置, "val": ..., "test": ...}（int64 numpy）
     """
-    # 先切出測試集
-    train_val_df, test_df = train_test_split(
-        df, test_size=test_size, random_state=random_state, stratify=df['Label_Binary'])
+    if mode not in SPLIT_MODES:
+        raise ValueError(f"mode 必須是 {SPLIT_MODES} 之一")
+    if mode in ("day", "window"):
+        indices = split_by_time(df, mode, window=window, test_size=test_size, val_size=val_size)
+    elif mode == "host":
+        indices = group_indices(df[HOST_COLUMN].to_numpy(), stratify_labels(df, stratify),
+                                test_size=test_size, val_size=val_size, seed=seed)
+    else:
+        indices = stratified_indices(stratify_labels(df, stratify), test_size=test_size,
+                                     val_size=val_size, seed=seed)
+    print(f"📊 切分結果：訓練 {len(indices['train'])} 筆、驗證 {len(indices['val'])} 筆、"
+          f"測試 {len(indices['test'])} 筆")
+    return indices
 
-    # 再從剩下的切出驗證集
-    val_relative_size = val_size / (1 - test_size)
-    train_df, val_df = train_test_split(
-        train_val_df, test_size=val_relative_size, random_state=random_state, stratify=train_val_df['Label_Binary'])
 
+def take_columns(df, positions, columns):
+    """
+    依列位置逐欄取出指定欄位（不先複製整個 df），index 保留原本的列標籤
+    """
+    return pd.DataFrame({col: df[col].to_numpy()[positions] for col in columns},
+                        index=df.index[positions])
+
+
+def split_data(df, test_size=0.2, val_size=0.1, random_state=42):
+    """
+    切分成訓練、驗證、測試集（比例 70/10/20，依 Label_Binary 分層）
+    相容舊介面的包裝：以 split_indices 的列位置取出各集合的 DataFrame
+    """
+    indices = stratified_indices(_label_binary(df), test_size=test_size, val_size=val_size,
+                                 seed=random_state)
+    train_df, val_df, test_df = (take_columns(df, indices[name], df.columns) for name in SPLITS)
     return train_df, val_df, test_df
 
 
 def save_splits(train_df, val_df, test_df, output_dir):
     """
-    存成 train.csv、val.csv、test.csv
+    存成 train.csv、val.csv、test.csv（相容舊介面；依列位置寫出其他格式見 save_split_indices）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name, split_df in zip(SPLITS, [train_df, val_df, test_df]):
+        write_table(split_df, os.path.join(output_dir, f"{name}.csv"))
+
+    print(f"✅ 已將訓練、驗證、測試資料存到：{output_dir}")
+
+
+def save_split_indices(df, indices, selected_features, output_dir, fmt="csv"):
+    """
+    依 split_indices 的列位置存成 train / val / test（fmt: csv / parquet / feather / npy），
+    只寫出選定特徵與 Label_Binary
+    fmt="npy" 時寫成 output_dir/splits/ 下的 memmap shard（見 preprocess/split_shards.py），
+    不寫資料表
     """
     os.makedirs(output_dir, exist_ok=True)
-    # 訓練資料（Training Set）→ 模型學習用
-    train_df.to_csv(os.path.join(output_dir, "train.csv"), index=False)
-    # 驗證資料（Validation Set）→ 調整超參數用
-    val_df.to_csv(os.path.join(output_dir, "val.csv"), index=False)
-    # 測試資料（Test Set）→ 最終評估模型泛化能力用
-    test_df.to_csv(os.path.join(output_dir, "test.csv"), index=False)
+    if fmt not in SPLIT_FORMATS:
+        raise ValueError(f"fmt 必須是 {SPLIT_FORMATS} 之一")
+    labels = _label_binary(df)
+    if fmt == "npy":
+        write_split_shards(df, indices, os.path.join(output_dir, SHARD_DIR), selected_features,
+                           labels)
+    else:
+        # 訓練資料（Training Set）→ 模型學習用；驗證資料（Validation Set）→ 調整超參數用；
+        # 測試資料（Test Set）→ 最終評估模型泛化能力用
+        for name in SPLITS:
+            split_df = take_columns(df, indices[name], selected_features)
+            split_df['Label_Binary'] = labels[indices[name]]
+            write_table(split_df, os.path.join(output_dir, f"{name}.{fmt}"))
+    # 各集合在 preprocessed 中的列位置（訓練時用來對應到圖上的邊，見 train/engine.py）
+    rows = df.index.to_numpy()
+    np.savez(os.path.join(output_dir, SPLIT_INDEX_FILE),
+             **{name: rows[indices[name]] for name in SPLITS})
 
     print(f"✅ 已將訓練、驗證、測試資料存到：{output_dir}")
 
 
-def split_data_and_save(preprocessed_path, selected_features_path, output_dir):
+def split_data_and_save(preprocessed_path, selected_features_path, output_dir, fmt="csv",
+                        mode="random", window="1h", stratify="binary", seed=42):
     """
-    封裝好的主函式：讀入資料 → 加欄位 → 切分資料 → 存檔
+    封裝好的主函式：讀入資料（只讀需要的欄位）→ 切分 → 存檔
+    fmt 指定切分結果的格式（csv / parquet / feather / npy，見 save_split_indices）
+    mode / window / stratify / seed 見 split_indices
+    回傳 (讀入筆數, 各集合筆數 dict)
     """
     selected_features = load_selected_features(selected_features_path)
-    df = load_data(preprocessed_path, selected_features)
-    train_df, val_df, test_df = split_data(df)
-    print(
-        f"📊 切分結果：訓練 {len(train_df)} 筆、驗證 {len(val_df)} 筆、測試 {len(test_df)} 筆")
-    save_splits(train_df, val_df, test_df, output_dir)
+    df = load_data(preprocessed_path, selected_features,
+                   extra_columns=split_columns(mode, stratify))
+    indices = split_indices(df, mode=mode, window=window, stratify=stratify, seed=seed)
+    save_split_indices(df, indices, selected_features, output_dir, fmt=fmt)
+    return len(df), {name: len(indices[name]) for name in SPLITS}
@@ -4,60 +4,91 @@ import os                        # 用於處理檔案與資料夾路徑，例如
 import pandas as pd              # 用於資料讀取與處理（表格型資料，如 CSV），提供 DataFrame 結構
 import numpy as np               # 提供數值運算功能，例如矩陣操作、統計計算
 
+from eda.render import FigureRenderer
+from utils.helpers import add_label_binary, feature_columns, read_table
 from preprocess.plot_correlation import (
     plot_correlation_heatmap,
     plot_feature_correlation_bar,
 )
 
+# 排序前先四捨五入到此位數：內容相同的欄位（如 Total Fwd Packets / Subflow Fwd Packets）
+# 經矩陣乘法算出的相關係數只差最後幾個 bit；取整後與逐欄 .corr 一樣完全相同，
+# 排序與後續剔除高度相關特徵時保留的欄位也就與原本的實作一致
+CORR_SORT_DECIMALS = 12
 
-def load_data(input_csv_path):
-    """
-    讀取預處理好的資料
-    """
-    return pd.read_csv(input_csv_path)
 
-
-def add_label_binary(df):
+def load_data(input_path):
     """
-    將 Label 轉成二元(0 = BENIGN, 1 = 其他）
+    讀取預處理好的資料（.parquet / .feather / .csv）
     """
-
-    df['Label_Binary'] = df['Label'].apply(lambda x: 0 if x == 'BENIGN' else 1)
-    return df
+    return read_table(input_path)
 
 
 def select_numeric_features(df):
     """
-    選出數值型態的特徵欄位（不包含 Label & Label_Binary & Label_enc)
+    選出數值型態的特徵欄位（不包含 Label & Label_Binary & Label_enc，以及 IP / Port 等識別欄)
     """
-
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-
-    # 排除目標欄:['Label', 'Label_Binary', 'Label_enc']
-    exclude_cols = [col for col in [
-        'Label', 'Label_Binary', 'Label_enc'] if col in df.columns]
-
-    return [col for col in numeric_cols if col not in exclude_cols]
+    return feature_columns(df)
 
 
-def compute_feature_correlation(df, features):
+def correlation_engine(df, features, label_col='Label_Binary', sample_rows=None,
+                       dtype=np.float64, random_state=42):
+    """
+    一次算出「特徵與標籤」以及「特徵兩兩之間」的 Pearson 相關係數：
+    把特徵矩陣與標籤放在同一個矩陣中，中心化並除以範數後，做一次 BLAS 矩陣乘法 Zᵀ Z
+    參數:
+        features: list, 特徵欄位
+        label_col: str or None, 標籤欄位（None 時只算特徵間的相關係數）
+        sample_rows: int or None, 只用隨機抽樣的列數計算（None = 全部）
+        dtype: np.float64（預設，結果與 pandas .corr 一致）或 np.float32（記憶體減半，精度約 1e-6）
+    回傳:
+        (與標籤的相關係數 Series 或 None, 特徵相關係數矩陣 DataFrame)
+        常數欄位的相關係數為 NaN（與 pandas 相同）
+    """
+    columns = list(features) + ([label_col] if label_col else [])
+    n_rows = len(df)
+    if sample_rows and n_rows > sample_rows:
+        rng = np.random.default_rng(random_state)
+        rows = np.sort(rng.choice(n_rows, size=sample_rows, replace=False))
+        z = df[columns].iloc[rows].to_numpy(dtype=dtype)
+    else:
+        z = df[columns].to_numpy(dtype=dtype)
+
+    # 標準化（就地運算，不再額外複製矩陣）
+    z -= z.mean(axis=0, dtype=np.float64).astype(dtype)
+    norms = np.sqrt(np.einsum('ij,ij->j', z, z, dtype=np.float64))
+    constant = norms == 0
+    norms[constant] = 1.0
+    z /= norms.astype(dtype)
+
+    corr = (z.T @ z).astype(np.float64)
+    corr[constant, :] = np.nan
+    corr[:, constant] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+
+    n_features = len(features)
+    corr_matrix = pd.DataFrame(corr[:n_features, :n_features],
+                               index=features, columns=features)
+    corr_with_label = None
+    if label_col:
+        corr_with_label = pd.Series(corr[:n_features, n_features], index=features)
+    return corr_with_label, corr_matrix
+
+
+def compute_feature_correlation(df, features, corr_with_label=None):
     """
     計算每個數值特徵與 Label_Binary 的 Pearson 相關係數
     回傳一個 Series，index 是特徵名稱，值是相關係數（float）
     並依絕對值由大到小排序。
+    corr_with_label: 已由 correlation_engine 算好的結果（None 時重新計算）
     """
-    corr_with_label = {}
-    for feature in features:
-        try:
-            corr = df[feature].corr(df['Label_Binary'])
-            corr_with_label[feature] = float(corr)
-        except Exception as e:
-            print(f"⚠️ 特徵 {feature} 計算相關係數失敗：{e}")
-            corr_with_label[feature] = np.nan
+    if corr_with_label is None:
+        corr_with_label, _ = correlation_engine(df, features)
 
-    corr_series = pd.Series(corr_with_label).astype(float).dropna()
+    corr_series = corr_with_label.astype(float).dropna()
 
-    return corr_series.sort_values(key=lambda x: abs(x), ascending=False)
+    return corr_series.sort_values(key=lambda x: abs(x).round(CORR_SORT_DECIMALS),
+                                   ascending=False)
 
 
 def filter_by_correlation(corr_series, threshold=0.05):
@@ -68,78 +99,159 @@ def filter_by_correlation(corr_series, threshold=0.05):
     return corr_series[abs(corr_series) >= threshold].index.tolist()
 
 
-def remove_highly_correlated_features(df, features, threshold=0.9):
+def remove_highly_correlated_features(df, features, threshold=0.9, corr_matrix=None):
     """
     刪除兩兩相關係數大於 threshold 的特徵，只保留其中一個
+    依 features 的順序（相關係數由大到小）：只要和排在前面的任一特徵相關係數 > threshold 就刪除；
+    以上三角矩陣一次判斷，回傳保留的特徵（維持原順序，結果固定）
+    corr_matrix: 已算好的相關係數矩陣（需涵蓋 features；None 時重新計算）
     """
+    if corr_matrix is None:
+        _, corr_matrix = correlation_engine(df, features, label_col=None)
 
-    corr_matrix = df[features].corr().abs()
-    to_keep = set(features)
-
-    for i in range(len(features)):
-        for j in range(i + 1, len(features)):
-            f1, f2 = features[i], features[j]
-            if corr_matrix.loc[f1, f2] > threshold and f2 in to_keep:
-                to_keep.remove(f2)
-    return list(to_keep)
+    abs_corr = np.abs(corr_matrix.loc[features, features].to_numpy())
+    redundant = np.triu(abs_corr > threshold, k=1).any(axis=0)
+    return [feature for feature, drop in zip(features, redundant) if not drop]
 
 
-def run_feature_selection(
-    input_csv_path,
-    feature_output_path=None,
+def correlation_selection(
+    df,
     corr_threshold=0.05,
     high_corr_threshold=0.9,
-    barplot_output_path=None,
-    heatmap_output_path=None
+    sample_rows=None,
+    corr_dtype=np.float64
 ):
     """
-    主流程：執行特徵篩選，並視覺化（條狀圖＋熱圖）
-    並將選出特徵寫入 JSON
+    特徵篩選的計算部分（不寫檔、不繪圖）：會在 df 上新增 Label_Binary 欄位
+    回傳 dict：
+        final_features: 最終特徵清單
+        corr_matrix: 數值特徵相關係數矩陣
+        corr_series: 與 Label_Binary 的相關係數（絕對值由大到小，已去除 NaN）
+        selected_features: 通過 corr_threshold 的特徵
+    繪圖只需要這些聚合結果（見 save_selection_outputs），可快取後直接重繪
+    計算相關係數失敗時回傳 None
     """
-    df = load_data(input_csv_path)
-
     # 步驟 1：加入二元 Label
     df = add_label_binary(df)
 
     # 步驟 2：選數值特徵
     numeric_features = select_numeric_features(df)
 
-    # 步驟 3：計算每個數值特徵與 Label_Binary 的相關係數
+    # 步驟 3：一次算出與 Label_Binary 的相關係數及特徵相關係數矩陣
     try:
+        corr_with_label, corr_matrix = correlation_engine(
+            df, numeric_features, sample_rows=sample_rows, dtype=corr_dtype)
         corr_series = compute_feature_correlation(
-            df, numeric_features).dropna()
+            df, numeric_features, corr_with_label=corr_with_label).dropna()
     except Exception as e:
         print("計算相關係數時發生錯誤：", e)
-        return []
+        return None
 
     print("與 Label_Binary 的相關係數（絕對值由大到小）:")
     print(corr_series)
 
-    # 步驟 4：條狀圖（前 0.05 篩選）
-    # 篩選後的相關係數條狀圖
-    filtered_corr_series = corr_series[abs(corr_series) >= corr_threshold]
-
-    if barplot_output_path:
-        plot_feature_correlation_bar(
-            filtered_corr_series, save_path=barplot_output_path)
-
-    # 步驟 5：根據門檻篩選特徵
+    # 步驟 4：根據門檻篩選特徵
     selected_features = filter_by_correlation(
         corr_series, threshold=corr_threshold)
     print(f"\n篩選後的特徵數量（相關係數門檻 {corr_threshold}）：{len(selected_features)}")
 
-    # 步驟 6：剔除高度相關特徵
+    # 步驟 5：剔除高度相關特徵
     final_features = remove_highly_correlated_features(
-        df, selected_features, threshold=high_corr_threshold)
+        df, selected_features, threshold=high_corr_threshold, corr_matrix=corr_matrix)
+
+    return {"final_features": final_features, "corr_matrix": corr_matrix,
+            "corr_series": corr_series, "selected_features": selected_features}
+
+
+def save_selection_outputs(
+    selection,
+    feature_output_path=None,
+    barplot_output_path=None,
+    heatmap_output_path=None,
+    renderer=None
+):
+    """
+    寫出特徵清單 JSON，並由相關係數結果繪製條狀圖與熱圖
+    renderer: eda.render.FigureRenderer（在背景行程繪圖；None 時在目前行程直接繪製）
+    """
+    renderer = renderer or FigureRenderer(background=False)
+    final_features = selection["final_features"]
+
+    # 篩選後的相關係數條狀圖
+    if barplot_output_path:
+        renderer.submit(plot_feature_correlation_bar,
+                        selection["corr_series"].loc[selection["selected_features"]],
+                        barplot_output_path)
 
     # 熱圖（用最終保留特徵）
     if heatmap_output_path:
-        plot_correlation_heatmap(
-            df, final_features, save_path=heatmap_output_path)
+        renderer.submit(plot_correlation_heatmap,
+                        selection["corr_matrix"].loc[final_features, final_features],
+                        heatmap_output_path)
 
     if feature_output_path:
         with open(feature_output_path, "w") as f:
             json.dump(final_features, f, indent=2)
         print(f"特徵清單已儲存到 {feature_output_path}")
 
-    return final_features, df[numeric_features].corr()
+
+def select_features(
+    df,
+    feature_output_path=None,
+    corr_threshold=0.05,
+    high_corr_threshold=0.9,
+    barplot_output_path=None,
+    heatmap_output_path=None,
+    sample_rows=None,
+    corr_dtype=np.float64,
+    renderer=None
+):
+    """
+    特徵篩選（記憶體內版本）：直接對 DataFrame 執行，並視覺化（條狀圖＋熱圖）
+    會在 df 上新增 Label_Binary 欄位；回傳 (最終特徵清單, 數值特徵相關係數矩陣)
+    相關係數只計算一次（見 correlation_engine），sample_rows / corr_dtype 可用於超大資料；
+    圖表直接由相關係數結果繪製，renderer 可將繪圖移到背景行程
+    """
+    selection = correlation_selection(
+        df, corr_threshold=corr_threshold, high_corr_threshold=high_corr_threshold,
+        sample_rows=sample_rows, corr_dtype=corr_dtype)
+    if selection is None:
+        return [], None
+
+    save_selection_outputs(
+        selection,
+        feature_output_path=feature_output_path,
+        barplot_output_path=barplot_output_path,
+        heatmap_output_path=heatmap_output_path,
+        renderer=renderer,
+    )
+    return selection["final_features"], selection["corr_matrix"]
+
+
+def run_feature_selection(
+    input_csv_path,
+    feature_output_path=None,
+    corr_threshold=0.05,
+    high_corr_threshold=0.9,
+    barplot_output_path=None,
+    heatmap_output_path=None,
+    sample_rows=None,
+    corr_dtype=np.float64,
+    renderer=None
+):
+    """
+    主流程：讀取預處理好的資料後執行特徵篩選，並視覺化（條狀圖＋熱圖）
+    並將選出特徵寫入 JSON
+    input_csv_path: 預處理好的資料路徑（沿用原本的參數名稱，.parquet / .feather / .csv 皆可）
+    """
+    return select_features(
+        load_data(input_csv_path),
+        feature_output_path=feature_output_path,
+        corr_threshold=corr_threshold,
+        high_corr_threshold=high_corr_threshold,
+        barplot_output_path=barplot_output_path,
+        heatmap_output_path=heatmap_output_path,
+        sample_rows=sample_rows,
+        corr_dtype=corr_dtype,
+        renderer=renderer,
+    )
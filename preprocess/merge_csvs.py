@@ -6,45 +6,104 @@ import pandas as pd
 import os
 # 載入 os 模組，主要用來處理 檔案與路徑的操作（例如：組路徑、取得目前資料夾位置等）
 from glob import glob
+# 以多個行程平行讀取各天的 CSV（CSV 解析受 GIL 限制，用 thread 無法加速）
+from concurrent.futures import ProcessPoolExecutor
+import time
 
+import numpy as np
 
-def merge_csvs(data_folder="data/raw", output_path="data/processed/merged.csv"):
+from preprocess.clean_data import repair_labels
+from utils.helpers import write_table
+
+
+def downcast_frame(df):
     """
-    合併多個 CSV 檔案成一個，並儲存至指定路徑
+    將數值欄位降為最小可容納的型態：浮點數 → float32，整數 → 最小的 (u)int 型態，
+    Label 轉為 category；記憶體約可減少一半
+    """
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_float_dtype(dtype):
+            df[col] = df[col].astype(np.float32)
+        elif pd.api.types.is_integer_dtype(dtype):
+            kind = 'unsigned' if len(df) and df[col].min() >= 0 else 'integer'
+            df[col] = pd.to_numeric(df[col], downcast=kind)
+    df['Label'] = df['Label'].astype('category')
+    return df
+
+
+def read_raw_csv(file, downcast=True):
+    """
+    讀取並整理單一天的原始 CSV（在 worker 行程中執行）：
+    移除欄名空白、檢查 Label 欄位、修正亂碼標籤、（可選）降低 dtype
+    缺少 Label 欄位時回傳 None
+    """
+    start = time.perf_counter()
+    df = pd.read_csv(file, encoding='ISO-8859-1')
+
+    # 移除所有欄位名稱的前後空格
+    df.columns = df.columns.str.strip()
+
+    # 檢查是否有 'Label' 欄位
+    if 'Label' not in df.columns:
+        print(f"❗ 檔案 {file} 缺少 Label 欄位，跳過")
+        return None
+
+    df['Label'] = repair_labels(df['Label'])
+    if downcast:
+        df = downcast_frame(df)
+    print(f"讀取完成：{file}（{len(df)} 筆，{time.perf_counter() - start:.1f} 秒）")
+    return df
+
+
+def concat_frames(frames):
     """
+    合併各天的 DataFrame；先統一 Label 的 category 集合，合併後仍維持 category
+    （不同 category 集合直接 concat 會退回 object 型態）
+    """
+    if all(isinstance(df['Label'].dtype, pd.CategoricalDtype) for df in frames):
+        categories = sorted(set().union(*(df['Label'].cat.categories for df in frames)))
+        for df in frames:
+            df['Label'] = df['Label'].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True, copy=False)
+
 
-    # 放寬匹配條件：符合含有 WorkingHours 的所有檔案
+def find_raw_csvs(data_folder="data/raw"):
+    """
+    找出資料夾中所有每日原始 CSV（依檔名排序）
+    """
+    # 放寬匹配條件：符合含有 WorkingHours 的所有檔案（不分大小寫：週三的原始檔名為 Wednesday-workingHours）
     csv_files = sorted(
-        glob(os.path.join(data_folder, "*WorkingHours*.pcap_ISCX.csv")))
+        file for file in glob(os.path.join(data_folder, "*.pcap_ISCX.csv"))
+        if "workinghours" in os.path.basename(file).lower())
 
     # 印出找到的檔案
     print("找到的 CSV 檔案：")
     for file in csv_files:
         print(" -", file)
+    return csv_files
 
-    # 建立空的 DataFrame
-    all_data = []
-
-    # 讀取每一個 CSV 並加到 all_data 裡
-    for file in csv_files:
-        print(f"讀取中：{file}")
-        df = pd.read_csv(file, encoding='ISO-8859-1')
-
-        # 移除所有欄位名稱的前後空格
-        df.columns = df.columns.str.strip()
 
-        # 檢查是否有 'Label' 欄位
-        if 'Label' not in df.columns:
-            print(f"❗ 檔案 {file} 缺少 Label 欄位，跳過")
-            continue
+def read_raw_csvs(csv_files, workers=None, downcast=True):
+    """
+    讀取多個原始 CSV，回傳與 csv_files 同順序的 DataFrame 清單（缺少 Label 的檔案為 None）
+    workers > 1 時各檔案在不同行程中平行解析
+    """
+    if not csv_files:
+        return []
+    workers = workers or min(len(csv_files), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(read_raw_csv, csv_files, [downcast] * len(csv_files)))
+    return [read_raw_csv(file, downcast) for file in csv_files]
 
-        all_data.append(df)
 
-    # 合併所有 DataFrame
-    merged_df = pd.concat(all_data, ignore_index=True)
-
-    # 顯示資料量與標籤分佈
+def print_merge_summary(merged_df):
+    """
+    顯示資料量、記憶體用量與標籤分佈
+    """
     print("\n✅ 合併完成")
+    print(f"記憶體用量 {merged_df.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB")
     print("總筆數：", len(merged_df))
     print("標籤分佈：")
     print(merged_df['Label'].value_counts())
@@ -53,7 +112,41 @@ def merge_csvs(data_folder="data/raw", output_path="data/processed/merged.csv"):
     # print("看前五筆資料")
     # print(merged_df.head())
 
+
+def merge_frames(data_folder="data/raw", workers=None, downcast=True):
+    """
+    合併多個 CSV 檔案成一個 DataFrame（不寫檔），供記憶體內流程直接串接
+    參數:
+        data_folder: str, 原始 CSV 資料夾
+        workers: int or None, 平行讀檔的行程數（None = 檔案數與 CPU 核心數取小者，1 = 逐一讀取）
+        downcast: bool, 是否將數值欄位降為 float32 / 最小整數型態、Label 轉為 category
+    """
+    csv_files = find_raw_csvs(data_folder)
+    start = time.perf_counter()
+
+    # 讀取每一個 CSV（結果依檔名順序排列）
+    results = read_raw_csvs(csv_files, workers=workers, downcast=downcast)
+    all_data = [df for df in results if df is not None]
+
+    # 合併所有 DataFrame
+    merged_df = concat_frames(all_data)
+    print(f"讀檔與合併耗時 {time.perf_counter() - start:.1f} 秒")
+    print_merge_summary(merged_df)
+
+    return merged_df
+
+
+def merge_csvs(data_folder="data/raw", output_path="data/processed/merged.parquet",
+               workers=None, downcast=True):
+    """
+    合併多個 CSV 檔案成一個，並儲存至指定路徑
+    輸出格式依副檔名決定（.parquet / .feather / .csv），預設為 Parquet
+    回傳合併後的總筆數
+    """
+    merged_df = merge_frames(data_folder, workers=workers, downcast=downcast)
+
    # 存檔到 data/processed 資料夾
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    merged_df.to_csv(output_path, index=False)
+    write_table(merged_df, output_path)
     print(f"已將合併後資料存成 {output_path}")
+
+    return len(merged_df)
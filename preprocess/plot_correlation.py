@@ -1,35 +1,58 @@
+# 相關係數圖表：直接使用特徵選擇已算好的相關係數（Series / 矩陣），不再讀取或重算原始資料
+# 可在背景行程中執行（見 eda/render.py），只需傳入聚合後的結果
 import os
+import matplotlib
 import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
 
+# 圖表解析度（300 dpi 的存檔時間約為 4 倍，且報告中看不出差異）
+FIGURE_DPI = 120
 
-def plot_correlation_heatmap(df, features, save_path=None):
-    corr_matrix = df[features].corr()
-    plt.figure(figsize=(12, 10))
-    sns.heatmap(corr_matrix, annot=False, cmap='coolwarm', center=0)
-    plt.title("Final Feature Correlation Heatmap")
+
+def _save_or_show(fig, save_path, message):
     if save_path:
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        plt.savefig(save_path, bbox_inches='tight', dpi=300)
-        plt.close()
-        print(f"✅ 熱圖已儲存到 {save_path}")
+        # 版面已由 tight_layout 排好，不用 bbox_inches='tight'（會多繪製一次）
+        fig.savefig(save_path, dpi=FIGURE_DPI)
+        plt.close(fig)
+        print(f"✅ {message}已儲存到 {save_path}")
     else:
         plt.show()
 
 
+def plot_correlation_heatmap(corr_matrix, save_path=None):
+    """
+    繪製特徵相關係數矩陣的熱圖
+    corr_matrix: DataFrame, 已算好的相關係數矩陣（例如 correlation_engine 結果取最終特徵）
+    """
+    n = len(corr_matrix)
+    fig, ax = plt.subplots(figsize=(12, 10))
+    image = ax.imshow(corr_matrix.to_numpy(dtype=float), cmap='coolwarm', vmin=-1, vmax=1,
+                      interpolation='nearest', aspect='auto')
+    fig.colorbar(image, ax=ax)
+    ax.set_xticks(np.arange(n))
+    ax.set_yticks(np.arange(n))
+    ax.set_xticklabels(corr_matrix.columns, rotation=90, fontsize=7)
+    ax.set_yticklabels(corr_matrix.index, fontsize=7)
+    ax.set_title("Final Feature Correlation Heatmap")
+    fig.tight_layout()
+    _save_or_show(fig, save_path, "熱圖")
+
+
 def plot_feature_correlation_bar(corr_series, save_path=None):
-    plt.figure(figsize=(12, max(6, 0.3 * len(corr_series))))
-    sns.barplot(x=corr_series.values, y=corr_series.index,
-                palette='coolwarm', orient='h')
-    plt.title("Filtered Feature Correlation with Label_Binary")
-    plt.xlabel("Pearson Correlation")
-    plt.ylabel("Feature")
-    plt.axvline(0, color='black', linewidth=0.8)
-    plt.tight_layout()
-    if save_path:
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-        plt.close()
-        print(f"✅ 條狀圖已儲存到 {save_path}")
-    else:
-        plt.show()
+    """
+    繪製各特徵與 Label_Binary 相關係數的條狀圖（依 corr_series 的順序由上而下）
+    """
+    fig, ax = plt.subplots(figsize=(12, max(6, 0.3 * len(corr_series))))
+    values = corr_series.to_numpy(dtype=float)
+    colors = matplotlib.colormaps['coolwarm']((values + 1) / 2)
+    ax.barh(np.arange(len(values)), values, color=colors)
+    ax.set_yticks(np.arange(len(values)))
+    ax.set_yticklabels(corr_series.index)
+    ax.invert_yaxis()
+    ax.set_title("Filtered Feature Correlation with Label_Binary")
+    ax.set_xlabel("Pearson Correlation")
+    ax.set_ylabel("Feature")
+    ax.axvline(0, color='black', linewidth=0.8)
+    fig.tight_layout()
+    _save_or_show(fig, save_path, "條狀圖")
@@ -4,21 +4,21 @@ import os  # 匯入 os 模組，用來處理檔案與路徑相關操作
 import pandas as pd  # 匯入 pandas 用來處理資料
 from sklearn.preprocessing import StandardScaler  # 匯入標準化工具
 
+from utils.helpers import feature_columns, meta_columns, read_table, write_table  # 中間檔讀寫（Parquet / CSV）
 
-def scale_features(input_path, output_path):
+
+def scale_frame(df):
     """
-    對資料進行數值標準化（z-score），輸出最終模型訓練用檔案。
+    對資料進行數值標準化（z-score，記憶體內版本）
     參數:
-        input_path: str, 清理後的 CSV 檔案路徑
-        output_path: str, 標準化後資料儲存路徑
+        df: DataFrame, 清理後的資料（已無缺值、已做 Label Encoding）
+    回傳:
+        (標準化後的 DataFrame（含 Label 與 Label_enc）, 已 fit 的 StandardScaler)
     """
+    print(f"輸入資料 shape: {df.shape}")
 
-    # 讀取清理後的資料（已無缺值、已做 Label Encoding）
-    df = pd.read_csv(input_path)
-    print(f"讀取資料，shape: {df.shape}")
-
-    # 特徵欄位：去除 'Label' 與 'Label_enc'（非數值特徵或已編碼的目標欄）
-    features = df.drop(columns=['Label', 'Label_enc'])
+    # 特徵欄位：去除 'Label' 與 'Label_enc'（非數值特徵或已編碼的目標欄），以及 IP / Port 等識別欄
+    features = df[feature_columns(df)]
 
     # 使用 StandardScaler 進行 Z-score 標準化：每個欄位轉換為平均 0、標準差 1
     scaler = StandardScaler()
@@ -33,17 +33,37 @@ def scale_features(input_path, output_path):
     # 把原始 Label 與 Label_enc 加回來（避免資料遺失）
     df_scaled['Label'] = df['Label'].values
     df_scaled['Label_enc'] = df['Label_enc'].values
+    # 識別欄（建圖用）原樣保留
+    for col in meta_columns(df):
+        df_scaled[col] = df[col].values
+
+    return df_scaled, scaler
+
+
+def scale_features(input_path, output_path):
+    """
+    對資料進行數值標準化（z-score），輸出最終模型訓練用檔案。
+    參數:
+        input_path: str, 清理後的資料路徑（.parquet / .feather / .csv）
+        output_path: str, 標準化後資料儲存路徑，格式依副檔名決定
+    回傳:
+        已 fit 的 StandardScaler（可用 preprocess.transform.save_artifacts 保存）
+    """
+
+    # 讀取清理後的資料（已無缺值、已做 Label Encoding）
+    df_scaled, scaler = scale_frame(read_table(input_path))
 
-    # 儲存結果至新的 CSV 檔案
-    df_scaled.to_csv(output_path, index=False)
+    # 儲存結果（預設 Parquet，保留 dtype）
+    write_table(df_scaled, output_path)
     print(f"標準化後資料儲存至 {output_path}")
+    return scaler
 
 
 if __name__ == "__main__":
     # 設定絕對路徑（避免不同工作目錄導致找不到檔案）
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    input_csv = os.path.join(BASE_DIR, "../data/processed/cleaned.csv")
-    output_csv = os.path.join(BASE_DIR, "../data/processed/preprocessed.csv")
+    input_path = os.path.join(BASE_DIR, "../data/processed/cleaned.parquet")
+    output_path = os.path.join(BASE_DIR, "../data/processed/preprocessed.parquet")
 
     # 執行標準化流程
-    scale_features(input_csv, output_csv)
+    scale_features(input_path, output_path)
@@ -0,0 +1,236 @@
+# 切分結果的 memmap shard：固定 dtype 的 .npy，可直接對應到記憶體，不必重新解析整個檔案
+#
+# 目錄結構（save_split_indices(fmt="npy") 寫到 <processed_dir>/splits/）：
+#   index.json                    各集合的筆數、類別數量、shard 清單，以及特徵順序（同 selected_features.json）
+#   train/shard_00000/X.npy       float32 特徵矩陣（column-major：只讀幾個欄位時只碰到那幾段頁面）
+#   train/shard_00000/label.npy   int8 Label_Binary
+#   train/shard_00000/row.npy     int64 在 preprocessed 中的列位置（對應到圖上的邊，見 train/engine.py）
+#   val/...、test/...
+#
+# SplitShards 以唯讀 memmap 開啟：單一 shard 內的欄位 / 列範圍為 zero-copy 的 view，
+# 多個 worker 行程開啟同一份 shard 時共用同一份 page cache。
+#
+# 用法（於專案根目錄執行）：
+# python -m preprocess.split_shards data/processed/splits
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+SHARD_DIR = "splits"
+SHARD_INDEX_FILE = "index.json"
+# 每個 shard 的筆數（56 個特徵時約 235 MB）
+SHARD_ROWS = 1 << 20
+FEATURE_DTYPE = np.float32
+LABEL_DTYPE = np.int8
+LABEL_COLUMN = "Label_Binary"
+
+
+def write_split_shards(df, indices, shard_dir, features, labels, shard_rows=SHARD_ROWS):
+    """
+    將切分結果寫成 shard（依列位置逐欄取值，直接填入 shard 的矩陣，不複製整個 df）
+    參數:
+        df: DataFrame, 需含 features，index 為 preprocessed 中的列位置
+        indices: dict, {"train": 列位置, "val": ..., "test": ...}（見 data_split.split_indices）
+        features: list, 特徵順序（寫入 index.json，讀取時依此對應欄位）
+        labels: 與 df 等長的 Label_Binary 陣列
+    回傳 index（dict）
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    # index.json 最後才寫：中途失敗時不會留下看似完整的舊 index
+    index_path = os.path.join(shard_dir, SHARD_INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    columns = [df[col].to_numpy() for col in features]
+    rows = df.index.to_numpy()
+    labels = np.asarray(labels)
+    index = {"features": list(features), "feature_dtype": np.dtype(FEATURE_DTYPE).name,
+             "label_column": LABEL_COLUMN, "shard_rows": shard_rows, "splits": {}}
+    for name, positions in indices.items():
+        split_dir = os.path.join(shard_dir, name)
+        if os.path.exists(split_dir):
+            shutil.rmtree(split_dir)
+        shards = []
+        # 逐 shard 填入矩陣，額外記憶體只有一個 shard 的大小
+        for start in range(0, len(positions), shard_rows):
+            chunk = positions[start:start + shard_rows]
+            shard = f"shard_{len(shards):05d}"
+            os.makedirs(os.path.join(split_dir, shard))
+            X = np.empty((len(chunk), len(features)), dtype=FEATURE_DTYPE, order="F")
+            for j, values in enumerate(columns):
+                X[:, j] = values[chunk]
+            np.save(os.path.join(split_dir, shard, "X.npy"), X)
+            np.save(os.path.join(split_dir, shard, "label.npy"), labels[chunk].astype(LABEL_DTYPE))
+            np.save(os.path.join(split_dir, shard, "row.npy"), rows[chunk].astype(np.int64))
+            shards.append({"dir": f"{name}/{shard}", "start": start, "rows": len(chunk)})
+        classes, counts = np.unique(labels[positions], return_counts=True)
+        index["splits"][name] = {
+            "rows": len(positions),
+            "class_counts": {str(c): int(n) for c, n in zip(classes, counts)},
+            "shards": shards,
+        }
+
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def load_shard_index(shard_dir):
+    with open(os.path.join(shard_dir, SHARD_INDEX_FILE), "r") as f:
+        return json.load(f)
+
+
+class SplitShards:
+    """
+    切分 shard 的讀取介面（唯讀 memmap，開啟時只讀 index.json 與 .npy 標頭）
+    - column / take：範圍落在單一 shard 內時為 zero-copy 的 view，跨 shard 時才合併成新陣列
+    - iter_batches：逐批回傳 view（batch 不跨 shard）
+    - gather：任意列位置（抽樣後的 batch，見 train/sampling.py），只複製這些列
+    - columns 參數為單一欄位或連續欄位時取 view，其他組合只複製所需欄位
+    """
+
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        self.index = load_shard_index(shard_dir)
+        self.features = self.index["features"]
+        self._positions = {name: i for i, name in enumerate(self.features)}
+        self._opened = {}
+
+    @property
+    def splits(self):
+        return list(self.index["splits"])
+
+    def rows(self, split):
+        return self.index["splits"][split]["rows"]
+
+    def class_counts(self, split):
+        return {int(c): n for c, n in self.index["splits"][split]["class_counts"].items()}
+
+    def shard(self, split, i):
+        """
+        第 i 個 shard 的 {"X", "label", "row"}（memmap，開啟後保留，重複讀取不再開檔）
+        """
+        key = (split, i)
+        if key not in self._opened:
+            shard_dir = os.path.join(self.shard_dir, self.index["splits"][split]["shards"][i]["dir"])
+            self._opened[key] = {name: np.load(os.path.join(shard_dir, f"{name}.npy"), mmap_mode="r")
+                                 for name in ["X", "label", "row"]}
+        return self._opened[key]
+
+    def _column_selector(self, columns):
+        """
+        欄位名稱 → X 的欄位索引：單一欄位回傳 int、連續欄位回傳 slice（兩者皆為 view），其他回傳 list
+        """
+        if columns is None:
+            return slice(None)
+        if isinstance(columns, str):
+            return self._positions[columns]
+        positions = [self._positions[name] for name in columns]
+        if positions and positions == list(range(positions[0], positions[0] + len(positions))):
+            return slice(positions[0], positions[0] + len(positions))
+        return positions
+
+    def _ranges(self, split, start, stop):
+        """
+        [start, stop) 落在哪些 shard：yield (shard 編號, shard 內起點, shard 內終點)
+        """
+        for i, shard in enumerate(self.index["splits"][split]["shards"]):
+            lo, hi = max(start, shard["start"]), min(stop, shard["start"] + shard["rows"])
+            if lo < hi:
+                yield i, lo - shard["start"], hi - shard["start"]
+
+    def take(self, split, start=0, stop=None, columns=None):
+        """
+        讀取列範圍 [start, stop)，回傳 (特徵, 標籤)；columns 為 None 時回傳全部特徵
+        """
+        stop = self.rows(split) if stop is None else min(stop, self.rows(split))
+        selector = self._column_selector(columns)
+        parts = [(self.shard(split, i)["X"][lo:hi, selector], self.shard(split, i)["label"][lo:hi])
+                 for i, lo, hi in self._ranges(split, start, stop)]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return (np.empty((0, len(self.features)), dtype=FEATURE_DTYPE)[:, selector],
+                    np.empty(0, dtype=LABEL_DTYPE))
+        return np.concatenate([X for X, _ in parts]), np.concatenate([y for _, y in parts])
+
+    def gather(self, split, positions, columns=None):
+        """
+        讀取任意列位置（例如抽樣後的一個 batch），回傳 (特徵, 標籤)，順序與 positions 相同
+        只複製這些列；positions 依 shard 分組後各自從 memmap 取值
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        selector = self._column_selector(columns)
+        shards = self.index["splits"][split]["shards"]
+        starts = np.array([shard["start"] for shard in shards], dtype=np.int64)
+        shard_of = np.searchsorted(starts, positions, side="right") - 1
+        # 單一欄位為一維，其餘為 (列數, 欄位數)
+        shape = np.empty((0, len(self.features)), dtype=FEATURE_DTYPE)[:, selector].shape[1:]
+        X = np.empty((len(positions),) + shape, dtype=FEATURE_DTYPE)
+        y = np.empty(len(positions), dtype=LABEL_DTYPE)
+        for i in np.unique(shard_of):
+            mask = shard_of == i
+            local = positions[mask] - starts[i]
+            arrays = self.shard(split, int(i))
+            if isinstance(selector, list):
+                X[mask] = arrays["X"][np.ix_(local, selector)]
+            else:
+                # 先取欄位（column-major 下為 view），只讀所選欄位的頁面
+                X[mask] = arrays["X"][:, selector][local]
+            y[mask] = arrays["label"][local]
+        return X, y
+
+    def _whole(self, split, name, dtype):
+        """
+        整個集合的 label / row 陣列（只有一個 shard 時為 view）
+        """
+        parts = [self.shard(split, i)[name] for i in range(len(self.index["splits"][split]["shards"]))]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    def column(self, split, name):
+        """
+        單一特徵欄位（只有一個 shard 時為 view）
+        """
+        return self.take(split, columns=name)[0]
+
+    def labels(self, split):
+        return self._whole(split, "label", LABEL_DTYPE)
+
+    def row_positions(self, split):
+        """
+        各筆資料在 preprocessed 中的列位置（同 split_index.npz）
+        """
+        return self._whole(split, "row", np.int64)
+
+    def iter_batches(self, split, batch_size, columns=None):
+        """
+        依序回傳 (特徵, 標籤) 的 view；每個 shard 的最後一批可能不足 batch_size
+        """
+        selector = self._column_selector(columns)
+        for i, shard in enumerate(self.index["splits"][split]["shards"]):
+            arrays = self.shard(split, i)
+            for start in range(0, shard["rows"], batch_size):
+                yield (arrays["X"][start:start + batch_size, selector],
+                       arrays["label"][start:start + batch_size])
+
+
+def print_shard_summary(shards):
+    print(f"🗂️ {shards.shard_dir}：{len(shards.features)} 個特徵（{shards.index['feature_dtype']}）")
+    for split in shards.splits:
+        info = shards.index["splits"][split]
+        counts = "、".join(f"{label}: {count:,}" for label, count in shards.class_counts(split).items())
+        print(f"  {split:<6}{info['rows']:>12,} 筆，{len(info['shards'])} 個 shard（{counts}）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="檢視切分 shard 的內容")
+    parser.add_argument("shard_dir", nargs="?", default=os.path.join("data/processed", SHARD_DIR))
+    args = parser.parse_args()
+
+    print_shard_summary(SplitShards(args.shard_dir))
@@ -0,0 +1,341 @@
+# 串流（out-of-core）前處理：以固定大小的分塊處理超過記憶體容量的資料
+#
+# 每一趟只在記憶體中保留一個分塊，全域統計量皆以「可合併」的方式逐塊累積：
+# 1. 讀取原始 CSV 分塊 → 修正欄名 / 亂碼標籤 → 寫入暫存 Parquet，同時累積 NaN / Inf 數量與數值範圍
+# 2. 只讀含缺值的欄位，以直方圖逐步縮小範圍求出中位數（範圍內筆數低於上限即為精確值）
+# 3. 以中位數補值、移除 Inf 列後，用 StandardScaler.partial_fit 累積平均 / 變異數，並統計標籤數量
+# 4. 逐塊清理 → 標籤編碼 → 標準化 → 二元標籤，寫出 preprocessed
+#
+# 與記憶體內流程（merge_frames → clean_frame → scale_frame）的輸出列順序相同；兩邊使用相同的 downcast
+# 設定（預設皆以 float32 讀入浮點欄）與精確中位數（預設）時，標準化後的特徵值誤差在 STREAMING_ATOL 以內
+# （只差在 float64 累加順序，實測約 1e-13），標籤欄位完全一致。downcast 設定不同時，
+# float32 的捨入誤差經標準化後可達 1e-5，不在此保證範圍內。
+# benchmarks/bench_suite.py 的 stream_check 階段在合成資料上檢查這個保證。
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from preprocess.clean_data import repair_labels
+from preprocess.merge_csvs import find_raw_csvs
+from preprocess.transform import save_artifacts
+from utils.helpers import binary_labels, feature_columns, meta_columns, read_table, table_format
+
+# 串流輸出與記憶體內輸出比對時（downcast 設定相同），標準化特徵允許的最大絕對誤差
+STREAMING_ATOL = 1e-6
+
+# 估算分塊大小時，每列實際佔用記憶體相對於原始數值大小的倍數
+# （read_csv 緩衝、清理與標準化過程中的暫存複本）
+MEMORY_OVERHEAD_FACTOR = 6
+
+# 求中位數時每一趟的直方圖格數
+MEDIAN_BINS = 4096
+
+
+def estimate_chunk_rows(csv_files, max_memory_mb):
+    """
+    依記憶體上限估算每個分塊的筆數（讀取前 1000 筆估計每列大小）
+    """
+    sample = pd.read_csv(csv_files[0], encoding='ISO-8859-1', nrows=1000)
+    row_bytes = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    return max(int(max_memory_mb * 1024 ** 2 / (row_bytes * MEMORY_OVERHEAD_FACTOR)), 1000)
+
+
+def _iter_csv_chunks(csv_files, chunk_rows):
+    """
+    逐檔、逐塊讀取原始 CSV；移除欄名空白並修正亂碼標籤，缺少 Label 的檔案略過
+    """
+    for file in csv_files:
+        print(f"串流讀取中：{file}")
+        for chunk in pd.read_csv(file, encoding='ISO-8859-1', chunksize=chunk_rows):
+            chunk.columns = chunk.columns.str.strip()
+            if 'Label' not in chunk.columns:
+                print(f"❗ 檔案 {file} 缺少 Label 欄位，跳過")
+                break
+            chunk['Label'] = repair_labels(chunk['Label'])
+            yield chunk
+
+
+def _iter_staged(staging_path, chunk_rows, columns=None):
+    """
+    逐塊讀取暫存 Parquet（可只讀部分欄位）
+    """
+    parquet_file = pq.ParquetFile(staging_path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+        yield batch.to_pandas()
+
+
+def stage_raw_csvs(csv_files, staging_path, chunk_rows, downcast=True):
+    """
+    第 1 趟：把原始 CSV 轉成暫存 Parquet（數值欄統一為 float64），並累積各欄統計量
+    downcast=True 時浮點欄先轉成 float32 再存（與 merge_frames 預設的 downcast_frame 相同的數值，
+    清理 / 標準化的結果才會與記憶體內流程一致）
+    回傳 stats: rows, numeric_cols, nan / neg_inf / pos_inf 數量, 有限值的 min / max
+    """
+    writer = None
+    stats = None
+    for chunk in _iter_csv_chunks(csv_files, chunk_rows):
+        if writer is None:
+            numeric_cols = [c for c in chunk.columns
+                            if c != 'Label' and pd.api.types.is_numeric_dtype(chunk[c])]
+            other_cols = [c for c in chunk.columns if c not in numeric_cols]
+            n = len(numeric_cols)
+            stats = {
+                "rows": 0,
+                "columns": chunk.columns.tolist(),
+                "numeric_cols": numeric_cols,
+                "nan": np.zeros(n, dtype=np.int64),
+                "neg_inf": np.zeros(n, dtype=np.int64),
+                "pos_inf": np.zeros(n, dtype=np.int64),
+                "min": np.full(n, np.inf),
+                "max": np.full(n, -np.inf),
+            }
+        elif chunk.columns.tolist() != stats["columns"]:
+            raise ValueError("各原始 CSV 的欄位不一致，無法串流合併")
+
+        if downcast:
+            float_cols = [c for c in numeric_cols if chunk[c].dtype.kind == 'f']
+            chunk[float_cols] = chunk[float_cols].astype(np.float32)
+        chunk[numeric_cols] = chunk[numeric_cols].astype(np.float64)
+        chunk[other_cols] = chunk[other_cols].astype(str).where(chunk[other_cols].notna())
+
+        values = chunk[numeric_cols].to_numpy()
+        finite = np.isfinite(values)
+        stats["rows"] += len(chunk)
+        stats["nan"] += np.isnan(values).sum(axis=0)
+        stats["neg_inf"] += (values == -np.inf).sum(axis=0)
+        stats["pos_inf"] += (values == np.inf).sum(axis=0)
+        stats["min"] = np.minimum(stats["min"], np.where(finite, values, np.inf).min(axis=0))
+        stats["max"] = np.maximum(stats["max"], np.where(finite, values, -np.inf).max(axis=0))
+
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(staging_path, table.schema)
+        writer.write_table(table.cast(writer.schema))
+
+    if writer is None:
+        raise ValueError("找不到可用的原始 CSV 檔案")
+    writer.close()
+    return stats
+
+
+def _select_rank(iter_values, k, n_neg_inf, n_finite, lo, hi, budget, exact=True):
+    """
+    在不載入整欄的情況下，找出一欄非 NaN 值中第 k 小（0 起算）的值
+    每一趟以直方圖把範圍 [lo, hi) 縮小到包含第 k 個值的那一格；
+    範圍內的筆數 ≤ budget 時收集實際值排序，得到精確結果。
+    exact=False 時只跑一趟直方圖，以格內線性內插回傳近似值。
+    """
+    if k < n_neg_inf:
+        return -np.inf
+    k -= n_neg_inf
+    if k >= n_finite:
+        return np.inf
+
+    below = 0
+    while True:
+        counts = np.zeros(MEDIAN_BINS, dtype=np.int64)
+        edges = np.linspace(lo, hi, MEDIAN_BINS + 1)
+        in_range = 0
+        for values in iter_values():
+            v = values[(values >= lo) & (values < hi)]
+            in_range += len(v)
+            idx = np.clip(np.searchsorted(edges, v, side='right') - 1, 0, MEDIAN_BINS - 1)
+            counts += np.bincount(idx, minlength=MEDIAN_BINS)
+
+        if in_range <= budget:
+            collected = np.sort(np.concatenate(
+                [v[(v >= lo) & (v < hi)] for v in iter_values()]))
+            return collected[k - below]
+
+        cum = np.cumsum(counts)
+        b = int(np.searchsorted(cum, k - below, side='right'))
+        before = int(cum[b - 1]) if b > 0 else 0
+        if not exact:
+            frac = (k - below - before + 0.5) / counts[b]
+            return edges[b] + frac * (edges[b + 1] - edges[b])
+
+        new_lo, new_hi = edges[b], edges[b + 1]
+        if new_lo == lo and new_hi == hi:
+            # 範圍已窄到浮點數無法再切分：合併各分塊的相異值計數找出第 k 個
+            value_counts = pd.Series(dtype=np.int64)
+            for v in iter_values():
+                value_counts = value_counts.add(
+                    pd.Series(v[(v >= lo) & (v < hi)]).value_counts(), fill_value=0)
+            cum_values = value_counts.sort_index().cumsum()
+            return cum_values.index[int(np.searchsorted(cum_values.values, k - below, side='right'))]
+        below += before
+        lo, hi = new_lo, new_hi
+
+
+def streaming_medians(staging_path, stats, chunk_rows, exact=True):
+    """
+    第 2 趟：只針對含 NaN 的數值欄位計算中位數（略過 NaN、包含 ±Inf，與 pandas median 相同）
+    """
+    medians = {}
+    for j, col in enumerate(stats["numeric_cols"]):
+        if stats["nan"][j] == 0:
+            continue
+        n_valid = stats["rows"] - int(stats["nan"][j])
+        if n_valid == 0:
+            medians[col] = np.nan
+            continue
+        n_neg_inf, n_pos_inf = int(stats["neg_inf"][j]), int(stats["pos_inf"][j])
+        n_finite = n_valid - n_neg_inf - n_pos_inf
+
+        def iter_values(col=col):
+            for chunk in _iter_staged(staging_path, chunk_rows, columns=[col]):
+                v = chunk[col].to_numpy()
+                yield v[np.isfinite(v)]
+
+        lo, hi = stats["min"][j], np.nextafter(stats["max"][j], np.inf)
+        ranks = [(n_valid - 1) // 2, n_valid // 2]
+        values = [_select_rank(iter_values, k, n_neg_inf, n_finite, lo, hi,
+                               budget=chunk_rows, exact=exact) for k in ranks]
+        medians[col] = (values[0] + values[1]) / 2
+        print(f"{col} 串流中位數 {medians[col]}")
+    return medians
+
+
+def clean_chunk(chunk, medians):
+    """
+    清理單一分塊：以全域中位數補值，移除含 Inf / 缺值的列
+    """
+    for col, median_val in medians.items():
+        chunk[col] = chunk[col].fillna(median_val)
+    numeric_cols = chunk.select_dtypes(include=[np.number]).columns
+    keep = np.isfinite(chunk[numeric_cols].to_numpy()).all(axis=1)
+    keep &= chunk.drop(columns=numeric_cols).notna().all(axis=1).to_numpy()
+    return chunk[keep]
+
+
+def fit_streaming(staging_path, medians, chunk_rows):
+    """
+    第 3 趟：逐塊清理後以 partial_fit 累積標準化參數，並統計清理後的標籤數量
+    回傳 (scaler, label_encoder, label_counts)
+    """
+    scaler = StandardScaler()
+    label_counts = pd.Series(dtype=np.int64)
+    for chunk in _iter_staged(staging_path, chunk_rows):
+        chunk = clean_chunk(chunk, medians)
+        if len(chunk) == 0:
+            continue
+        scaler.partial_fit(chunk[feature_columns(chunk)])
+        label_counts = label_counts.add(chunk['Label'].value_counts(), fill_value=0)
+
+    label_encoder = LabelEncoder().fit(np.array(sorted(label_counts.index)))
+    return scaler, label_encoder, label_counts.astype(np.int64)
+
+
+def transform_chunk(chunk, medians, scaler, label_encoder):
+    """
+    清理 → 標籤編碼 → 標準化 → 二元標籤，欄位順序與 scale_frame 的輸出一致（另加 Label_Binary）
+    """
+    chunk = clean_chunk(chunk, medians)
+    features = chunk[feature_columns(chunk)]
+    df_scaled = pd.DataFrame(scaler.transform(features), columns=features.columns)
+    df_scaled['Label'] = chunk['Label'].values
+    df_scaled['Label_enc'] = label_encoder.transform(chunk['Label'])
+    for col in meta_columns(chunk):
+        # 暫存檔的數值欄皆為 float64，Port 轉回整數
+        values = chunk[col].to_numpy()
+        df_scaled[col] = values.astype(np.int64) if values.dtype.kind == 'f' else values
+    df_scaled['Label_Binary'] = binary_labels(chunk['Label'])
+    return df_scaled
+
+
+def stream_preprocess(data_folder, output_path, max_memory_mb=1024, exact_median=True,
+                      staging_dir=None, artifact_dir=None, downcast=True):
+    """
+    串流版前處理主函式：合併 → 清理 → 標準化 → 二元標籤，記憶體用量以分塊大小控制
+    參數:
+        data_folder: str, 原始 CSV 資料夾
+        output_path: str, 輸出路徑（.parquet 逐 row group 寫出；.csv 逐塊附加）
+        max_memory_mb: int, 單一分塊處理時的記憶體上限（MB）
+        exact_median: bool, True 求精確中位數（可能多跑幾趟），False 只跑一趟直方圖取近似值
+        staging_dir: str or None, 暫存 Parquet 的資料夾（預設系統暫存區）
+        artifact_dir: str or None, 指定時保存 scaler / label encoder / 中位數，供 preprocess.transform 使用
+        downcast: bool, 與 merge_frames 的 downcast 相同（浮點欄以 float32 的精度讀入）
+    回傳:
+        摘要 dict（筆數、中位數、標籤數量、分塊大小）
+    """
+    csv_files = find_raw_csvs(data_folder)
+    if not csv_files:
+        raise ValueError(f"{data_folder} 中找不到原始 CSV 檔案")
+    chunk_rows = estimate_chunk_rows(csv_files, max_memory_mb)
+    print(f"記憶體上限 {max_memory_mb} MB → 每塊 {chunk_rows} 筆")
+
+    tmp_dir = tempfile.mkdtemp(prefix="stream_preproc_", dir=staging_dir)
+    staging_path = os.path.join(tmp_dir, "staged.parquet")
+    try:
+        stats = stage_raw_csvs(csv_files, staging_path, chunk_rows, downcast=downcast)
+        print(f"總筆數：{stats['rows']}")
+
+        medians = streaming_medians(staging_path, stats, chunk_rows, exact=exact_median)
+        scaler, label_encoder, label_counts = fit_streaming(staging_path, medians, chunk_rows)
+        print("標籤分佈（清理後）：")
+        print(label_counts)
+        if artifact_dir:
+            save_artifacts(artifact_dir, scaler, {
+                "medians": {col: float(v) for col, v in medians.items()},
+                "label_classes": label_encoder.classes_.tolist(),
+            })
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        fmt = table_format(output_path)
+        if fmt not in ("parquet", "csv"):
+            raise ValueError("串流輸出僅支援 .parquet 或 .csv")
+
+        writer = None
+        rows_out = 0
+        for i, chunk in enumerate(_iter_staged(staging_path, chunk_rows)):
+            out = transform_chunk(chunk, medians, scaler, label_encoder)
+            rows_out += len(out)
+            if fmt == "csv":
+                out.to_csv(output_path, index=False, mode="w" if i == 0 else "a", header=i == 0)
+                continue
+            table = pa.Table.from_pandas(out, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is not None:
+            writer.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"移除 NaN/Inf 後剩餘筆數: {rows_out} (移除 {stats['rows'] - rows_out} 筆)")
+    print(f"串流前處理完成，已儲存至 {output_path}")
+    return {
+        "rows_in": stats["rows"],
+        "rows_out": rows_out,
+        "chunk_rows": chunk_rows,
+        "medians": {col: float(v) for col, v in medians.items()},
+        "label_counts": {label: int(n) for label, n in label_counts.items()},
+    }
+
+
+def compare_with_in_memory(streamed_path, reference_df, atol=STREAMING_ATOL):
+    """
+    比對串流輸出與記憶體內流程（scale_frame）的結果（需以 exact_median=True 產生，
+    且 reference_df 與串流使用相同的 downcast 設定）
+    標準化特徵允許 atol 絕對誤差，Label / Label_enc 必須完全一致；回傳最大絕對誤差
+    """
+    streamed = read_table(streamed_path)
+    if len(streamed) != len(reference_df):
+        raise AssertionError(f"筆數不一致：串流 {len(streamed)}，記憶體內 {len(reference_df)}")
+    for col in ['Label', 'Label_enc']:
+        if not np.array_equal(streamed[col].to_numpy(), reference_df[col].to_numpy()):
+            raise AssertionError(f"{col} 欄位不一致")
+    features = feature_columns(reference_df)
+    max_diff = float(np.max(np.abs(
+        streamed[features].to_numpy() - reference_df[features].to_numpy())))
+    if max_diff > atol:
+        raise AssertionError(f"標準化特徵誤差 {max_diff} 超過容許值 {atol}")
+    print(f"✅ 串流輸出與記憶體內結果一致（最大誤差 {max_diff:.2e}）")
+    return max_diff
@@ -0,0 +1,180 @@
+# 推論用前處理：載入訓練時保存的清理參數、StandardScaler、LabelEncoder 與特徵清單，
+# 對新的流量 CSV 只做 transform（不重新 fit），並可分塊串流處理
+#
+# 保存的產物（與 selected_features.json 放在同一個版本資料夾）：
+# - scaler.joblib：scale_features 已 fit 的 StandardScaler
+# - label_encoder.joblib：clean_data 的標籤編碼
+# - cleaning_params.json：補值用的中位數、特徵欄位順序、標籤類別
+#
+# 用法（於專案根目錄執行）：
+# python -m preprocess.transform --artifact-dir data/versions/20250717_1745_preproc \
+#     --input data/raw/new_day.pcap_ISCX.csv --output data/processed/new_day.parquet
+
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from preprocess.clean_data import repair_labels
+from utils.helpers import binary_labels, meta_columns, table_format
+
+SCALER_FILE = "scaler.joblib"
+LABEL_ENCODER_FILE = "label_encoder.joblib"
+CLEANING_PARAMS_FILE = "cleaning_params.json"
+SELECTED_FEATURES_FILE = "selected_features.json"
+
+
+def save_artifacts(output_dir, scaler, cleaning_report):
+    """
+    保存已 fit 的前處理參數，供之後只做 transform
+    參數:
+        output_dir: str, 輸出資料夾（通常為 data/processed，會隨版本備份一起保存）
+        scaler: 已 fit 的 StandardScaler
+        cleaning_report: dict, clean_frame 的清理報告（需含 medians 與 label_classes）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    joblib.dump(scaler, os.path.join(output_dir, SCALER_FILE))
+
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = np.array(cleaning_report["label_classes"], dtype=object)
+    joblib.dump(label_encoder, os.path.join(output_dir, LABEL_ENCODER_FILE))
+
+    params = {
+        "feature_columns": [str(col) for col in scaler.feature_names_in_],
+        "medians": cleaning_report["medians"],
+        "label_classes": cleaning_report["label_classes"],
+    }
+    with open(os.path.join(output_dir, CLEANING_PARAMS_FILE), "w") as f:
+        json.dump(params, f, indent=2)
+    print(f"✅ 前處理參數（scaler / label encoder / 中位數）已儲存到 {output_dir}")
+
+
+def load_artifacts(artifact_dir, features=None):
+    """
+    載入保存的前處理參數
+    features: 要輸出的特徵子集合；None 時讀取同資料夾的 selected_features.json（不存在則用全部特徵）
+    回傳 dict：scaler, label_encoder, medians, feature_columns, features, feature_idx，
+    以及只針對選定特徵預先取出的 mean / scale（transform 時只標準化選定特徵）
+    """
+    scaler = joblib.load(os.path.join(artifact_dir, SCALER_FILE))
+    label_encoder = joblib.load(os.path.join(artifact_dir, LABEL_ENCODER_FILE))
+    with open(os.path.join(artifact_dir, CLEANING_PARAMS_FILE), "r") as f:
+        params = json.load(f)
+
+    if features is None:
+        features_path = os.path.join(artifact_dir, SELECTED_FEATURES_FILE)
+        if os.path.exists(features_path):
+            with open(features_path, "r") as f:
+                features = json.load(f)
+        else:
+            features = params["feature_columns"]
+
+    idx = np.array([params["feature_columns"].index(col) for col in features], dtype=np.int64)
+    return {
+        "scaler": scaler,
+        "label_encoder": label_encoder,
+        "medians": params["medians"],
+        "feature_columns": params["feature_columns"],
+        "features": list(features),
+        "feature_idx": idx,
+        "mean": scaler.mean_[idx],
+        "scale": scaler.scale_[idx],
+    }
+
+
+def transform_frame(df, artifacts):
+    """
+    以保存的參數轉換新資料（不 fit）：
+    補值 → 移除含 Inf / 缺值的列 → 只對選定特徵標準化 → （若有 Label）標籤編碼與二元標籤
+    沒有訓練時中位數的欄位出現缺值時，以訓練平均值補值（標準化後為 0）
+    未見過的攻擊類別 Label_enc 為 -1
+    回傳只含選定特徵（與 Label / Label_enc / Label_Binary、識別欄）的 DataFrame
+    """
+    df.columns = df.columns.str.strip()
+    columns = artifacts["feature_columns"]
+    values = df[columns].to_numpy(dtype=np.float64)
+
+    # 補值：訓練時的中位數，其餘欄位用訓練平均值
+    nan_mask = np.isnan(values)
+    if nan_mask.any():
+        fill = np.array([artifacts["medians"].get(col, mean)
+                         for col, mean in zip(columns, artifacts["scaler"].mean_)])
+        values = np.where(nan_mask, fill, values)
+
+    # 與訓練時相同：任一特徵含 Inf（或缺少 Label）的列整列移除
+    keep = np.isfinite(values).all(axis=1)
+    if 'Label' in df.columns:
+        keep &= df['Label'].notna().to_numpy()
+
+    features = artifacts["features"]
+    values = values[np.ix_(keep, artifacts["feature_idx"])]
+    # 保留原始列的 index，呼叫端可據此對應被移除的列
+    out = pd.DataFrame((values - artifacts["mean"]) / artifacts["scale"], columns=features,
+                       index=df.index[keep])
+    if 'Label' in df.columns:
+        labels = repair_labels(df['Label'][keep])
+        classes = artifacts["label_encoder"].classes_
+        positions = np.searchsorted(classes, labels.to_numpy())
+        positions = np.clip(positions, 0, len(classes) - 1)
+        known = classes[positions] == labels.to_numpy()
+        out['Label'] = labels.to_numpy()
+        out['Label_enc'] = np.where(known, positions, -1)
+        out['Label_Binary'] = binary_labels(out['Label'])
+    # 識別欄（IP / Port / 時間）原樣保留，供建圖使用
+    for col in meta_columns(df):
+        out[col] = df[col].to_numpy()[keep]
+    return out
+
+
+def transform_csv(input_path, output_path, artifact_dir, chunk_rows=100_000):
+    """
+    對新的流量 CSV 分塊套用保存的前處理（不重新 fit），結果寫到 output_path（.parquet / .csv）
+    回傳 (輸入筆數, 輸出筆數)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    artifacts = load_artifacts(artifact_dir)
+    fmt = table_format(output_path)
+    if fmt not in ("parquet", "csv"):
+        raise ValueError("輸出僅支援 .parquet 或 .csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    start = time.perf_counter()
+    writer = None
+    rows_in = rows_out = 0
+    chunks = pd.read_csv(input_path, encoding='ISO-8859-1', chunksize=chunk_rows)
+    for i, chunk in enumerate(chunks):
+        out = transform_frame(chunk, artifacts)
+        rows_in += len(chunk)
+        rows_out += len(out)
+        if fmt == "csv":
+            out.to_csv(output_path, index=False, mode="w" if i == 0 else "a", header=i == 0)
+            continue
+        table = pa.Table.from_pandas(out, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(output_path, table.schema)
+        writer.write_table(table.cast(writer.schema))
+    if writer is not None:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ 已轉換 {rows_in} 筆（保留 {rows_out} 筆），耗時 {elapsed:.2f} 秒 → {output_path}")
+    return rows_in, rows_out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="以保存的前處理參數轉換新的流量 CSV")
+    parser.add_argument("--artifact-dir", required=True,
+                        help="含 scaler.joblib / label_encoder.joblib / cleaning_params.json 的資料夾")
+    parser.add_argument("--input", required=True, help="新的流量 CSV")
+    parser.add_argument("--output", required=True, help="輸出路徑（.parquet / .csv）")
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    transform_csv(args.input, args.output, args.artifact_dir, chunk_rows=args.chunk_rows)
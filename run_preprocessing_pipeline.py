@@ -5,100 +5,482 @@
 # 3. 數值標準化
 # 4. 特徵選擇（並輸出選定特徵清單 JSON）
 # 5. 使用選定特徵切分資料集（訓練/驗證/測試）
+#    （預設寫成 splits/ 下的 memmap shard，--split-format 可改為 parquet 等資料表）
+#
+# 三種執行模式：
+# - disk（預設）：每個階段讀寫中間檔，可從任一階段重跑
+# - memory：原始資料只讀一次，各階段直接在記憶體內傳遞 DataFrame，
+#   只寫出 --save 指定的產物
+# - stream：合併 / 清理 / 標準化以固定大小分塊串流處理（記憶體上限 --max-memory-mb），
+#   適用於超過記憶體容量的資料；之後的特徵選擇與切分同 disk 模式
 #
 # 可直接在專案根目錄執行：
 # python run_preprocessing_pipeline.py
+# python run_preprocessing_pipeline.py --mode memory --save preprocessed splits
+# python run_preprocessing_pipeline.py --mode stream --max-memory-mb 512
+# python run_preprocessing_pipeline.py --split-mode day          # 跨日測試（需 Timestamp 欄位）
+# python run_preprocessing_pipeline.py --split-mode host --split-stratify multi   # 同一主機不跨集合
+#
+# memory 模式可加上 --cache-dir 啟用階段快取：只改門檻時不必重新合併 / 清理 / 標準化
+# python run_preprocessing_pipeline.py --mode memory --cache-dir data/cache
+#
+# 門檻預設值取自 config.yaml 的 pipeline 一節，也可用 --corr-threshold / --high-corr-threshold 指定；
+# 多組門檻與模型超參的搜尋見 run_sweep.py
+#
+# 各階段的耗時 / 峰值 RSS / 讀寫量 / 筆數記錄在 version.json 與 trace.jsonl（utils/profiling.py）；
+# 找熱點時加上 --profile（cProfile）或 --trace-malloc（tracemalloc）
+#
+# 圖表（figures/ 下的標籤分布、相關係數條狀圖與熱圖）由已算好的計數與相關係數繪製，
+# 在背景行程中執行（eda/render.py），建立版本快照前才等待完成
 
 import os
-import shutil
+import argparse
 import json
 import time
 from datetime import datetime
-import pandas as pd
-from preprocess.merge_csvs import merge_csvs
-from preprocess.clean_data import clean_data
-from preprocess.scale_features import scale_features
-from preprocess.feature_selection import run_feature_selection
-from preprocess.data_split import split_data_and_save
+from utils.cache import MISS, StageCache, code_version, print_cache_summary
+from utils.helpers import count_rows, export_csv, load_config, write_table
+from utils.profiling import TRACE_FILE, Profiler, print_stage_stats
+from utils.versioning import VERSION_FILE, available_version_name, print_snapshot_stats, snapshot
+from eda.label_distribution import plot_label_distribution
+from eda.render import FigureRenderer
+import preprocess.merge_csvs as merge_csvs_module
+import preprocess.clean_data as clean_data_module
+import preprocess.scale_features as scale_features_module
+import preprocess.feature_selection as feature_selection_module
+import preprocess.data_split as data_split_module
+from preprocess.merge_csvs import (
+    concat_frames, find_raw_csvs, merge_csvs, print_merge_summary, read_raw_csvs)
+from preprocess.clean_data import clean_data, clean_frame, print_cleaning_report
+from preprocess.scale_features import scale_features, scale_frame
+from preprocess.feature_selection import (
+    correlation_selection, run_feature_selection, save_selection_outputs)
+from preprocess.data_split import (
+    SPLIT_FORMATS, SPLIT_MODES, STRATIFY, save_split_indices, split_data_and_save, split_indices)
+from preprocess.streaming import stream_preprocess
+from preprocess.transform import save_artifacts
 
-if __name__ == "__main__":
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# memory 模式可選擇寫出的產物
+ARTIFACTS = ["merged", "cleaned", "preprocessed", "splits"]
 
-    # 設定處理與備份參數
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    processed_dir = os.path.join(BASE_DIR, "data/processed")
-    raw_dir = os.path.join(BASE_DIR, "data/raw")
-    version_dir = os.path.join(
-        BASE_DIR, "data/versions", f"{timestamp}_preproc")
-    corr_threshold = 0.05
-    high_corr_threshold = 0.9
 
-    # 圖表儲存位置
+def pipeline_paths(processed_dir, intermediate_format="parquet"):
+    """
+    各階段輸出檔的路徑（並建立圖表資料夾）
+    """
     figures_dir = os.path.join(processed_dir, "figures")
     os.makedirs(figures_dir, exist_ok=True)
-    barplot_path = os.path.join(figures_dir, "correlation_bar_filtered.png")
-    heatmap_path = os.path.join(figures_dir, "correlation_heatmap_final.png")
+    return {
+        "merged": os.path.join(processed_dir, f"merged.{intermediate_format}"),
+        "cleaned": os.path.join(processed_dir, f"cleaned.{intermediate_format}"),
+        "preprocessed": os.path.join(
+            processed_dir, f"preprocessed.{intermediate_format}"),
+        "selected_features": os.path.join(
+            processed_dir, "selected_features.json"),
+        "barplot": os.path.join(figures_dir, "correlation_bar_filtered.png"),
+        "heatmap": os.path.join(figures_dir, "correlation_heatmap_final.png"),
+        "label_distribution": os.path.join(figures_dir, "label_distribution.png"),
+    }
 
-    # 檔案路徑
-    merged_csv = os.path.join(processed_dir, "merged.csv")
-    cleaned_csv = os.path.join(processed_dir, "cleaned.csv")
-    preprocessed_csv = os.path.join(processed_dir, "preprocessed.csv")
-    selected_feature_json = os.path.join(
-        processed_dir, "selected_features.json")
 
-    # 紀錄預處理所耗費時間
-    start_time = time.time()
+def remove_stale_intermediates(paths, saved_paths):
+    """
+    刪除本次沒有寫出的中間檔（merged / cleaned / preprocessed）
+    舊的執行留下的檔案若還在 data/processed，會被當成本次的產物記入版本快照
+    """
+    for name in ["merged", "cleaned", "preprocessed"]:
+        path = paths[name]
+        if path not in saved_paths and os.path.exists(path):
+            os.remove(path)
+            print(f"🧹 移除上次留下的 {os.path.basename(path)}（本次未寫出）")
+
+
+def submit_label_distribution(label_counts, paths, renderer=None):
+    """
+    由清理報告的標籤計數繪製 Label 分布圖（不需讀取資料；較舊的快取報告沒有計數時略過）
+    """
+    if label_counts:
+        (renderer or FigureRenderer(background=False)).submit(
+            plot_label_distribution, label_counts, paths["label_distribution"])
+
 
-    # 1. 合併多個 raw CSV 成 merged.csv
+def run_disk_pipeline(raw_dir, processed_dir, paths, params, profiler, renderer=None):
+    """
+    逐階段讀寫中間檔的流程，回傳摘要 dict（合併筆數、清理報告、最終特徵清單）
+    profiler: utils.profiling.Profiler，記錄各階段的耗時、記憶體、讀寫量與筆數
+    renderer: eda.render.FigureRenderer（None 時在目前行程直接繪圖）
+    """
+    # 1. 合併多個 raw CSV 成 merged
     print("Step 1: 合併 CSV 檔案...")
-    merge_csvs(raw_dir, merged_csv)
-    merged_rows = len(pd.read_csv(merged_csv))
+    with profiler.stage("merge") as record:
+        merged_rows = merge_csvs(raw_dir, paths["merged"])
+        record["rows_out"] = merged_rows
 
     # 2. 清理資料
     print("Step 2: 清理資料...")
-    clean_data(merged_csv, cleaned_csv)
+    with profiler.stage("clean") as record:
+        cleaning_report = clean_data(paths["merged"], paths["cleaned"])
+        record["rows_in"], record["rows_out"] = cleaning_report["rows_in"], cleaning_report["rows_out"]
+    submit_label_distribution(cleaning_report["label_counts"], paths, renderer)
 
     # 3. 數值標準化
     print("Step 3: 數值標準化...")
-    scale_features(cleaned_csv, preprocessed_csv)
+    with profiler.stage("scale", rows_in=cleaning_report["rows_out"]) as record:
+        scaler = scale_features(paths["cleaned"], paths["preprocessed"])
+        save_artifacts(processed_dir, scaler, cleaning_report)
+        record["rows_out"] = count_rows(paths["preprocessed"])
 
+    selected_features = run_disk_selection_and_split(
+        processed_dir, paths, params, profiler, renderer)
+    return {"merged_rows": merged_rows, "cleaning": cleaning_report,
+            "selected_features": selected_features}
+
+
+def run_disk_selection_and_split(processed_dir, paths, params, profiler, renderer=None):
+    """
+    特徵選擇與切分（讀取 preprocessed 中間檔），disk 與 stream 模式共用
+    回傳最終特徵清單
+    """
     # 4. 特徵選擇
     print("Step 4: 特徵選擇...")
-    selected_features, corr_matrix = run_feature_selection(
-        input_csv_path=preprocessed_csv,
-        feature_output_path=selected_feature_json,
-        corr_threshold=corr_threshold,
-        high_corr_threshold=high_corr_threshold,
-        barplot_output_path=barplot_path,
-        heatmap_output_path=heatmap_path
-    )
+    with profiler.stage("select", rows_in=count_rows(paths["preprocessed"])) as record:
+        selected_features, corr_matrix = run_feature_selection(
+            input_csv_path=paths["preprocessed"],
+            feature_output_path=paths["selected_features"],
+            corr_threshold=params["corr_threshold"],
+            high_corr_threshold=params["high_corr_threshold"],
+            barplot_output_path=paths["barplot"],
+            heatmap_output_path=paths["heatmap"],
+            renderer=renderer
+        )
+        record["features_out"] = len(selected_features)
 
     # 5. 切分資料集（train/val/test）
     print("Step 5: 切分資料集...")
-    split_data_and_save(preprocessed_csv, selected_feature_json, processed_dir)
+    with profiler.stage("split") as record:
+        record["rows_in"], record["split_rows"] = split_data_and_save(
+            paths["preprocessed"], paths["selected_features"], processed_dir,
+            fmt=params["split_format"], mode=params["split_mode"],
+            window=params["split_window"], stratify=params["split_stratify"],
+            seed=params["split_seed"])
+        record["rows_out"] = sum(record["split_rows"].values())
+
+    return selected_features
+
+
+def run_stream_pipeline(raw_dir, processed_dir, paths, params, profiler, max_memory_mb,
+                        renderer=None):
+    """
+    合併 / 清理 / 標準化以分塊串流處理（不產生 merged / cleaned），
+    之後從 preprocessed 做特徵選擇與切分；回傳摘要 dict（合併筆數、串流統計、最終特徵清單）
+    """
+    print(f"Step 1-3: 串流合併、清理與標準化（記憶體上限 {max_memory_mb} MB）...")
+    with profiler.stage("stream_preprocess") as record:
+        summary = stream_preprocess(raw_dir, paths["preprocessed"],
+                                    max_memory_mb=max_memory_mb,
+                                    artifact_dir=processed_dir)
+        record["rows_in"], record["rows_out"] = summary["rows_in"], summary["rows_out"]
+    submit_label_distribution(summary["label_counts"], paths, renderer)
+
+    selected_features = run_disk_selection_and_split(
+        processed_dir, paths, params, profiler, renderer)
+    return {"merged_rows": summary["rows_in"], "cleaning": summary,
+            "selected_features": selected_features}
+
+
+def cached_merge(raw_dir, cache):
+    """
+    逐檔快取的合併：鍵為各原始檔的內容 hash，新增 / 修改一天的檔案時只重讀該檔
+    回傳 (合併後 DataFrame, 各檔的快取鍵)
+    """
+    csv_files = find_raw_csvs(raw_dir)
+    code = code_version(merge_csvs_module, clean_data_module)
+    keys = [cache.key("ingest", [cache.file_digest(file)], {"downcast": True}, code)
+            for file in csv_files]
+    frames = [cache.get(f"ingest:{os.path.basename(file)}", key)
+              for file, key in zip(csv_files, keys)]
+
+    missing = [i for i, frame in enumerate(frames) if frame is MISS]
+    if missing:
+        start = time.perf_counter()
+        results = read_raw_csvs([csv_files[i] for i in missing])
+        elapsed = (time.perf_counter() - start) / len(missing)
+        for i, frame in zip(missing, results):
+            cache.put(f"ingest:{os.path.basename(csv_files[i])}", keys[i], frame, elapsed)
+            frames[i] = frame
+
+    merged_df = concat_frames([frame for frame in frames if frame is not None])
+    print_merge_summary(merged_df)
+    return merged_df, keys
+
+
+def run_in_memory_upstream(raw_dir, processed_dir, paths, profiler, save=(), cache=None,
+                           renderer=None):
+    """
+    記憶體內流程的合併 / 清理 / 標準化（與特徵選擇門檻無關的上游階段）
+    profiler: utils.profiling.Profiler
+    renderer: eda.render.FigureRenderer（None 時在目前行程直接繪圖）
+    回傳 (標準化後 DataFrame, 摘要 dict：合併筆數、清理報告、scale 階段的快取鍵)
+    """
+    cache = cache or StageCache(None)
+
+    # 1. 合併（原始資料只讀這一次；有快取時只讀新增或修改過的檔案）
+    print("Step 1: 合併 CSV 檔案（記憶體內）...")
+    with profiler.stage("merge") as record:
+        df, ingest_keys = cached_merge(raw_dir, cache)
+        merged_rows = record["rows_out"] = len(df)
+        if "merged" in save:
+            write_table(df, paths["merged"])
+
+    # 2. 清理資料（中位數無法逐檔合併，任一原始檔改變就重算）
+    print("Step 2: 清理資料（記憶體內）...")
+    with profiler.stage("clean", rows_in=merged_rows) as record:
+        clean_key = cache.key("clean", ingest_keys, code=code_version(clean_data_module))
+        df, cleaning_report = cache.run("clean", clean_key, lambda: clean_frame(df))
+        record["rows_out"] = len(df)
+        print_cleaning_report(cleaning_report)
+        if "cleaned" in save:
+            write_table(df, paths["cleaned"])
+    submit_label_distribution(cleaning_report.get("label_counts"), paths, renderer)
+
+    # 3. 數值標準化
+    print("Step 3: 數值標準化（記憶體內）...")
+    with profiler.stage("scale", rows_in=len(df)) as record:
+        scale_key = cache.key("scale", [clean_key], code=code_version(scale_features_module))
+        df, scaler = cache.run("scale", scale_key, lambda: scale_frame(df))
+        record["rows_out"] = len(df)
+        save_artifacts(processed_dir, scaler, cleaning_report)
+        if "preprocessed" in save:
+            write_table(df, paths["preprocessed"])
+
+    return df, {"merged_rows": merged_rows, "cleaning": cleaning_report, "scale_key": scale_key}
+
+
+def run_in_memory_selection_and_split(df, scale_key, processed_dir, paths, params, profiler,
+                                      save=(), cache=None, renderer=None):
+    """
+    記憶體內流程的特徵選擇與切分（只改門檻時，只有這兩步需要重算）
+    scale_key: 上游 scale 階段的快取鍵
+    renderer: eda.render.FigureRenderer（None 時在目前行程直接繪圖）
+    回傳 (最終特徵清單, 各集合的列位置 dict)
+    """
+    cache = cache or StageCache(None)
+
+    # 4. 特徵選擇
+    print("Step 4: 特徵選擇（記憶體內）...")
+    with profiler.stage("select", rows_in=len(df)) as record:
+        # 快取的是相關係數與篩選結果（不含圖檔）：命中時由這些結果重寫 JSON、重繪圖表
+        select_key = cache.key(
+            "select", [scale_key],
+            params={"corr_threshold": params["corr_threshold"],
+                    "high_corr_threshold": params["high_corr_threshold"]},
+            code=code_version(feature_selection_module))
+        selection = cache.run(
+            "select", select_key, lambda: correlation_selection(
+                df, corr_threshold=params["corr_threshold"],
+                high_corr_threshold=params["high_corr_threshold"]))
+        save_selection_outputs(
+            selection,
+            feature_output_path=paths["selected_features"],
+            barplot_output_path=paths["barplot"],
+            heatmap_output_path=paths["heatmap"],
+            renderer=renderer
+        )
+        selected_features = selection["final_features"]
+        record["features_out"] = len(selected_features)
+
+    # 5. 切分資料集（train/val/test）
+    print("Step 5: 切分資料集（記憶體內）...")
+    with profiler.stage("split", rows_in=len(df)) as record:
+        # 快取的只有各集合的列位置（與特徵清單無關，只改門檻時直接命中）
+        split_key = cache.key("split", [scale_key],
+                              params={"mode": params["split_mode"],
+                                      "window": params["split_window"],
+                                      "stratify": params["split_stratify"],
+                                      "seed": params["split_seed"]},
+                              code=code_version(data_split_module))
+        indices = cache.run(
+            "split", split_key, lambda: split_indices(
+                df, mode=params["split_mode"], window=params["split_window"],
+                stratify=params["split_stratify"], seed=params["split_seed"]))
+        record["split_rows"] = {name: len(rows) for name, rows in indices.items()}
+        record["rows_out"] = sum(record["split_rows"].values())
+        if "splits" in save:
+            save_split_indices(df, indices, selected_features, processed_dir,
+                               fmt=params["split_format"])
+
+    return selected_features, indices
+
+
+def run_in_memory_pipeline(raw_dir, processed_dir, paths, params, profiler, save=(),
+                           cache=None, renderer=None):
+    """
+    單次讀取原始資料、各階段在記憶體內串接的流程
+    save: 要寫出的產物（ARTIFACTS 的子集合）；selected_features.json 與圖表一律寫出
+    cache: StageCache，鍵未改變的階段直接讀取快取（None = 不使用快取）
+    renderer: eda.render.FigureRenderer（None 時在目前行程直接繪圖）
+    回傳摘要 dict（合併筆數、清理報告、最終特徵清單）
+    """
+    df, upstream = run_in_memory_upstream(raw_dir, processed_dir, paths, profiler,
+                                          save=save, cache=cache, renderer=renderer)
+    selected_features, _ = run_in_memory_selection_and_split(
+        df, upstream["scale_key"], processed_dir, paths, params, profiler,
+        save=save, cache=cache, renderer=renderer)
+    return {"merged_rows": upstream["merged_rows"], "cleaning": upstream["cleaning"],
+            "selected_features": selected_features}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="資料前處理流程")
+    parser.add_argument("--mode", choices=["disk", "memory", "stream"], default="disk",
+                        help="disk：逐階段讀寫中間檔；memory：各階段在記憶體內串接；"
+                             "stream：分塊串流處理超過記憶體容量的資料")
+    parser.add_argument("--save", nargs="*", choices=ARTIFACTS, default=ARTIFACTS,
+                        help="memory 模式下要寫出的產物（預設全部）")
+    parser.add_argument("--max-memory-mb", type=int, default=1024,
+                        help="stream 模式下單一分塊的記憶體上限（MB）")
+    parser.add_argument("--split-mode", choices=SPLIT_MODES, default="random",
+                        help="random：分層隨機切分；host：同一來源主機只在一個集合（需要 Source IP 欄位）；"
+                             "day：依日期跨日切分；window：依時間窗順序切分（day / window 需要 Timestamp 欄位）")
+    parser.add_argument("--split-stratify", choices=STRATIFY, default="binary",
+                        help="random / host 切分的分層依據：binary（Label_Binary）或 multi（攻擊類別）")
+    parser.add_argument("--split-seed", type=int, default=42,
+                        help="切分的亂數種子（相同資料與 seed 的切分結果固定）")
+    parser.add_argument("--split-window", default="1h",
+                        help="window 切分模式的時間窗長度")
+    parser.add_argument("--split-format", choices=SPLIT_FORMATS, default="npy",
+                        help="切分結果的格式：npy（memmap shard，見 preprocess/split_shards.py）或資料表")
+    parser.add_argument("--cache-dir", default=None,
+                        help="memory 模式的階段快取資料夾（預設不使用快取）")
+    parser.add_argument("--cache-max-gb", type=float, default=20,
+                        help="快取容量上限（GB），超過時淘汰最久未使用的項目")
+    parser.add_argument("--config", default="config.yaml",
+                        help="設定檔（相對於專案根目錄），pipeline 一節提供門檻的預設值")
+    parser.add_argument("--corr-threshold", type=float, default=None,
+                        help="與 Label_Binary 的相關係數門檻（預設取設定檔，否則 0.05）")
+    parser.add_argument("--high-corr-threshold", type=float, default=None,
+                        help="特徵間高度相關的門檻（預設取設定檔，否則 0.9）")
+    parser.add_argument("--profile", action="store_true",
+                        help="以 cProfile 執行各階段，印出最耗時的函式（.prof 寫到 --profile-dir）")
+    parser.add_argument("--trace-malloc", action="store_true",
+                        help="以 tracemalloc 記錄各階段配置記憶體最多的程式行（會明顯變慢）")
+    parser.add_argument("--profile-dir", default="data/profiles",
+                        help="cProfile 結果的資料夾（其下再依執行時間分資料夾）")
+    args = parser.parse_args()
+    if args.cache_dir and args.mode != "memory":
+        parser.error(f"--cache-dir 只適用於 --mode memory（{args.mode} 模式不使用階段快取）")
+
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+    # 設定處理與備份參數
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    processed_dir = os.path.join(BASE_DIR, "data/processed")
+    raw_dir = os.path.join(BASE_DIR, "data/raw")
+    versions_dir = os.path.join(BASE_DIR, "data/versions")
+    # 版本名稱在寫入 data/processed 之前決定：同一分鐘內已有版本時加上 _2 等後綴，避免最後建立快照時撞名
+    version_name = available_version_name(versions_dir, f"{timestamp}_preproc")
+    pipeline_config = load_config(os.path.join(BASE_DIR, args.config)).get("pipeline", {})
+    corr_threshold = (args.corr_threshold if args.corr_threshold is not None
+                      else pipeline_config.get("corr_threshold", 0.05))
+    high_corr_threshold = (args.high_corr_threshold if args.high_corr_threshold is not None
+                           else pipeline_config.get("high_corr_threshold", 0.9))
+
+    # 中間檔格式：parquet（預設，欄式 + 保留 dtype）/ feather / csv
+    intermediate_format = "parquet"
+    # 是否另外匯出 CSV（僅供外部工具檢視用，流程本身不需要）
+    export_csv_copies = False
+
+    # 檔案路徑（含圖表資料夾）
+    paths = pipeline_paths(processed_dir, intermediate_format)
+    params = {
+        "corr_threshold": corr_threshold,
+        "high_corr_threshold": high_corr_threshold,
+        "intermediate_format": intermediate_format,
+        "split_format": args.split_format,
+        "split_mode": args.split_mode,
+        "split_window": args.split_window,
+        "split_stratify": args.split_stratify,
+        "split_seed": args.split_seed,
+    }
+
+    # 紀錄預處理所耗費時間（總計與各階段）；各階段的量測逐筆寫入 trace.jsonl（隨版本快照保存）
+    start_time = time.time()
+    profiler = Profiler(trace_path=os.path.join(processed_dir, TRACE_FILE),
+                        context={"run": version_name, "mode": args.mode},
+                        cprofile=args.profile, tracemalloc=args.trace_malloc,
+                        profile_dir=os.path.join(BASE_DIR, args.profile_dir, timestamp))
+
+    cache = StageCache(args.cache_dir, max_bytes=int(args.cache_max_gb * 1024 ** 3))
+    # 圖表在背景行程繪製，與後續階段同時進行
+    renderer = FigureRenderer()
+    if args.mode == "memory":
+        summary = run_in_memory_pipeline(
+            raw_dir, processed_dir, paths, params, profiler, save=args.save,
+            cache=cache, renderer=renderer)
+        saved_paths = [paths[name] for name in ["merged", "cleaned", "preprocessed"]
+                       if name in args.save]
+    elif args.mode == "stream":
+        summary = run_stream_pipeline(
+            raw_dir, processed_dir, paths, params, profiler, args.max_memory_mb,
+            renderer=renderer)
+        saved_paths = [paths["preprocessed"]]
+    else:
+        summary = run_disk_pipeline(
+            raw_dir, processed_dir, paths, params, profiler, renderer=renderer)
+        saved_paths = [paths["merged"], paths["cleaned"], paths["preprocessed"]]
+
+    # （可選）匯出 CSV 副本
+    if export_csv_copies and intermediate_format != "csv":
+        for path in saved_paths:
+            export_csv(path)
+
+    # 等待背景繪圖完成（圖表需包含在版本快照中）；量測到的只有仍未畫完的部分
+    with profiler.stage("figures") as record:
+        record["failed"] = renderer.wait()
 
     # 計時結束
     end_time = time.time()
     elapsed_seconds = round(end_time - start_time, 2)
+    print_stage_stats(profiler.stages)
+    if cache.enabled:
+        print_cache_summary(cache.summary())
 
-    # 6 備份到版本資料夾（含 figures）
-    print(f"🗂️ 備份處理後資料到 {version_dir}")
-    shutil.copytree(processed_dir, version_dir)
+    # 6 建立版本快照（含 figures）：與舊版相同的檔案只以硬連結共用，不重複佔用空間
+    # 快照記錄整個 data/processed，先移除本次沒寫出的中間檔
+    remove_stale_intermediates(paths, saved_paths)
+    version_dir, version_files, snapshot_stats = snapshot(
+        processed_dir, versions_dir, version_name)
+    print(f"🗂️ 已建立版本快照 {version_dir}")
+    print_snapshot_stats(snapshot_stats)
 
     # 7 寫入 version.json
     version_info = {
         "timestamp": timestamp,
-        "merged_rows": merged_rows,
-        "selected_features": selected_features,
+        "mode": args.mode,
+        "merged_rows": summary["merged_rows"],
+        "selected_features": summary["selected_features"],
+        "cleaning": summary["cleaning"],
         "corr_threshold": corr_threshold,
         "high_corr_threshold": high_corr_threshold,
+        "intermediate_format": intermediate_format,
+        "split_format": args.split_format,
+        "split_mode": args.split_mode,
+        "split_window": args.split_window if args.split_mode == "window" else None,
+        "split_stratify": args.split_stratify,
+        "split_seed": args.split_seed,
         "elapsed_time_seconds": elapsed_seconds,
+        "stages": profiler.stages,
+        "trace": TRACE_FILE,
+        "cache": cache.summary() if cache.enabled else None,
         "figures": {
             "barplot": "figures/correlation_bar_filtered.png",
-            "heatmap": "figures/correlation_heatmap_final.png"
-        }
+            "heatmap": "figures/correlation_heatmap_final.png",
+            "label_distribution": "figures/label_distribution.png"
+        },
+        "snapshot": snapshot_stats,
+        "files": version_files,
     }
-    with open(os.path.join(version_dir, "version.json"), "w") as f:
+    with open(os.path.join(version_dir, VERSION_FILE), "w") as f:
         json.dump(version_info, f, indent=2)
 
     print(f"✅ 前處理流程完成！共耗時 {elapsed_seconds} 秒，version.json 已建立")
@@ -0,0 +1,383 @@
+# 超參搜尋：前處理門檻（corr_threshold / high_corr_threshold 等）與模型超參一起搜尋
+#
+# - 搜尋空間寫在 config.yaml 的 sweep.space：grid 窮舉，或 random 隨機抽 sweep.trials 組
+# - 試驗以 process pool 平行執行，每個試驗限制 sweep.cores_per_trial 個核心
+#   （CPU affinity + torch 執行緒數）
+# - 各試驗共用同一個 StageCache：合併 / 清理 / 標準化只算一次（開始前先在主行程暖快取），
+#   門檻相同的試驗共用特徵選擇、切分與建圖的結果
+# - 每完成一個試驗就寫一列到結果表（CSV）；重跑時已完成的試驗直接略過
+# - 中位數剪枝：warmup 之後，驗證指標低於其他試驗在同一 epoch 的中位數就提前停止
+#
+# 用法（於專案根目錄執行）：
+# python run_sweep.py
+# python run_sweep.py --method random --trials 30 --workers 4 --cores-per-trial 2
+# python run_sweep.py --dry-run          # 只列出要執行的試驗
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import numpy as np
+
+from utils.cache import StageCache, code_version
+from utils.helpers import add_label_binary, load_config
+from utils.profiling import TRACE_FILE, Profiler
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SPACE_SECTIONS = ["pipeline", "train"]
+RESULT_COLUMNS = ["trial", "status", "epochs", "seconds", "best_epoch", "val_metric",
+                  "test_f1", "test_precision", "test_recall", "test_roc_auc", "test_pr_auc", "error"]
+
+
+# ---------- 搜尋空間 ----------
+
+def _sample(spec, rng):
+    """
+    由一個參數的設定抽樣：list 為離散選項，dict 為連續分布（uniform / log_uniform / int）
+    """
+    if isinstance(spec, list):
+        return spec[rng.integers(len(spec))]
+    if "uniform" in spec:
+        low, high = spec["uniform"]
+        return float(rng.uniform(low, high))
+    if "log_uniform" in spec:
+        low, high = spec["log_uniform"]
+        return float(np.exp(rng.uniform(np.log(low), np.log(high))))
+    if "int" in spec:
+        low, high = spec["int"]
+        return int(rng.integers(low, high + 1))
+    raise ValueError(f"不支援的搜尋空間設定：{spec}")
+
+
+def expand_space(space, method="grid", trials=20, seed=0):
+    """
+    將搜尋空間展開成試驗參數清單（每組為 {"pipeline.x": ..., "train.y": ...}）
+    """
+    for name in space:
+        if name.split(".", 1)[0] not in SPACE_SECTIONS or "." not in name:
+            raise ValueError(f"搜尋參數需為 pipeline.<名稱> 或 train.<名稱>：{name}")
+    names = sorted(space)
+    if method == "grid":
+        if any(not isinstance(space[name], list) for name in names):
+            raise ValueError("grid 搜尋的每個參數都必須是選項清單")
+        return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    if method == "random":
+        rng = np.random.default_rng(seed)
+        return [{name: _sample(space[name], rng) for name in names} for _ in range(trials)]
+    raise ValueError(f"未知的搜尋方式：{method}")
+
+
+def trial_id(params, config, sweep):
+    """
+    試驗的識別碼（續跑時判斷是否已完成）：雜湊的是覆寫後的完整 pipeline / train 設定
+    以及 epoch 上限、比較指標與剪枝設定，固定不搜尋的設定改變時也會重新執行
+    """
+    sections = trial_config(config, params)
+    resolved = {
+        **sections,
+        "epochs": sweep.get("epochs", sections["train"].get("epochs", 50)),
+        "metric": sweep.get("metric", "f1"),
+        "prune": sweep.get("prune") or {},
+    }
+    return hashlib.sha256(json.dumps(resolved, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:10]
+
+
+def trial_config(config, params):
+    """
+    以試驗參數覆寫 config 的 pipeline / train 兩節
+    """
+    sections = {section: dict(config.get(section, {})) for section in SPACE_SECTIONS}
+    for name, value in params.items():
+        section, key = name.split(".", 1)
+        sections[section][key] = value
+    return sections
+
+
+# ---------- 剪枝 ----------
+
+class MedianPruner:
+    """
+    中位數剪枝：reports 為多行程共用的 dict（trial → 各 epoch 的驗證指標），
+    某試驗到目前為止的最佳值低於其他試驗在同一 epoch 的最佳值中位數時剪枝
+    """
+
+    def __init__(self, reports, warmup_epochs=3, min_trials=3):
+        self.reports = reports
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+
+    def report(self, trial, value):
+        """
+        記錄一個 epoch 的驗證指標，回傳是否應剪枝
+        """
+        values = list(self.reports.get(trial, [])) + [value]
+        self.reports[trial] = values
+        step = len(values)
+        if step <= self.warmup_epochs:
+            return False
+        others = [max(history[:step]) for other, history in self.reports.items()
+                  if other != trial and len(history) >= step]
+        if len(others) < self.min_trials:
+            return False
+        return max(values) < float(np.median(others))
+
+
+# ---------- 試驗執行（worker 行程） ----------
+
+def _init_worker(core_queue):
+    """
+    worker 啟動時取得一組 CPU 核心，限制 affinity 與數值函式庫的執行緒數（需在匯入 torch 前設定）
+    """
+    cores = core_queue.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    for var in ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]:
+        os.environ[var] = str(len(cores))
+
+
+def prepare_upstream(raw_dir, cache_dir, processed_dir):
+    """
+    在主行程先跑一次合併 / 清理 / 標準化，讓所有試驗都直接命中快取
+    """
+    from run_preprocessing_pipeline import pipeline_paths, run_in_memory_upstream
+
+    profiler = Profiler()
+    run_in_memory_upstream(raw_dir, processed_dir, pipeline_paths(processed_dir), profiler,
+                           cache=StageCache(cache_dir))
+    return profiler.stages
+
+
+def build_trial_graph(df, features, node_key, benign_keep, split_index_path):
+    """
+    由試驗的前處理結果建圖；負樣本抽樣時保留 val / test 的流量
+    """
+    from data.make_graph import build_graph, protected_flows
+
+    protected = protected_flows(split_index_path, len(df)) if benign_keep < 1.0 else None
+    return build_graph(df, features, node_key=node_key, benign_keep=benign_keep,
+                       protected=protected)
+
+
+def run_trial(trial, params, config, sweep, raw_dir, reports):
+    """
+    執行一個試驗：前處理（共用快取）→ 建圖（共用快取）→ 訓練（可被剪枝）
+    回傳結果表的一列
+    """
+    start = time.perf_counter()
+    sections = trial_config(config, params)
+    pipeline, train = sections["pipeline"], sections["train"]
+    trial_dir = os.path.join(sweep["output_dir"], trial)
+    processed_dir = os.path.join(trial_dir, "processed")
+    cache = StageCache(sweep["cache_dir"])
+    row = {"trial": trial, **params}
+
+    try:
+        import data.make_graph as make_graph_module
+        from data.make_graph import save_graph
+        from eda.render import FigureRenderer
+        from run_preprocessing_pipeline import (
+            pipeline_paths, run_in_memory_selection_and_split, run_in_memory_upstream)
+
+        paths = pipeline_paths(processed_dir)
+        profiler = Profiler(trace_path=os.path.join(trial_dir, TRACE_FILE), context={"trial": trial})
+        # 圖表在背景行程繪製，與特徵選擇之後的階段重疊；訓練前等待完成
+        renderer = FigureRenderer()
+        df, upstream = run_in_memory_upstream(raw_dir, processed_dir, paths, profiler, cache=cache,
+                                              renderer=renderer)
+        pipeline_params = {
+            "corr_threshold": pipeline.get("corr_threshold", 0.05),
+            "high_corr_threshold": pipeline.get("high_corr_threshold", 0.9),
+            "split_mode": pipeline.get("split_mode", "random"),
+            "split_window": pipeline.get("split_window", "1h"),
+            "split_stratify": pipeline.get("split_stratify", "binary"),
+            "split_seed": pipeline.get("split_seed", 42),
+            "intermediate_format": "parquet",
+            "split_format": "npy",
+        }
+        features, _ = run_in_memory_selection_and_split(
+            df, upstream["scale_key"], processed_dir, paths, pipeline_params, profiler,
+            save=("splits",), cache=cache, renderer=renderer)
+
+        node_key = pipeline.get("node_key", "endpoint")
+        benign_keep = pipeline.get("benign_keep", 1.0)
+        if 'Label_Binary' not in df.columns:
+            add_label_binary(df)
+        split_index_path = os.path.join(processed_dir, "split_index.npz")
+        # 負樣本抽樣時 val / test 的流量一律保留：圖也取決於切分參數
+        split_params = ({name: pipeline_params[name] for name in pipeline_params if name.startswith("split_")}
+                        if benign_keep < 1.0 else None)
+        graph_key = cache.key("graph", [upstream["scale_key"]],
+                              params={"features": features, "node_key": node_key,
+                                      "benign_keep": benign_keep, "split": split_params},
+                              code=code_version(make_graph_module))
+        graph_path = os.path.join(trial_dir, "graph.npz")
+        with profiler.stage("graph", rows_in=len(df)) as record:
+            graph = cache.run("graph", graph_key, partial(
+                build_trial_graph, df, features, node_key, benign_keep, split_index_path))
+            save_graph(graph, graph_path)
+            record["rows_out"] = graph["edge_index"].shape[1]
+        del df, graph
+        renderer.wait()
+
+        from train.engine import run_training
+
+        model_name = train.pop("model", "graphsage")
+        train.update({
+            "graph_path": graph_path,
+            "split_index_path": split_index_path,
+            "checkpoint_dir": os.path.join(trial_dir, "checkpoints"),
+            # sgc / sign：預先傳播特徵以圖與特徵清單的內容為鍵，相同的圖在各試驗間共用
+            "features_path": paths["selected_features"],
+            "precompute_dir": os.path.join(sweep["cache_dir"], "precompute"),
+            "epochs": sweep.get("epochs", train.get("epochs", 50)),
+            "threads": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity")
+            else sweep["cores_per_trial"],
+        })
+        metric = sweep.get("metric", "f1")
+        prune = sweep.get("prune") or {}
+        pruner = MedianPruner(reports, warmup_epochs=prune.get("warmup_epochs", 3),
+                              min_trials=prune.get("min_trials", 3))
+        result = run_training(model_name, train,
+                              epoch_callback=lambda record: pruner.report(trial, record["val"][metric]))
+
+        history = result["history"]
+        best = max(history, key=lambda record: record["val"][metric])
+        row.update({"status": "pruned" if result["pruned"] else "complete",
+                    "epochs": len(history), "best_epoch": best["epoch"],
+                    "val_metric": best["val"][metric]})
+        if result["test"] is not None:
+            row.update({f"test_{name}": result["test"].get(name)
+                        for name in ["f1", "precision", "recall", "roc_auc", "pr_auc"]})
+    except Exception as exc:
+        row.update({"status": "failed", "error": f"{type(exc).__name__}: {exc}"})
+    row["seconds"] = round(time.perf_counter() - start, 2)
+    return row
+
+
+# ---------- 結果表 ----------
+
+def completed_trials(results_path):
+    """
+    結果表中已完成（complete / pruned）的試驗 ID
+    """
+    if not os.path.exists(results_path):
+        return set()
+    with open(results_path, "r", newline="") as f:
+        return {row["trial"] for row in csv.DictReader(f) if row["status"] in ("complete", "pruned")}
+
+
+def append_result(results_path, row, param_names):
+    columns = RESULT_COLUMNS[:1] + param_names + RESULT_COLUMNS[1:]
+    new_file = not os.path.exists(results_path)
+    with open(results_path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        if new_file:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def print_top_trials(results_path, metric, top=5):
+    with open(results_path, "r", newline="") as f:
+        rows = [row for row in csv.DictReader(f) if row["val_metric"]]
+    rows.sort(key=lambda row: float(row["val_metric"]), reverse=True)
+    print(f"🏆 驗證 {metric} 前 {min(top, len(rows))} 名：")
+    for row in rows[:top]:
+        params = {key: value for key, value in row.items()
+                  if key.split(".", 1)[0] in SPACE_SECTIONS and "." in key}
+        print(f"  {row['trial']} {float(row['val_metric']):.4f} [{row['status']}] {params}")
+
+
+def run_sweep(config, raw_dir, workers=None, cores_per_trial=None, dry_run=False):
+    """
+    依 config["sweep"] 執行搜尋，結果逐列寫入 sweep.results；回傳本次執行的結果列
+    """
+    sweep = dict(config.get("sweep", {}))
+    sweep.setdefault("cache_dir", "data/cache")
+    sweep.setdefault("output_dir", "experiments/sweeps")
+    sweep.setdefault("results", os.path.join(sweep["output_dir"], "results.csv"))
+    for key in ["cache_dir", "output_dir", "results"]:
+        sweep[key] = os.path.join(BASE_DIR, sweep[key])
+    sweep["workers"] = workers or sweep.get("workers", 1)
+    sweep["cores_per_trial"] = cores_per_trial or sweep.get("cores_per_trial", 1)
+
+    space = sweep.get("space") or {}
+    param_names = sorted(space)
+    all_params = expand_space(space, sweep.get("method", "grid"), sweep.get("trials", 20),
+                              sweep.get("seed", 0))
+    done = completed_trials(sweep["results"])
+    pending = [(trial_id(params, config, sweep), params) for params in all_params]
+    pending = [(trial, params) for trial, params in pending if trial not in done]
+    print(f"🔍 共 {len(all_params)} 組試驗，已完成 {len(all_params) - len(pending)} 組，"
+          f"待執行 {len(pending)} 組（{sweep['workers']} 個 worker × {sweep['cores_per_trial']} 核心）")
+    if dry_run:
+        for trial, params in pending:
+            print(f"  {trial} {params}")
+        return []
+    if not pending:
+        return []
+
+    os.makedirs(sweep["output_dir"], exist_ok=True)
+    print("Step 0: 準備共用的前處理快取...")
+    prepare_upstream(raw_dir, sweep["cache_dir"], os.path.join(sweep["output_dir"], "upstream"))
+
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") \
+        else list(range(os.cpu_count()))
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    core_queue = manager.Queue()
+    for i in range(sweep["workers"]):
+        start = (i * sweep["cores_per_trial"]) % len(available)
+        cores = [available[(start + j) % len(available)] for j in range(sweep["cores_per_trial"])]
+        core_queue.put(sorted(set(cores)))
+    reports = manager.dict()
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=sweep["workers"], mp_context=context,
+                             initializer=_init_worker, initargs=(core_queue,)) as pool:
+        futures = [pool.submit(run_trial, trial, params, config, sweep, raw_dir, reports)
+                   for trial, params in pending]
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            append_result(sweep["results"], row, param_names)
+            metric = f"{row['val_metric']:.4f}" if row.get("val_metric") is not None else "-"
+            print(f"{'✅' if row['status'] == 'complete' else '✂️' if row['status'] == 'pruned' else '❌'} "
+                  f"[{len(rows)}/{len(pending)}] {row['trial']} {row['status']} "
+                  f"val {sweep.get('metric', 'f1')} {metric}（{row['seconds']} 秒）"
+                  + (f" {row['error']}" if row.get("error") else ""))
+    manager.shutdown()
+    print_top_trials(sweep["results"], sweep.get("metric", "f1"))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="前處理門檻與模型超參的平行搜尋")
+    parser.add_argument("--config", default="config.yaml", help="設定檔（相對於專案根目錄）")
+    parser.add_argument("--method", choices=["grid", "random"], default=None,
+                        help="覆寫 sweep.method")
+    parser.add_argument("--trials", type=int, default=None, help="覆寫 sweep.trials（random）")
+    parser.add_argument("--workers", type=int, default=None, help="覆寫 sweep.workers")
+    parser.add_argument("--cores-per-trial", type=int, default=None,
+                        help="覆寫 sweep.cores_per_trial")
+    parser.add_argument("--dry-run", action="store_true", help="只列出要執行的試驗")
+    args = parser.parse_args()
+
+    config = load_config(os.path.join(BASE_DIR, args.config))
+    if not config.get("sweep"):
+        parser.error(f"{args.config} 中沒有 sweep 設定")
+    if args.method:
+        config["sweep"]["method"] = args.method
+    if args.trials:
+        config["sweep"]["trials"] = args.trials
+
+    start = time.time()
+    run_sweep(config, os.path.join(BASE_DIR, "data/raw"), workers=args.workers,
+              cores_per_trial=args.cores_per_trial, dry_run=args.dry_run)
+    print(f"⏱️ 搜尋共耗時 {time.time() - start:.1f} 秒")
@@ -0,0 +1,192 @@
+# 評分服務壓力測試：依時間順序重播 CICIDS2017 CSV，量測吞吐量與延遲
+#
+# 用法（於專案根目錄執行，先啟動 serve.scoring_server）：
+# python -m serve.load_generator data/raw/*.csv --http 127.0.0.1:8080 --concurrency 8
+# python -m serve.load_generator data/raw/*.csv --unix /tmp/scoring.sock --request-size 16
+# 不啟動服務、直接在同一個行程內評分：
+# python -m serve.load_generator data/raw/*.csv --checkpoint ... --artifact-dir ...
+
+import argparse
+import http.client
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def iter_requests(paths, request_size, max_flows=None, chunk_rows=100_000):
+    """
+    逐檔、逐塊讀取 CSV，切成每 request_size 筆流量一個請求（list of dict）
+    """
+    sent = 0
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, encoding='latin1', low_memory=False):
+            chunk.columns = chunk.columns.str.strip()
+            chunk = chunk.replace([np.inf, -np.inf], np.nan).astype(object)
+            chunk = chunk.where(chunk.notna(), None)
+            records = chunk.to_dict('records')
+            for start in range(0, len(records), request_size):
+                if max_flows is not None and sent >= max_flows:
+                    return
+                batch = records[start:start + request_size]
+                if max_flows is not None:
+                    batch = batch[:max_flows - sent]
+                sent += len(batch)
+                yield batch
+
+
+class HttpClient:
+    def __init__(self, address):
+        host, port = address.rsplit(":", 1)
+        self.conn = http.client.HTTPConnection(host, int(port))
+
+    def _request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self.conn.request(method, path, body=body, headers=headers)
+        return json.loads(self.conn.getresponse().read())
+
+    def score(self, flows):
+        return self._request("POST", "/score", json.dumps({"flows": flows}))["scores"]
+
+    def metrics(self):
+        return self._request("GET", "/metrics")
+
+    def close(self):
+        self.conn.close()
+
+
+class UnixClient:
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.reader = self.sock.makefile("rb")
+
+    def _request(self, payload):
+        self.sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        return json.loads(self.reader.readline())
+
+    def score(self, flows):
+        return self._request({"flows": flows})["scores"]
+
+    def metrics(self):
+        return self._request({"metrics": True})
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+class InProcessClient:
+    def __init__(self, service):
+        self.service = service
+
+    def score(self, flows):
+        return self.service.score(flows)
+
+    def metrics(self):
+        return self.service.metrics()
+
+    def close(self):
+        pass
+
+
+def run_load(make_client, requests, concurrency=4, rate=None):
+    """
+    以 concurrency 個執行緒送出請求；rate 為每秒最多送出的流量數（None 為不限速）
+    回傳 (每個請求的延遲秒數, 流量數, 總耗時, 錯誤數)
+    """
+    lock = threading.Lock()
+    latencies = []
+    counts = {"flows": 0, "errors": 0}
+    start = time.perf_counter()
+
+    def worker():
+        client = make_client()
+        try:
+            while True:
+                with lock:
+                    flows = next(requests, None)
+                    sent = counts["flows"]
+                    counts["flows"] += len(flows) if flows else 0
+                if flows is None:
+                    return
+                if rate:
+                    delay = start + sent / rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                t0 = time.perf_counter()
+                try:
+                    client.score(flows)
+                except Exception:
+                    with lock:
+                        counts["errors"] += 1
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - t0)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), counts["flows"], time.perf_counter() - start, counts["errors"]
+
+
+def print_load_report(latencies, flows, elapsed, errors, server_metrics=None):
+    print(f"📊 共 {flows} 筆流量、{len(latencies)} 個請求、耗時 {elapsed:.2f} 秒")
+    print(f"   吞吐量：{flows / elapsed:.0f} flows/s")
+    if len(latencies):
+        p50, p99 = np.percentile(latencies * 1000, [50, 99])
+        print(f"   用戶端延遲：p50 {p50:.2f} ms、p99 {p99:.2f} ms")
+    if errors:
+        print(f"   ⚠️ 失敗請求：{errors}")
+    if server_metrics and server_metrics.get("p50_ms") is not None:
+        print(f"   服務端：p50 {server_metrics['p50_ms']:.2f} ms、p99 {server_metrics['p99_ms']:.2f} ms、"
+              f"平均批次 {server_metrics['mean_batch_size']:.1f} 筆")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重播 CICIDS2017 CSV 以測試評分服務吞吐量")
+    parser.add_argument("csv", nargs="+", help="要重播的原始 CSV（依給定順序）")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--http", help="評分服務 HTTP 位址，例如 127.0.0.1:8080")
+    target.add_argument("--unix", help="評分服務 Unix socket 路徑")
+    target.add_argument("--checkpoint", help="不經網路，直接在同一行程內載入模型評分")
+    parser.add_argument("--artifact-dir", help="搭配 --checkpoint 使用的前處理參數資料夾")
+    parser.add_argument("--concurrency", type=int, default=4, help="同時送出請求的連線數")
+    parser.add_argument("--request-size", type=int, default=1, help="每個請求包含幾筆流量")
+    parser.add_argument("--rate", type=float, default=None, help="每秒最多送出幾筆流量（預設不限速）")
+    parser.add_argument("--max-flows", type=int, default=None, help="最多重播幾筆流量")
+    parser.add_argument("--max-batch", type=int, default=256, help="搭配 --checkpoint：每批最多幾筆")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="搭配 --checkpoint：批次最長等待")
+    args = parser.parse_args()
+
+    service = None
+    if args.http:
+        make_client = lambda: HttpClient(args.http)
+    elif args.unix:
+        make_client = lambda: UnixClient(args.unix)
+    else:
+        if not args.artifact_dir:
+            parser.error("--checkpoint 需搭配 --artifact-dir")
+        from serve.scoring_server import ScoringService
+
+        service = ScoringService.from_checkpoint(args.checkpoint, args.artifact_dir,
+                                                 max_batch=args.max_batch,
+                                                 max_wait_ms=args.max_wait_ms)
+        make_client = lambda: InProcessClient(service)
+
+    requests = iter_requests(args.csv, args.request_size, max_flows=args.max_flows)
+    latencies, flows, elapsed, errors = run_load(make_client, requests,
+                                                 concurrency=args.concurrency, rate=args.rate)
+    client = make_client()
+    server_metrics = client.metrics()
+    client.close()
+    print_load_report(latencies, flows, elapsed, errors, server_metrics)
+    if service is not None:
+        service.close()
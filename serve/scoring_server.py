@@ -0,0 +1,393 @@
+# 線上評分服務：即時流量 → 前處理 → 滾動通訊圖 → GNN 異常分數
+#
+# 流程（單一評分執行緒依序處理，滾動圖不需要鎖）：
+# 1. 請求進入佇列，MicroBatcher 收集到 max_batch 筆或第一筆等待超過 max_wait_ms 時組成一批
+# 2. 以保存的前處理參數（preprocess.transform）補值、移除無效列、只標準化選定特徵
+# 3. 更新記憶體內的滾動通訊圖（data/rolling_graph，只保留最近 horizon 內的流量），
+#    只重算受本批影響的 k-hop 鄰域的節點 embedding（其餘沿用快取）
+# 4. 以訓練好的 checkpoint 計算每筆流量（邊）為攻擊的機率，作為異常分數
+#    （被前處理移除的流量，如含 Inf 的列，分數為 null）
+#
+# 可在 Python 內直接使用 ScoringService，或啟動本機 HTTP / Unix socket 服務：
+# python -m serve.scoring_server --checkpoint experiments/checkpoints/graphsage/best.pt \
+#     --artifact-dir data/processed --http 127.0.0.1:8080
+# python -m serve.scoring_server --checkpoint ... --artifact-dir ... --unix /tmp/scoring.sock
+#
+# HTTP：POST /score，body 為 {"flows": [流量 dict, ...]}（欄位同原始 CSV），回傳 {"scores": [...]}；
+#       GET /metrics 回傳 p50 / p99 延遲、吞吐量與平均批次大小
+# Unix socket：每行一個 JSON 請求（同 HTTP body，或 {"metrics": true}），每行回傳一個 JSON
+
+import argparse
+import json
+import math
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from data.make_graph import ENDPOINT_COLUMNS, parse_timestamps, to_seconds
+from data.rolling_graph import RollingGraph
+from preprocess.transform import load_artifacts, transform_frame
+
+# 計算 p50 / p99 時保留的最近請求數
+LATENCY_WINDOW = 10_000
+
+
+class GraphScorer:
+    """
+    載入 checkpoint 與前處理參數，對一批原始流量計算異常分數（攻擊機率）
+    clock="flow" 時以流量的 Timestamp 推進滾動圖（重播 CSV），"wall" 時用接收時間
+    節點 embedding 快取在滾動圖中，每批只重算受新流量 / 過期流量影響的 k-hop 鄰域
+    """
+
+    def __init__(self, checkpoint_path, artifact_dir, horizon="5min", node_key="endpoint",
+                 hops=None, max_neighbors=32, clock="flow", threads=None):
+        import torch
+
+        from train.engine import PRECOMPUTED_MODELS, build_model
+
+        self.torch = torch
+        if threads:
+            torch.set_num_threads(threads)
+        checkpoint = torch.load(checkpoint_path, map_location="cpu", weights_only=False)
+        config = checkpoint["config"]
+        if config["model"] in PRECOMPUTED_MODELS:
+            raise ValueError(f"{config['model']} 使用整張圖預先傳播的特徵，無法在滾動圖上即時評分")
+        self.model = build_model(config["model"], **config["model_args"])
+        self.model.load_state_dict(checkpoint["model"])
+        self.model.eval()
+
+        self.artifacts = load_artifacts(artifact_dir)
+        if config["task"] == "binary":
+            self.benign_class = 0
+        else:
+            self.benign_class = int(np.flatnonzero(
+                self.artifacts["label_encoder"].classes_ == 'BENIGN')[0])
+        self.hops = hops or config["num_layers"]
+        self.max_neighbors = max_neighbors
+        self.clock = clock
+        self.graph = RollingGraph(len(self.artifacts["features"]), to_seconds(horizon),
+                                  node_key=node_key)
+
+    def refresh_embeddings(self, nodes):
+        """
+        重算受影響節點（與 nodes 中尚無快取者）的 embedding：
+        在其 k-hop 鄰域組成的子圖上編碼，只寫回受影響節點
+        """
+        graph = self.graph
+        affected = graph.affected_nodes(self.hops, self.max_neighbors)
+        stale = np.union1d(affected, graph.stale_nodes(nodes))
+        if len(stale) == 0:
+            return 0
+        computation = graph.k_hop(stale, self.hops, self.max_neighbors)
+        edge_index, _ = graph.subgraph_edges(computation)
+        with self.torch.no_grad():
+            h = self.model.encode(self.torch.from_numpy(graph.node_features(computation)),
+                                  self.torch.from_numpy(edge_index))
+        graph.set_embeddings(stale, h[:len(stale)].numpy())
+        return len(stale)
+
+    def score(self, flows):
+        """
+        flows: list of dict（欄位同原始 CSV）；回傳與 flows 等長的分數 list（無效流量為 None）
+        """
+        torch = self.torch
+        df = pd.DataFrame.from_records(flows)
+        out = transform_frame(df, self.artifacts)
+        scores = [None] * len(flows)
+        if len(out) == 0:
+            return scores
+
+        if self.clock == "flow" and 'Timestamp' in out.columns:
+            timestamps = parse_timestamps(out['Timestamp'])
+        else:
+            timestamps = np.full(len(out), int(time.time()), dtype=np.int64)
+        attrs = out[self.artifacts["features"]].to_numpy(dtype=np.float32)
+
+        self.graph.expire(int(timestamps.max()))
+        src, dst, _ = self.graph.insert(
+            out[ENDPOINT_COLUMNS["src_ip"]].astype(str).to_numpy(),
+            out[ENDPOINT_COLUMNS["src_port"]].to_numpy(),
+            out[ENDPOINT_COLUMNS["dst_ip"]].astype(str).to_numpy(),
+            out[ENDPOINT_COLUMNS["dst_port"]].to_numpy(),
+            attrs, timestamps)
+        self.refresh_embeddings(np.concatenate([src, dst]))
+
+        n = len(out)
+        h = torch.from_numpy(self.graph.embedding[np.concatenate([src, dst])])
+        label_index = torch.stack([torch.arange(n), torch.arange(n, 2 * n)])
+        with torch.no_grad():
+            logits = self.model.classify(h, label_index, torch.from_numpy(attrs))
+            attack_prob = 1 - torch.softmax(logits, dim=-1)[:, self.benign_class]
+        for position, score in zip(df.index.get_indexer(out.index), attack_prob.tolist()):
+            scores[position] = score
+        return scores
+
+
+class _Request:
+    __slots__ = ("flows", "future", "enqueued")
+
+    def __init__(self, flows):
+        self.flows = flows
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    把多個請求合併成一批呼叫 score_fn：湊滿 max_batch 筆流量，或第一個請求已等待 max_wait_ms 即送出
+    score_fn 只在單一背景執行緒中執行；整批失敗時改為逐一評分各請求，
+    只有本身有問題的請求收到例外，同批的其他請求不受影響
+    """
+
+    def __init__(self, score_fn, max_batch=256, max_wait_ms=5.0):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self.flows_scored = 0
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, flows):
+        request = _Request(list(flows))
+        self.queue.put(request)
+        return request.future
+
+    def _collect(self):
+        first = self.queue.get()
+        if first is None:
+            return None
+        batch, n_flows = [first], len(first.flows)
+        deadline = first.enqueued + self.max_wait
+        while n_flows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self.queue.put(None)
+                break
+            batch.append(request)
+            n_flows += len(request.flows)
+        return batch
+
+    def _score_each(self, batch):
+        """
+        合併評分失敗時的退路：逐一評分各請求，回傳成功評分的流量數
+        """
+        n_scored = 0
+        for request in batch:
+            try:
+                scores = self.score_fn(request.flows)
+            except Exception as exc:
+                request.future.set_exception(exc)
+                continue
+            request.future.set_result(scores)
+            self.latencies.append(time.perf_counter() - request.enqueued)
+            n_scored += len(request.flows)
+        return n_scored
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            flows = [flow for request in batch for flow in request.flows]
+            try:
+                scores = self.score_fn(flows)
+            except Exception as exc:
+                if len(batch) == 1:
+                    batch[0].future.set_exception(exc)
+                else:
+                    n_scored = self._score_each(batch)
+                    self.batch_sizes.append(len(flows))
+                    self.flows_scored += n_scored
+                continue
+            done = time.perf_counter()
+            offset = 0
+            for request in batch:
+                request.future.set_result(scores[offset:offset + len(request.flows)])
+                offset += len(request.flows)
+                self.latencies.append(done - request.enqueued)
+            self.batch_sizes.append(len(flows))
+            self.flows_scored += len(flows)
+
+    def metrics(self):
+        """
+        最近 LATENCY_WINDOW 個請求的延遲分位數（毫秒）、平均批次大小與累計吞吐量
+        """
+        latencies = np.array(self.latencies) * 1000
+        elapsed = time.perf_counter() - self.started
+        return {
+            "requests": len(latencies),
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else None,
+            "flows_scored": self.flows_scored,
+            "flows_per_sec": self.flows_scored / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+class ScoringService:
+    """
+    在 Python 內直接使用的評分服務（HTTP / Unix socket 服務也包在這之上）
+    """
+
+    def __init__(self, score_fn, max_batch=256, max_wait_ms=5.0):
+        self.batcher = MicroBatcher(score_fn, max_batch=max_batch, max_wait_ms=max_wait_ms)
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint_path, artifact_dir, max_batch=256, max_wait_ms=5.0,
+                        **scorer_kwargs):
+        scorer = GraphScorer(checkpoint_path, artifact_dir, **scorer_kwargs)
+        return cls(scorer.score, max_batch=max_batch, max_wait_ms=max_wait_ms)
+
+    def score(self, flows, timeout=None):
+        return self.batcher.submit(flows).result(timeout=timeout)
+
+    def metrics(self):
+        return self.batcher.metrics()
+
+    def close(self):
+        self.batcher.close()
+
+
+def _json_scores(scores):
+    return [None if score is None or math.isnan(score) else score for score in scores]
+
+
+def handle_request(service, payload):
+    """
+    處理一個 JSON 請求：{"flows": [...]}、單一流量 dict 或 {"metrics": true}
+    格式不符時拋出 ValueError（回應 400）
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("請求需為 JSON 物件：{\"flows\": [...]}、單一流量或 {\"metrics\": true}")
+    if payload.get("metrics"):
+        return service.metrics()
+    flows = payload["flows"] if "flows" in payload else [payload]
+    if not isinstance(flows, list) or not all(isinstance(flow, dict) for flow in flows):
+        raise ValueError("flows 需為流量物件（dict）的陣列")
+    return {"scores": _json_scores(service.score(flows))}
+
+
+def _error_response(exc):
+    """
+    例外 → (HTTP 狀態碼, JSON 內容)：請求格式或欄位錯誤為 400，其他（評分失敗等）為 500
+    """
+    if isinstance(exc, (ValueError, KeyError, TypeError)):
+        return 400, {"error": f"{type(exc).__name__}: {exc}"}
+    return 500, {"error": f"{type(exc).__name__}: {exc}"}
+
+
+def make_http_server(service, host, port):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(200, service.metrics())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                self._send(200, handle_request(service, payload))
+            except Exception as exc:
+                self._send(*_error_response(exc))
+
+        def log_message(self, format, *args):
+            pass
+
+    ThreadingHTTPServer.daemon_threads = True
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def make_unix_server(service, socket_path):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    response = handle_request(service, json.loads(line))
+                except Exception as exc:
+                    response = _error_response(exc)[1]
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    socketserver.ThreadingUnixStreamServer.daemon_threads = True
+    return socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GNN 線上評分服務")
+    parser.add_argument("--checkpoint", required=True, help="train.engine 輸出的 best.pt")
+    parser.add_argument("--artifact-dir", required=True,
+                        help="含 scaler.joblib / label_encoder.joblib / cleaning_params.json 的資料夾")
+    endpoint = parser.add_mutually_exclusive_group(required=True)
+    endpoint.add_argument("--http", help="HTTP 監聽位址，例如 127.0.0.1:8080")
+    endpoint.add_argument("--unix", help="Unix socket 路徑，例如 /tmp/scoring.sock")
+    parser.add_argument("--max-batch", type=int, default=256, help="每批最多幾筆流量")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="第一個請求最多等待多久就送出（毫秒）")
+    parser.add_argument("--horizon", default="5min", help="滾動圖保留的時間範圍")
+    parser.add_argument("--node-key", choices=["endpoint", "host"], default="endpoint",
+                        help="需與訓練時建圖的設定相同")
+    parser.add_argument("--hops", type=int, default=None, help="子圖範圍（預設為模型層數）")
+    parser.add_argument("--max-neighbors", type=int, default=32)
+    parser.add_argument("--clock", choices=["flow", "wall"], default="flow",
+                        help="flow：以流量 Timestamp 推進滾動圖（重播）；wall：以接收時間")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    service = ScoringService.from_checkpoint(
+        args.checkpoint, args.artifact_dir, max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms, horizon=args.horizon, node_key=args.node_key,
+        hops=args.hops, max_neighbors=args.max_neighbors, clock=args.clock,
+        threads=args.threads)
+    if args.http:
+        host, port = args.http.rsplit(":", 1)
+        server = make_http_server(service, host, int(port))
+        print(f"🚀 評分服務已啟動：http://{args.http}（POST /score、GET /metrics）")
+    else:
+        server = make_unix_server(service, args.unix)
+        print(f"🚀 評分服務已啟動：unix://{args.unix}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,526 @@
+# GNN 訓練引擎（GCN / GAT / GraphSAGE 共用）
+#
+# - 任務：邊分類（每條邊為一筆或一組流量，標籤為 edge_label 或 edge_label_multi）
+# - 訓練 / 驗證 / 測試的邊：由 split_data_and_save 輸出的 split_index.npz 或 splits/ shard
+#   （preprocessed 的列位置）
+#   經圖的 flow_edge 對應到邊；合併平行流量的邊取多數流量所屬的集合
+# - full-batch：整張圖一次前向（小圖適用）；mini-batch：LinkNeighborLoader 依每層 fan-out 抽樣鄰居，
+#   以多個 worker 平行建構 batch
+# - sgc / sign：節點特徵的多跳傳播 Â^k X 預先算好並快取（data/precompute.py），
+#   訓練時只依邊分批讀取兩端節點的傳播特徵，不做訊息傳遞、不需 torch-geometric
+# - 類別不平衡：sampling 指定 stratified / balanced / weighted 時，訓練邊依 edge_label_multi 以 ClassSampler
+#   產生每個 epoch 的順序（train/sampling.py，只產生邊 ID，不複製特徵）
+# - 梯度累積（accumulate_steps 個 batch 更新一次）、依驗證集 F1 early stopping、
+#   每個 epoch 寫出 last.pt，驗證集進步時寫出 best.pt（可 --resume 接續）
+# - 每個 epoch 印出 samples/sec 與峰值 RSS（主行程與 worker 分開）
+# - 讀圖 / 訓練 / 測試各階段的量測寫入 checkpoint 資料夾的 trace.jsonl 與 history.json（utils/profiling.py）
+#
+# 用法（於專案根目錄執行，通常透過 train/train_gcn.py 等腳本）：
+# python -m train.train_graphsage --fanout 15 10 --batch-size 2048 --num-workers 4
+# python -m train.train_sign --hops 3 --batch-size 8192
+
+import argparse
+import json
+import os
+import resource
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from data.make_graph import load_graph, to_pyg
+from data.precompute import precompute_features
+from evaluate.metrics import StreamingMetrics
+from preprocess.split_shards import SplitShards
+from train.sampling import SAMPLING_MODES, ClassSampler
+from utils.helpers import load_config
+from utils.profiling import TRACE_FILE, Profiler
+
+DEFAULT_CONFIG = {
+    "graph_path": "data/processed/graph.npz",
+    "split_index_path": "data/processed/split_index.npz",
+    "checkpoint_dir": "experiments/checkpoints",
+    "task": "binary",            # binary：edge_label；multi：edge_label_multi
+    "hidden": 64,
+    "num_layers": 2,
+    "heads": 4,                  # 只有 GAT 使用
+    "dropout": 0.3,
+    "lr": 1e-3,
+    "weight_decay": 5e-4,
+    "epochs": 50,
+    "patience": 5,
+    "full_batch": False,
+    "fanout": [15, 10],          # 每層抽樣的鄰居數（-1 = 全部）
+    "batch_size": 1024,          # 每個 batch 的目標邊數
+    "eval_batch_size": 8192,
+    "accumulate_steps": 1,
+    "num_workers": 2,
+    "threads": None,             # torch 運算執行緒數（None = torch 預設）
+    "seed": 42,
+    "resume": False,
+    "sampling": "shuffle",       # 訓練邊的抽樣：shuffle / stratified / balanced / weighted（見 train/sampling.py）
+    "sampling_power": 0.5,       # weighted 模式：類別機率 ∝ 邊數^power
+    "profile": False,            # 以 cProfile 找出訓練的熱點（.prof 寫在 checkpoint 資料夾的 profile/）
+    # 以下只有 sgc / sign 使用
+    "hops": 2,                   # 預先傳播的跳數 K（Â^1 X ... Â^K X）
+    "features_path": "data/processed/selected_features.json",  # 納入預先傳播快取的鍵
+    "precompute_dir": "data/processed/precompute",
+    "precompute_workers": None,  # 稀疏矩陣乘法的執行緒數（None = CPU 核心數）
+}
+SPLITS = ["train", "val", "test"]
+# 使用預先傳播特徵的模型（訓練時不做訊息傳遞）
+PRECOMPUTED_MODELS = ["sgc", "sign"]
+
+
+def build_model(model_name, **kwargs):
+    """
+    依名稱建立模型（延遲匯入，只載入需要的 PyG 卷積層）
+    """
+    if model_name == "gcn":
+        from models.gcn import build_gcn
+        return build_gcn(**kwargs)
+    if model_name == "gat":
+        from models.gat import build_gat
+        return build_gat(**kwargs)
+    if model_name == "graphsage":
+        from models.graphsage import build_graphsage
+        return build_graphsage(**kwargs)
+    if model_name == "sgc":
+        from models.sgc import build_sgc
+        return build_sgc(**kwargs)
+    if model_name == "sign":
+        from models.sign import build_sign
+        return build_sign(**kwargs)
+    raise ValueError(f"未知的模型：{model_name}")
+
+
+def _live_children_peak_rss_mb():
+    """
+    仍在執行的子行程（DataLoader worker）中最大的峰值 RSS（讀取 /proc/<pid>/status 的 VmHWM，僅限 Linux）
+    """
+    peak = 0.0
+    parent = str(os.getpid())
+    try:
+        pids = [pid for pid in os.listdir("/proc") if pid.isdigit()]
+    except OSError:
+        return peak
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", "r") as f:
+                if f.read().rsplit(")", 1)[1].split()[1] != parent:
+                    continue
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak = max(peak, int(line.split()[1]) / 1024)
+        except (OSError, IndexError):
+            continue
+    return peak
+
+
+def peak_rss_mb():
+    """
+    回傳 (主行程峰值 RSS, worker 子行程中最大的峰值 RSS)，單位 MB（Linux 的 ru_maxrss 為 KB）
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    finished = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, max(finished, _live_children_peak_rss_mb())
+
+
+def edge_splits(flow_edge, split_index_path, n_edges):
+    """
+    將流量層級的切分（列位置）對應到邊：每條邊歸入其多數流量所屬的集合
+    split_index_path：split_index.npz，或切分 shard 的資料夾（直接 memmap 各 shard 的 row.npy）
+    回傳 {"train": 邊 ID, "val": ..., "test": ...}（int64 numpy）
+    """
+    flow_split = np.full(len(flow_edge), -1, dtype=np.int64)
+    if os.path.isdir(split_index_path):
+        shards = SplitShards(split_index_path)
+        for i, name in enumerate(SPLITS):
+            flow_split[shards.row_positions(name)] = i
+    else:
+        with np.load(split_index_path) as index:
+            for i, name in enumerate(SPLITS):
+                flow_split[index[name]] = i
+
+    # 負樣本抽樣時被捨棄的流量（flow_edge 為 -1）不屬於任何邊
+    labelled = (flow_split >= 0) & (flow_edge >= 0)
+    counts = np.bincount(flow_edge[labelled] * len(SPLITS) + flow_split[labelled],
+                         minlength=n_edges * len(SPLITS)).reshape(n_edges, len(SPLITS))
+    edge_split = np.where(counts.sum(axis=1) > 0, counts.argmax(axis=1), -1)
+    return {name: np.flatnonzero(edge_split == i) for i, name in enumerate(SPLITS)}
+
+
+def load_training_graph(config):
+    """
+    讀取 make_graph 輸出的圖與切分，回傳 (PyG Data, 邊標籤 tensor, 各集合的邊 ID tensor)
+    Data 保留 x / edge_index / edge_attr 與 edge_label_multi（類別抽樣用；抽樣子圖時另建只含 x / edge_index 的圖）
+    """
+    graph = load_graph(config["graph_path"])
+    data = to_pyg(graph)
+    labels = data.edge_label if config["task"] == "binary" else data.edge_label_multi
+    for key in ["edge_label", "edge_flows"]:
+        del data[key]
+    splits = edge_splits(graph["flow_edge"], config["split_index_path"], data.num_edges)
+    splits = {name: torch.from_numpy(ids) for name, ids in splits.items()}
+    print(f"圖：節點 {data.num_nodes}、邊 {data.num_edges}；"
+          + "、".join(f"{name} {len(ids)} 條邊" for name, ids in splits.items()))
+    return data, labels, splits
+
+
+def load_precomputed_graph(config):
+    """
+    sgc / sign 用：讀取圖與切分，並取得（必要時計算）預先傳播特徵
+    回傳 (data, 邊標籤 tensor, 各集合的邊 ID tensor)；data 含 edge_index / edge_attr / features
+    （PropagatedFeatures，memmap）與模型需要的維度，不建立 PyG Data
+    """
+    graph = load_graph(config["graph_path"])
+    features = precompute_features(
+        config["graph_path"], config["features_path"], hops=config["hops"],
+        cache_dir=config["precompute_dir"], workers=config["precompute_workers"], graph=graph)
+    labels = torch.from_numpy(graph["edge_label" if config["task"] == "binary" else "edge_label_multi"])
+    data = SimpleNamespace(
+        edge_index=torch.from_numpy(graph["edge_index"]),
+        edge_attr=torch.from_numpy(graph["edge_attr"]),
+        edge_label_multi=torch.from_numpy(graph["edge_label_multi"]),
+        features=features,
+        num_nodes=len(graph["x"]),
+        num_edges=graph["edge_index"].shape[1],
+        num_node_features=features.n_features,
+    )
+    splits = edge_splits(graph["flow_edge"], config["split_index_path"], data.num_edges)
+    splits = {name: torch.from_numpy(ids) for name, ids in splits.items()}
+    print(f"圖：節點 {data.num_nodes}、邊 {data.num_edges}（預先傳播 {features.hops} 跳）；"
+          + "、".join(f"{name} {len(ids)} 條邊" for name, ids in splits.items()))
+    return data, labels, splits
+
+
+class PropagatedEdgeLoader:
+    """
+    sgc / sign 的邊批次：每批只讀取批內邊兩端節點（去重後）的預先傳播特徵
+    產生 (節點特徵 (批內節點數, 跳數 + 1, 特徵數), None, 批內的 edge_label_index, 邊特徵, 標籤)，
+    與 iter_batches 的格式相同
+    sampler：ClassSampler（以 edge_ids 的位置為候選樣本），指定時依其順序取代 shuffle
+    """
+
+    def __init__(self, data, labels, edge_ids, batch_size, shuffle, sampler=None):
+        self.data = data
+        self.labels = labels
+        self.edge_ids = edge_ids
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.sampler = sampler
+
+    def __len__(self):
+        total = len(self.sampler) if self.sampler is not None else len(self.edge_ids)
+        return -(-total // self.batch_size)
+
+    def _batches(self):
+        if self.sampler is not None:
+            for positions in self.sampler.batches(self.batch_size):
+                yield self.edge_ids[torch.from_numpy(positions)]
+            return
+        edge_ids = self.edge_ids
+        if self.shuffle:
+            edge_ids = edge_ids[torch.randperm(len(edge_ids))]
+        yield from edge_ids.split(self.batch_size)
+
+    def __iter__(self):
+        for ids in self._batches():
+            # torch.unique 的結果已排序，memmap 讀取的頁面較集中
+            nodes, label_index = torch.unique(self.data.edge_index[:, ids], return_inverse=True)
+            x = torch.from_numpy(self.data.features.gather(nodes.numpy()))
+            yield x, None, label_index, self.data.edge_attr[ids], self.labels[ids]
+
+
+def _worker_init(_):
+    # 每個 worker 只用一個執行緒，避免與主行程搶 CPU
+    torch.set_num_threads(1)
+
+
+def make_loader(data, labels, edge_ids, config, shuffle, batch_size, sampler=None):
+    """
+    以 LinkNeighborLoader 對指定的邊抽樣鄰居子圖（需 pyg-lib 或 torch-sparse）
+    抽樣用的圖只含 x / edge_index；目標邊的特徵由 input_id 對回完整的 edge_attr
+    sampler：ClassSampler（以 edge_ids 的位置為候選樣本），指定時取代 shuffle
+    """
+    from torch_geometric.data import Data
+    from torch_geometric.loader import LinkNeighborLoader
+
+    num_workers = config["num_workers"]
+    return LinkNeighborLoader(
+        Data(x=data.x, edge_index=data.edge_index, num_nodes=data.num_nodes),
+        num_neighbors=list(config["fanout"]),
+        edge_label_index=data.edge_index[:, edge_ids],
+        edge_label=labels[edge_ids],
+        batch_size=batch_size,
+        shuffle=shuffle and sampler is None,
+        sampler=sampler,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+        worker_init_fn=_worker_init if num_workers > 0 else None,
+    )
+
+
+def iter_batches(data, labels, edge_ids, config, loader=None):
+    """
+    產生訓練批次 (x, edge_index, edge_label_index, edge_label_attr, y)
+    full-batch 模式下整張圖一次前向，所有訓練邊為同一批
+    sgc / sign 由 PropagatedEdgeLoader 直接產生批次
+    """
+    if config.get("model") in PRECOMPUTED_MODELS:
+        yield from loader
+        return
+    if config["full_batch"]:
+        yield data.x, data.edge_index, data.edge_index[:, edge_ids], data.edge_attr[edge_ids], \
+            labels[edge_ids]
+        return
+    for batch in loader:
+        ids = edge_ids[batch.input_id]
+        yield batch.x, batch.edge_index, batch.edge_label_index, data.edge_attr[ids], batch.edge_label
+
+
+def train_epoch(model, data, labels, edge_ids, optimizer, config, loader=None):
+    """
+    訓練一個 epoch（梯度累積）；回傳 (平均 loss, 處理的邊數)
+    """
+    model.train()
+    steps = config["accumulate_steps"]
+    total_loss, samples = 0.0, 0
+    optimizer.zero_grad()
+    batch_index = -1
+    for batch_index, (x, edge_index, label_index, label_attr, y) in enumerate(
+            iter_batches(data, labels, edge_ids, config, loader=loader)):
+        loss = F.cross_entropy(model(x, edge_index, label_index, label_attr), y)
+        (loss / steps).backward()
+        if (batch_index + 1) % steps == 0:
+            optimizer.step()
+            optimizer.zero_grad()
+        total_loss += float(loss) * len(y)
+        samples += len(y)
+    if (batch_index + 1) % steps != 0:
+        optimizer.step()
+        optimizer.zero_grad()
+    return total_loss / max(samples, 1), samples
+
+
+@torch.no_grad()
+def predict_logits(model, data, labels, edge_ids, config, loader=None):
+    """
+    逐批產生 (logits, y)；full-batch 模式下節點表示只計算一次，再分批分類邊
+    """
+    model.eval()
+    if config["full_batch"]:
+        h = model.encode(data.x, data.edge_index)
+        for ids in edge_ids.split(config["eval_batch_size"]):
+            yield model.classify(h, data.edge_index[:, ids], data.edge_attr[ids]), labels[ids]
+        return
+    for x, edge_index, label_index, label_attr, y in iter_batches(
+            data, labels, edge_ids, config, loader=loader):
+        yield model(x, edge_index, label_index, label_attr), y
+
+
+@torch.no_grad()
+def evaluate_edges(model, data, labels, edge_ids, config, num_classes, loader=None):
+    """
+    計算指定邊的 loss 與 Accuracy / Precision / Recall / F1 / ROC-AUC / PR-AUC
+    （逐批累加混淆矩陣與分數直方圖，不保留完整的預測結果）
+    """
+    metrics = StreamingMetrics(num_classes)
+    total_loss, samples = 0.0, 0
+    for logits, y in predict_logits(model, data, labels, edge_ids, config, loader=loader):
+        total_loss += float(F.cross_entropy(logits, y, reduction="sum"))
+        samples += len(y)
+        metrics.update(y.numpy(), probs=torch.softmax(logits, dim=-1).numpy(),
+                       y_pred=logits.argmax(dim=-1).numpy())
+    scores = metrics.result()
+    scores["loss"] = total_loss / max(samples, 1)
+    return scores
+
+
+def save_checkpoint(path, model, optimizer, epoch, best_f1, config):
+    tmp_path = f"{path}.tmp"
+    torch.save({"model": model.state_dict(), "optimizer": optimizer.state_dict(),
+                "epoch": epoch, "best_f1": best_f1, "config": config}, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def make_class_sampler(data, edge_ids, config):
+    """
+    依 config["sampling"] 建立訓練邊的 ClassSampler（shuffle 時回傳 None）
+    一律依 edge_label_multi 分層：binary 任務中各攻擊類別也維持各自的比例
+    """
+    if config["sampling"] == "shuffle":
+        return None
+    if config["sampling"] not in SAMPLING_MODES:
+        raise ValueError(f"sampling 必須是 {SAMPLING_MODES} 之一")
+    if config["full_batch"]:
+        raise ValueError("full-batch 模式沒有 mini-batch，無法使用類別抽樣（sampling 需為 shuffle）")
+    return ClassSampler(data.edge_label_multi[edge_ids].numpy(), mode=config["sampling"],
+                        power=config["sampling_power"], seed=config["seed"])
+
+
+def run_training(model_name, config, epoch_callback=None):
+    """
+    訓練主函式：載入圖與切分 → 建立模型 → 逐 epoch 訓練 / 驗證 → early stopping → 以最佳模型評估測試集
+    epoch_callback：每個 epoch 結束後以該 epoch 的紀錄呼叫，回傳 True 時停止訓練（超參搜尋的剪枝），
+    被剪枝的試驗不評估測試集
+    回傳 {"history": 各 epoch 紀錄, "test": 測試集指標, "pruned": 是否被剪枝}
+    """
+    config = {**DEFAULT_CONFIG, **config}
+    precomputed = model_name in PRECOMPUTED_MODELS
+    if precomputed:
+        # 預先傳播的模型一律以邊的 mini-batch 訓練（不需鄰居抽樣）
+        config["full_batch"] = False
+    elif not config["full_batch"] and len(config["fanout"]) != config["num_layers"]:
+        raise ValueError("fanout 的長度必須等於 num_layers")
+    # 模型名稱與建構參數存進 config（隨 checkpoint 保存），推論時可直接重建模型
+    config["model"] = model_name
+    torch.manual_seed(config["seed"])
+    if config["threads"]:
+        torch.set_num_threads(config["threads"])
+
+    checkpoint_dir = os.path.join(config["checkpoint_dir"], model_name)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    last_path = os.path.join(checkpoint_dir, "last.pt")
+    best_path = os.path.join(checkpoint_dir, "best.pt")
+    profiler = Profiler(trace_path=os.path.join(checkpoint_dir, TRACE_FILE), context={"model": model_name},
+                        cprofile=config["profile"], profile_dir=os.path.join(checkpoint_dir, "profile"))
+
+    with profiler.stage("load") as stage:
+        data, labels, splits = (load_precomputed_graph if precomputed else load_training_graph)(config)
+        stage["rows_out"] = int(data.edge_index.size(1))
+    num_classes = int(labels.max()) + 1
+    config["model_args"] = {
+        "in_channels": data.num_node_features, "edge_dim": data.edge_attr.size(1),
+        "num_classes": num_classes, "hidden": config["hidden"],
+        "num_layers": config["num_layers"], "dropout": config["dropout"], "heads": config["heads"],
+        "hops": config["hops"],
+    }
+    model = build_model(model_name, **config["model_args"])
+    optimizer = torch.optim.Adam(model.parameters(), lr=config["lr"],
+                                 weight_decay=config["weight_decay"])
+
+    start_epoch, best_f1, history = 1, -1.0, []
+    if config["resume"] and os.path.exists(last_path):
+        checkpoint = torch.load(last_path, weights_only=False)
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        start_epoch, best_f1 = checkpoint["epoch"] + 1, checkpoint["best_f1"]
+        print(f"從 epoch {checkpoint['epoch']} 接續訓練（最佳驗證 F1 {best_f1:.4f}）")
+
+    loaders = {}
+    sampler = make_class_sampler(data, splits["train"], config)
+    if sampler is not None:
+        print(f"📊 訓練邊抽樣：{sampler.mode}（每個 epoch {len(sampler)} 條邊，"
+              f"{'放回' if sampler.replacement else '不放回'}）")
+    if precomputed:
+        loaders["train"] = PropagatedEdgeLoader(data, labels, splits["train"],
+                                                config["batch_size"], shuffle=True, sampler=sampler)
+        for name in ["val", "test"]:
+            loaders[name] = PropagatedEdgeLoader(data, labels, splits[name],
+                                                 config["eval_batch_size"], shuffle=False)
+    elif not config["full_batch"]:
+        loaders["train"] = make_loader(data, labels, splits["train"], config, shuffle=True,
+                                       batch_size=config["batch_size"], sampler=sampler)
+        for name in ["val", "test"]:
+            loaders[name] = make_loader(data, labels, splits[name], config, shuffle=False,
+                                        batch_size=config["eval_batch_size"])
+
+    bad_epochs, pruned = 0, False
+    with profiler.stage("train", rows_in=len(splits["train"])) as stage:
+        print(f"{'epoch':>5}{'loss':>10}{'val_loss':>10}{'val_f1':>8}{'samples/s':>12}"
+              f"{'rss MB':>9}{'worker MB':>11}")
+        for epoch in range(start_epoch, config["epochs"] + 1):
+            start = time.perf_counter()
+            loss, samples = train_epoch(model, data, labels, splits["train"], optimizer, config,
+                                        loader=loaders.get("train"))
+            train_seconds = time.perf_counter() - start
+            val = evaluate_edges(model, data, labels, splits["val"], config, num_classes,
+                                 loader=loaders.get("val"))
+            rss, worker_rss = peak_rss_mb()
+            record = {"epoch": epoch, "loss": loss, "val": val,
+                      "samples_per_sec": samples / train_seconds, "train_seconds": train_seconds,
+                      "peak_rss_mb": rss, "peak_worker_rss_mb": worker_rss}
+            history.append(record)
+            print(f"{epoch:>5}{loss:>10.4f}{val['loss']:>10.4f}{val['f1']:>8.4f}"
+                  f"{record['samples_per_sec']:>12.0f}{rss:>9.0f}{worker_rss:>11.0f}")
+
+            if val["f1"] > best_f1:
+                best_f1, bad_epochs = val["f1"], 0
+                save_checkpoint(best_path, model, optimizer, epoch, best_f1, config)
+            else:
+                bad_epochs += 1
+            save_checkpoint(last_path, model, optimizer, epoch, best_f1, config)
+            if epoch_callback is not None and epoch_callback(record):
+                pruned = True
+                print(f"✂️ epoch {epoch} 後剪枝，停止訓練")
+                break
+            if bad_epochs >= config["patience"]:
+                print(f"⏹️ 驗證 F1 已 {bad_epochs} 個 epoch 未進步，提前停止")
+                break
+        stage["epochs"] = len(history)
+
+    test = None
+    if not pruned:
+        if os.path.exists(best_path):
+            model.load_state_dict(torch.load(best_path, weights_only=False)["model"])
+        with profiler.stage("test", rows_in=len(splits["test"])):
+            test = evaluate_edges(model, data, labels, splits["test"], config, num_classes,
+                                  loader=loaders.get("test"))
+        print(f"✅ 測試集（最佳驗證 F1 {best_f1:.4f} 的模型）："
+              + "、".join(f"{key} {value:.4f}" for key, value in test.items()))
+
+    with open(os.path.join(checkpoint_dir, "history.json"), "w") as f:
+        json.dump({"config": config, "history": history, "test": test, "pruned": pruned,
+                   "stages": profiler.stages}, f, indent=2)
+    return {"history": history, "test": test, "pruned": pruned}
+
+
+def build_arg_parser(model_name, config_path="config.yaml"):
+    """
+    各模型訓練腳本共用的命令列參數（預設值見 DEFAULT_CONFIG，config.yaml 的 train 一節可覆寫）
+    """
+    parser = argparse.ArgumentParser(description=f"訓練 {model_name.upper()} 邊分類模型")
+    overrides = load_config(config_path).get("train", {})
+    d = {**DEFAULT_CONFIG, **{key: value for key, value in overrides.items() if key in DEFAULT_CONFIG}}
+    parser.add_argument("--graph-path", default=d["graph_path"])
+    parser.add_argument("--split-index-path", default=d["split_index_path"])
+    parser.add_argument("--checkpoint-dir", default=d["checkpoint_dir"])
+    parser.add_argument("--task", choices=["binary", "multi"], default=d["task"])
+    parser.add_argument("--hidden", type=int, default=d["hidden"])
+    parser.add_argument("--num-layers", type=int, default=d["num_layers"])
+    parser.add_argument("--heads", type=int, default=d["heads"])
+    parser.add_argument("--dropout", type=float, default=d["dropout"])
+    parser.add_argument("--lr", type=float, default=d["lr"])
+    parser.add_argument("--weight-decay", type=float, default=d["weight_decay"])
+    parser.add_argument("--epochs", type=int, default=d["epochs"])
+    parser.add_argument("--patience", type=int, default=d["patience"])
+    parser.add_argument("--full-batch", action="store_true", default=d["full_batch"],
+                        help="整張圖一次前向（小圖適用）；預設為鄰居抽樣 mini-batch")
+    parser.add_argument("--fanout", type=int, nargs="+", default=d["fanout"],
+                        help="每層抽樣的鄰居數，長度需等於 --num-layers")
+    parser.add_argument("--batch-size", type=int, default=d["batch_size"])
+    parser.add_argument("--eval-batch-size", type=int, default=d["eval_batch_size"])
+    parser.add_argument("--accumulate-steps", type=int, default=d["accumulate_steps"])
+    parser.add_argument("--num-workers", type=int, default=d["num_workers"])
+    parser.add_argument("--threads", type=int, default=d["threads"])
+    parser.add_argument("--seed", type=int, default=d["seed"])
+    parser.add_argument("--sampling", choices=SAMPLING_MODES, default=d["sampling"],
+                        help="訓練邊的類別抽樣（不適用於 --full-batch）")
+    parser.add_argument("--sampling-power", type=float, default=d["sampling_power"],
+                        help="weighted 模式的指數：類別機率 ∝ 邊數^power")
+    parser.add_argument("--resume", action="store_true", help="從 last.pt 接續訓練")
+    parser.add_argument("--profile", action="store_true", default=d["profile"],
+                        help="以 cProfile 執行各階段，印出最耗時的函式")
+    if model_name in PRECOMPUTED_MODELS:
+        parser.add_argument("--hops", type=int, default=d["hops"],
+                            help="預先傳播的跳數 K")
+        parser.add_argument("--features-path", default=d["features_path"],
+                            help="選定特徵 JSON（與圖檔一起決定預先傳播快取的鍵）")
+        parser.add_argument("--precompute-dir", default=d["precompute_dir"])
+        parser.add_argument("--precompute-workers", type=int, default=d["precompute_workers"],
+                            help="預先傳播時稀疏矩陣乘法的執行緒數")
+    return parser
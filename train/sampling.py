@@ -0,0 +1,166 @@
+# 類別不平衡的 mini-batch 抽樣：只產生索引（邊 ID 或切分中的列位置），不複製特徵列
+#
+# CICIDS2017 八成以上為 BENIGN，Heartbleed / Infiltration 等類別只有數十筆。ClassSampler 依每個候選樣本的
+# 類別代碼（Label_enc 或圖的 edge_label_multi）產生每個 epoch 的抽樣順序：
+# - shuffle：隨機排列（不做平衡）
+# - stratified：不放回，每個 batch 的類別比例與整體相同（稀有類別平均分散到各 batch，而不是集中在少數 batch）
+# - balanced：放回抽樣，每個類別被抽到的機率相同
+# - weighted：放回抽樣，類別 c 的機率 ∝ n_c^power（power=1 為原始比例、0 即 balanced），
+#   或以 class_weights 直接指定各類別的權重
+#
+# 同一個 sampler 可用於：
+# - 圖的 mini-batch：作為 LinkNeighborLoader 的 sampler（DataLoader 依序每 batch_size 個位置組成一批），
+#   或交給 PropagatedEdgeLoader（sgc / sign，見 train/engine.py）
+# - 表格資料：iter_shard_batches 依 sampler 的順序從切分 shard 讀取每批的特徵（SplitShards.gather）
+#
+# 用法（於專案根目錄執行，檢視各模式下每個 epoch 的類別比例）：
+# python -m train.sampling data/processed/splits --mode balanced --preprocessed data/processed/preprocessed.parquet
+
+import argparse
+
+import numpy as np
+
+from preprocess.split_shards import SplitShards
+from utils.helpers import read_table
+
+SAMPLING_MODES = ["shuffle", "stratified", "balanced", "weighted"]
+
+
+class ClassSampler:
+    """
+    依類別代碼產生抽樣順序（候選樣本的位置 0..n-1，由呼叫端對應回邊 ID 或列位置）
+    參數:
+        labels: 各候選樣本的類別代碼（任意整數，例如 Label_enc，-1 亦可）
+        mode: SAMPLING_MODES 之一
+        power: weighted 模式的指數（類別機率 ∝ 筆數^power）
+        class_weights: {類別代碼: 權重}，指定時 weighted 模式改用此權重（未列出的類別為 0）
+        num_samples: 放回抽樣時每個 epoch 的筆數（預設為候選樣本數）
+    每次迭代（每個 epoch）產生新的順序；可直接作為 torch DataLoader 的 sampler
+    """
+
+    def __init__(self, labels, mode="stratified", power=0.5, class_weights=None,
+                 num_samples=None, seed=0):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"mode 必須是 {SAMPLING_MODES} 之一")
+        self.classes, self.codes = np.unique(np.asarray(labels), return_inverse=True)
+        self.codes = self.codes.astype(np.int64)
+        self.counts = np.bincount(self.codes, minlength=len(self.classes))
+        self.mode = mode
+        self.replacement = mode in ["balanced", "weighted"]
+        self.num_samples = num_samples or len(self.codes)
+        self.rng = np.random.default_rng(seed)
+        # 依類別排序的位置：放回抽樣時先抽類別，再在該類別的區段中均勻抽一個位置
+        self._by_class = np.argsort(self.codes, kind='stable')
+        self._class_starts = np.cumsum(self.counts) - self.counts
+        self.class_probs = self._class_probs(power, class_weights)
+
+    def _class_probs(self, power, class_weights):
+        """
+        每個 epoch 中各類別的期望比例
+        """
+        if self.mode == "balanced":
+            weights = np.ones(len(self.classes))
+        elif self.mode == "weighted" and class_weights is not None:
+            weights = np.array([float(class_weights.get(c, class_weights.get(str(c), 0.0)))
+                                for c in self.classes.tolist()])
+        elif self.mode == "weighted":
+            weights = self.counts.astype(np.float64) ** power
+        else:
+            weights = self.counts.astype(np.float64)
+        if weights.sum() <= 0:
+            raise ValueError("class_weights 沒有涵蓋任何出現的類別")
+        return weights / weights.sum()
+
+    def __len__(self):
+        return self.num_samples if self.replacement else len(self.codes)
+
+    def epoch_order(self):
+        """
+        一個 epoch 的抽樣順序（int64 位置陣列）
+        """
+        n = len(self.codes)
+        if self.mode == "shuffle":
+            return self.rng.permutation(n)
+        if self.mode == "stratified":
+            # 每個類別在隨機排列後的名次 r 對應到 (r + U) / n_c ∈ [0, 1)，依此排序：
+            # 各類別均勻分散在整個 epoch 中，任一段連續的位置都近似整體比例
+            perm = self.rng.permutation(n)
+            codes = self.codes[perm]
+            by_class = np.argsort(codes, kind='stable')
+            rank = np.empty(n, dtype=np.int64)
+            rank[by_class] = np.arange(n) - np.repeat(self._class_starts, self.counts)
+            key = (rank + self.rng.random(n)) / self.counts[codes]
+            return perm[np.argsort(key, kind='stable')]
+        class_of = self.rng.choice(len(self.classes), size=self.num_samples, p=self.class_probs)
+        offset = (self.rng.random(self.num_samples) * self.counts[class_of]).astype(np.int64)
+        return self._by_class[self._class_starts[class_of] + offset]
+
+    def __iter__(self):
+        return iter(self.epoch_order().tolist())
+
+    def batches(self, batch_size):
+        """
+        依一個 epoch 的順序逐批產生位置陣列
+        """
+        order = self.epoch_order()
+        for start in range(0, len(order), batch_size):
+            yield order[start:start + batch_size]
+
+    def expected_counts(self):
+        """
+        每個 epoch 中各類別的期望筆數 {類別代碼: 筆數}
+        """
+        total = len(self)
+        return {c: float(p * total) for c, p in zip(self.classes.tolist(), self.class_probs)}
+
+
+def split_label_codes(shards, split, preprocessed_path=None):
+    """
+    切分中各列的類別代碼：指定 preprocessed_path 時為 Label_enc（只讀這一欄，依 shard 的列位置取值），
+    否則為 shard 中的 Label_Binary
+    """
+    if preprocessed_path is None:
+        return np.asarray(shards.labels(split), dtype=np.int64)
+    label_enc = read_table(preprocessed_path, columns=['Label_enc'])['Label_enc'].to_numpy()
+    return label_enc[shards.row_positions(split)].astype(np.int64)
+
+
+def iter_shard_batches(shards, split, sampler, batch_size, columns=None):
+    """
+    表格資料的 mini-batch：依 sampler 的順序從切分 shard 讀取每批的 (特徵, Label_Binary)
+    sampler 需以同一個 split 的 split_label_codes 建立；只有該批的列會被讀取
+    """
+    for positions in sampler.batches(batch_size):
+        yield shards.gather(split, positions, columns=columns)
+
+
+def print_sampling_summary(sampler, label_names=None):
+    total = len(sampler)
+    print(f"📊 抽樣模式 {sampler.mode}：每個 epoch {total:,} 筆"
+          f"（{'放回' if sampler.replacement else '不放回'}）")
+    for (code, expected), count in zip(sampler.expected_counts().items(), sampler.counts):
+        name = label_names[code] if label_names is not None and code >= 0 else code
+        print(f"  {str(name):<28}{count:>12,} → {expected:>12,.0f}（{expected / total:.2%}）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="檢視類別感知抽樣在切分上的類別比例")
+    parser.add_argument("shard_dir", nargs="?", default="data/processed/splits")
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--mode", choices=SAMPLING_MODES, default="stratified")
+    parser.add_argument("--power", type=float, default=0.5, help="weighted 模式的指數")
+    parser.add_argument("--preprocessed", default=None,
+                        help="preprocessed 資料表：指定時依 Label_enc（多類別）抽樣，否則依 Label_Binary")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    shards = SplitShards(args.shard_dir)
+    sampler = ClassSampler(split_label_codes(shards, args.split, args.preprocessed),
+                           mode=args.mode, power=args.power, seed=args.seed)
+    print_sampling_summary(sampler)
+    # 第一個 batch 的實際類別數量
+    first = next(sampler.batches(args.batch_size))
+    classes, counts = np.unique(sampler.codes[first], return_counts=True)
+    print(f"第一個 batch（{len(first)} 筆）：" + "、".join(
+        f"{sampler.classes[c]}: {n}" for c, n in zip(classes, counts)))
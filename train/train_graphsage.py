@@ -0,0 +1,10 @@
+# 訓練 GraphSAGE 的腳本
+#
+# 用法（於專案根目錄執行）：
+# python -m train.train_graphsage --epochs 50 --fanout 15 10 --num-workers 4
+
+from train.engine import build_arg_parser, run_training
+
+if __name__ == "__main__":
+    args = build_arg_parser("graphsage").parse_args()
+    run_training("graphsage", vars(args))
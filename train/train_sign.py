@@ -0,0 +1,10 @@
+# 訓練 SIGN 的腳本（預先傳播特徵，第一次執行時計算並快取，見 data/precompute.py）
+#
+# 用法（於專案根目錄執行）：
+# python -m train.train_sign --hops 3 --batch-size 8192 --epochs 50
+
+from train.engine import build_arg_parser, run_training
+
+if __name__ == "__main__":
+    args = build_arg_parser("sign").parse_args()
+    run_training("sign", vars(args))
@@ -0,0 +1,193 @@
+# 前處理階段快取（content-addressed）
+#
+# 每個階段的快取鍵 = hash(階段名稱, 上游輸入的內容 hash 或上游階段的鍵, 參數, 程式碼版本)
+# - 只改 corr_threshold 時，merge / clean / scale 的鍵不變，直接讀取快取
+# - 新增一天的原始檔時，只有那個檔案的讀檔（ingest）需要重算
+# 快取內容以 pickle 存在 cache_dir/objects/，每筆另有一個 .json 記錄大小與原始耗時；
+# 總大小超過上限時，依最近使用時間（LRU）淘汰。每筆資料各自一個檔案、以 os.replace 原子寫入，
+# 多個行程共用同一個快取資料夾也不會互相覆蓋。
+
+import hashlib
+import json
+import os
+import pickle
+import time
+
+# 讀取失敗時回傳的哨兵值（快取內容本身可能是 None）
+MISS = object()
+
+
+def _sha256_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def code_version(*modules):
+    """
+    以模組原始碼內容計算程式碼版本；程式修改後快取鍵會跟著改變
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class StageCache:
+    """
+    階段快取；cache_dir 為 None 時停用（get 一律 MISS、put 不做事、不計算檔案 hash）
+    """
+
+    def __init__(self, cache_dir, max_bytes=20 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.records = []
+        if cache_dir:
+            os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+            os.makedirs(os.path.join(cache_dir, "file_hashes"), exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.cache_dir is not None
+
+    def file_digest(self, path):
+        """
+        檔案內容的 sha256；以 (路徑, 大小, 修改時間) 記住結果，檔案未變時不重新讀取
+        """
+        if not self.enabled:
+            return None
+        stat = os.stat(path)
+        memo = os.path.join(self.cache_dir, "file_hashes", _sha256_text(
+            f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"))
+        if os.path.exists(memo):
+            with open(memo, "r") as f:
+                return f.read().strip()
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(8 * 1024 ** 2), b""):
+                digest.update(block)
+        self._atomic_write(memo, digest.hexdigest().encode("utf-8"))
+        return digest.hexdigest()
+
+    def key(self, stage, inputs=(), params=None, code=""):
+        """
+        產生快取鍵；inputs 可放檔案內容 hash 或上游階段的鍵
+        """
+        if not self.enabled:
+            return None
+        payload = json.dumps({"stage": stage, "inputs": list(inputs),
+                              "params": params or {}, "code": code},
+                             sort_keys=True, default=str)
+        return _sha256_text(payload)
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, "objects", key)
+        return base + ".pkl", base + ".json"
+
+    @staticmethod
+    def _atomic_write(path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, stage, key):
+        """
+        讀取快取；命中時更新最近使用時間並記錄節省的時間
+        """
+        if not self.enabled:
+            return MISS
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            return MISS
+        os.utime(meta_path)
+        self.records.append({"stage": stage, "hit": True, "seconds": meta["elapsed"]})
+        return value
+
+    def put(self, stage, key, value, elapsed):
+        """
+        寫入快取並依 LRU 淘汰超出容量的項目（單筆超過上限則不存）
+        """
+        self.records.append({"stage": stage, "hit": False, "seconds": round(elapsed, 2)})
+        if not self.enabled:
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        data_path, meta_path = self._paths(key)
+        self._atomic_write(data_path, data)
+        meta = {"stage": stage, "size": len(data), "elapsed": round(elapsed, 2),
+                "created": time.time()}
+        self._atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+        self.evict()
+
+    def run(self, stage, key, compute):
+        """
+        有快取就直接回傳，否則執行 compute() 並存入快取
+        """
+        value = self.get(stage, key)
+        if value is not MISS:
+            print(f"♻️ {stage} 使用快取（省下 {self.records[-1]['seconds']} 秒）")
+            return value
+        start = time.perf_counter()
+        value = compute()
+        self.put(stage, key, value, time.perf_counter() - start)
+        return value
+
+    def evict(self):
+        """
+        總大小超過 max_bytes 時，從最久未使用的項目開始刪除
+        """
+        objects_dir = os.path.join(self.cache_dir, "objects")
+        entries = []
+        total = 0
+        for name in os.listdir(objects_dir):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(objects_dir, name)
+            try:
+                with open(meta_path, "r") as f:
+                    size = json.load(f)["size"]
+                last_used = os.path.getmtime(meta_path)
+            except (OSError, ValueError, KeyError):
+                continue
+            entries.append((last_used, name[:-len(".json")], size))
+            total += size
+
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def summary(self):
+        """
+        本次執行的快取統計：命中 / 未命中次數、省下的時間，以及各階段明細
+        """
+        hits = [r for r in self.records if r["hit"]]
+        return {
+            "hits": len(hits),
+            "misses": len(self.records) - len(hits),
+            "seconds_saved": round(sum(r["seconds"] for r in hits), 2),
+            "stages": self.records,
+        }
+
+
+def print_cache_summary(summary):
+    """
+    印出快取命中摘要
+    """
+    print(f"快取命中 {summary['hits']} 次、未命中 {summary['misses']} 次，"
+          f"共省下約 {summary['seconds_saved']} 秒")
+    for record in summary["stages"]:
+        status = "hit " if record["hit"] else "miss"
+        print(f"  {status} {record['stage']:<24}{record['seconds']:>8} 秒")
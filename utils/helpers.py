@@ -1 +1,169 @@
 # 工具函式（資料讀寫、視覺化等）
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# 中間檔格式：依副檔名決定讀寫方式
+# - parquet：欄式儲存、保留 dtype、可只讀部分欄位（預設）
+# - feather：Arrow IPC，讀寫最快但壓縮率較低
+# - csv：僅作為對外匯出用
+TABLE_FORMATS = {
+    ".parquet": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".csv": "csv",
+}
+
+# Parquet 每個 row group 的筆數（讀取時可依 row group 分批、平行處理）
+PARQUET_ROW_GROUP_SIZE = 256_000
+
+# 標籤欄位（不是特徵）
+LABEL_COLUMNS = ['Label', 'Label_enc', 'Label_Binary']
+# 流量識別欄位（GeneratedLabelledFlows 版 CSV 才有）：建圖用的端點與時間資訊，
+# 不是模型特徵，不做標準化、不參與特徵選擇，原樣保留到 preprocessed
+META_COLUMNS = ['Flow ID', 'Source IP', 'Source Port', 'Destination IP', 'Destination Port',
+                'Timestamp']
+# MachineLearningCVE 版沒有端點 IP，Destination Port 是原本就有的模型特徵；
+# Port 只在有端點 IP 的 flows 版才視為識別欄
+PORT_COLUMNS = ['Source Port', 'Destination Port']
+ENDPOINT_IP_COLUMNS = ['Source IP', 'Destination IP']
+
+
+def feature_columns(df):
+    """
+    數值特徵欄位：排除標籤欄（LABEL_COLUMNS）與識別欄（meta_columns）
+    """
+    excluded = set(LABEL_COLUMNS) | set(meta_columns(df))
+    return [col for col in df.select_dtypes(include=['number']).columns if col not in excluded]
+
+
+def meta_columns(df):
+    """
+    df 中存在的識別欄位（依 META_COLUMNS 順序）；沒有端點 IP 欄時 Port 仍是特徵，不列入
+    """
+    columns = set(df.columns)
+    flows = all(col in columns for col in ENDPOINT_IP_COLUMNS)
+    return [col for col in META_COLUMNS
+            if col in columns and (flows or col not in PORT_COLUMNS)]
+
+
+def binary_labels(labels):
+    """
+    Label → Label_Binary（BENIGN = 0，其他 = 1，缺值視為 1），回傳 int64 numpy 陣列
+    category 型態只比對各類別一次，再以 codes 查表（不逐筆比對字串）
+    """
+    if isinstance(getattr(labels, "dtype", None), pd.CategoricalDtype):
+        # codes 為 -1（缺值）時取到最後一格的 1
+        lookup = np.append(labels.cat.categories != 'BENIGN', True).astype(np.int64)
+        return lookup[labels.cat.codes.to_numpy()]
+    return (np.asarray(labels) != 'BENIGN').astype(np.int64)
+
+
+def add_label_binary(df):
+    """
+    依 Label 加入 Label_Binary 欄位（就地修改並回傳 df）
+    """
+    df['Label_Binary'] = binary_labels(df['Label'])
+    return df
+
+
+def load_config(path="config.yaml"):
+    """
+    讀取 YAML 設定檔（pipeline / train / sweep 各一節）；檔案不存在時回傳空 dict
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    import yaml
+
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def table_format(path):
+    """
+    依副檔名判斷資料表格式（parquet / feather / csv）
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in TABLE_FORMATS:
+        raise ValueError(f"不支援的檔案格式：{path}（可用 {list(TABLE_FORMATS)}）")
+    return TABLE_FORMATS[ext]
+
+
+def with_format(path, fmt):
+    """
+    將路徑的副檔名換成指定格式，例如 merged.csv → merged.parquet
+    """
+    return os.path.splitext(path)[0] + "." + fmt
+
+
+def read_table(path, columns=None):
+    """
+    讀取中間資料表
+    參數:
+        path: str, 檔案路徑（副檔名決定格式）
+        columns: list or None, 只讀取指定欄位（parquet / feather 不會解析其他欄位）
+    """
+    fmt = table_format(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    if fmt == "feather":
+        return pd.read_feather(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def write_table(df, path):
+    """
+    寫出中間資料表（不含 index），並自動建立資料夾
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fmt = table_format(path)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    elif fmt == "feather":
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+
+def table_columns(path):
+    """
+    只讀取資料表的欄位名稱（不載入資料）
+    """
+    fmt = table_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    if fmt == "feather":
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).schema.names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def count_rows(path):
+    """
+    取得資料表筆數；parquet 只讀 metadata，不需載入整個檔案
+    """
+    fmt = table_format(path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == "feather":
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).count_rows()
+    with open(path, "rb") as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def export_csv(path, csv_path=None):
+    """
+    將中間資料表另外匯出成 CSV（供外部工具使用）
+    """
+    csv_path = csv_path or with_format(path, "csv")
+    if os.path.abspath(csv_path) != os.path.abspath(path):
+        read_table(path).to_csv(csv_path, index=False)
+        print(f"已匯出 CSV：{csv_path}")
+    return csv_path
@@ -0,0 +1,294 @@
+# 流程各階段的量測（前處理、建圖、訓練共用）
+#
+# Profiler.stage(name) 包住一個階段，記錄：
+# - wall / CPU 秒數（CPU 含本行程所有執行緒，以及階段內結束的子行程，如合併時的 process pool）
+# - 峰值 RSS：Linux 上每個階段開始前重設 VmHWM（/proc/self/clear_refs），得到該階段自己的峰值；
+#   其他平台為行程至今的峰值（ru_maxrss）
+# - 讀寫位元組數（/proc/self/io 的 rchar / wchar，含已結束的子行程；不支援時為 None）
+# - 輸入 / 輸出筆數：由呼叫端填入 stage 回傳的 record（record["rows_in"] / record["rows_out"]，
+#   其他鍵如 features_out 也會一併保存）
+# 結果存在 profiler.stages（寫入 version.json / history.json），並逐階段附加到 trace 檔（JSON Lines）。
+#
+# cprofile=True 時每個階段以 cProfile 執行，.prof 寫到 profile_dir 並印出自身耗時最高的函式；
+# tracemalloc=True 時另外記錄 Python 配置的峰值與配置最多的程式行（會明顯拖慢執行，只在找熱點時開）。
+#
+# 比較兩個版本（version.json、版本資料夾或 trace.jsonl）的各階段指標：
+# python -m utils.profiling compare data/versions/20250717_1745_preproc data/versions/20250718_0930_preproc
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc as _tracemalloc
+from contextlib import contextmanager
+
+TRACE_FILE = "trace.jsonl"
+# 比較版本時列出的指標，以及視為退步的最小絕對差（避免很短的階段因雜訊被標記）
+COMPARE_METRICS = {"seconds": 0.5, "cpu_seconds": 0.5, "peak_rss_mb": 50.0}
+# 目前行程中進行中的階段數（跨 Profiler 物件）：只有最外層的階段重設峰值 RSS，
+# 例如基準測試包住 run_training 時，內層訓練引擎的 Profiler 不會清掉外層的峰值
+_open_stages = 0
+# cProfile 同時只能有一個啟用中的 profiler
+_profiling = False
+
+
+def _read_io():
+    """
+    本行程至今讀寫的位元組數 (rchar, wchar)；不支援 /proc/self/io 時回傳 None
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _reset_peak_rss():
+    """
+    重設 VmHWM（之後讀到的峰值只涵蓋重設之後）；成功回傳 True
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 的 ru_maxrss 單位為 bytes，Linux 為 KB
+    return maxrss / 1024 ** 2 if sys.platform == "darwin" else maxrss / 1024
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _mb(value):
+    return None if value is None else round(value / 1024 ** 2, 1)
+
+
+class Profiler:
+    """
+    收集各階段的量測結果
+    參數:
+        trace_path: 逐階段附加 JSON Lines 的 trace 檔（None = 不寫；建立時清空舊檔）
+        context: 每筆 trace 都附上的欄位（如 run 名稱、模式）
+        cprofile / tracemalloc: 是否以 cProfile / tracemalloc 找熱點
+        profile_dir: cProfile 的 .prof 輸出資料夾
+        top: 熱點列出的函式 / 程式行數
+        verbose: 每個階段結束時印出一行摘要
+    """
+
+    def __init__(self, trace_path=None, context=None, cprofile=False, tracemalloc=False,
+                 profile_dir="data/profiles", top=15, verbose=True):
+        self.trace_path = trace_path
+        self.context = context or {}
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.profile_dir = profile_dir
+        self.top = top
+        self.verbose = verbose
+        self.stages = {}
+        if trace_path:
+            os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+            open(trace_path, "w").close()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        量測一個階段；yield 的 record 可由呼叫端填入 rows_out 等欄位
+        巢狀的階段各自記錄；峰值 RSS 只在最外層重設（內層的峰值涵蓋外層已執行的部分），
+        cProfile 也只在最外層啟用（同時只能有一個 profiler）
+        """
+        global _open_stages, _profiling
+        record = {"rows_in": rows_in, "rows_out": None}
+        profile = None
+        if self.cprofile and not _profiling:
+            profile = cProfile.Profile()
+            _profiling = True
+        already_tracing = _tracemalloc.is_tracing()
+        if self.tracemalloc:
+            if already_tracing:
+                _tracemalloc.stop()
+            _tracemalloc.start()
+
+        peak_resettable = _open_stages == 0 and _reset_peak_rss()
+        _open_stages += 1
+        io_before = _read_io()
+        children_cpu = _children_cpu()
+        started_at = time.time()
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            _open_stages -= 1
+            if profile is not None:
+                profile.disable()
+                _profiling = False
+            seconds = time.perf_counter() - start
+            ended_at = time.time()
+            cpu_seconds = time.process_time() - cpu_start + _children_cpu() - children_cpu
+            io_after = _read_io()
+            metrics = {
+                "seconds": round(seconds, 2),
+                "cpu_seconds": round(cpu_seconds, 2),
+                "peak_rss_mb": round(_peak_rss_mb(), 1),
+                "peak_rss_scope": "stage" if peak_resettable else "process",
+                "read_mb": _mb(io_after[0] - io_before[0]) if io_before and io_after else None,
+                "written_mb": _mb(io_after[1] - io_before[1]) if io_before and io_after else None,
+            }
+            if self.tracemalloc:
+                _, peak = _tracemalloc.get_traced_memory()
+                metrics["py_peak_mb"] = round(peak / 1024 ** 2, 1)
+                snapshot = _tracemalloc.take_snapshot()
+                _tracemalloc.stop()
+                if already_tracing:
+                    _tracemalloc.start()
+            record.update(metrics)
+            self.stages[name] = record
+            self._write_trace(name, started_at, ended_at, record)
+            if self.verbose:
+                print_stage(name, record)
+            if profile is not None:
+                self._report_profile(name, profile)
+            if self.tracemalloc:
+                self._report_allocations(name, snapshot)
+
+    def _write_trace(self, name, started_at, ended_at, record):
+        if not self.trace_path:
+            return
+        event = {**self.context, "stage": name, "start": round(started_at, 3),
+                 "end": round(ended_at, 3), **record}
+        with open(self.trace_path, "a") as f:
+            f.write(json.dumps(event, default=str) + "\n")
+
+    def _report_profile(self, name, profile):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}.prof")
+        profile.dump_stats(path)
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats("tottime").print_stats(self.top)
+        print(f"🔍 {name} 自身耗時最高的 {self.top} 個函式（完整結果：{path}，可用 snakeviz / pstats 檢視）")
+        # 略過 pstats 開頭的總計與空行，只印表格
+        lines = stream.getvalue().splitlines()
+        header = next((i for i, line in enumerate(lines) if "ncalls" in line), 0)
+        print("\n".join(line for line in lines[header:] if line.strip()))
+
+    def _report_allocations(self, name, snapshot):
+        snapshot = snapshot.filter_traces([
+            _tracemalloc.Filter(False, _tracemalloc.__file__),
+            _tracemalloc.Filter(False, __file__),
+        ])
+        print(f"🔍 {name} 配置記憶體最多的 {self.top} 行（階段結束時仍存活）")
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            frame = stat.traceback[0]
+            print(f"   {stat.size / 1024 ** 2:>9.1f} MB {stat.count:>9} 次  {frame.filename}:{frame.lineno}")
+
+
+def print_stage(name, stats):
+    parts = [f"⏱️ {name}：{stats['seconds']:.2f} 秒（CPU {stats['cpu_seconds']:.2f} 秒）",
+             f"峰值 RSS {stats['peak_rss_mb']:.0f} MB"]
+    if stats.get("read_mb") is not None:
+        parts.append(f"讀 {stats['read_mb']:.1f} MB / 寫 {stats['written_mb']:.1f} MB")
+    if stats.get("rows_in") is not None or stats.get("rows_out") is not None:
+        parts.append(f"筆數 {_rows(stats.get('rows_in'))} → {_rows(stats.get('rows_out'))}")
+    if stats.get("py_peak_mb") is not None:
+        parts.append(f"Python 配置峰值 {stats['py_peak_mb']:.1f} MB")
+    print("，".join(parts))
+
+
+def _rows(value):
+    return "-" if value is None else f"{value:,}"
+
+
+def print_stage_stats(stage_stats):
+    """
+    印出各階段的量測摘要表
+    """
+    print(f"{'階段':<18}{'秒':>9}{'CPU 秒':>9}{'RSS MB':>9}{'讀 MB':>10}{'寫 MB':>10}"
+          f"{'rows in':>12}{'rows out':>12}")
+    for name, stats in stage_stats.items():
+        read_mb = "-" if stats.get("read_mb") is None else f"{stats['read_mb']:.1f}"
+        written_mb = "-" if stats.get("written_mb") is None else f"{stats['written_mb']:.1f}"
+        print(f"{name:<18}{stats['seconds']:>9.2f}{stats['cpu_seconds']:>9.2f}{stats['peak_rss_mb']:>9.0f}"
+              f"{read_mb:>10}{written_mb:>10}{_rows(stats.get('rows_in')):>12}{_rows(stats.get('rows_out')):>12}")
+
+
+def load_stages(path):
+    """
+    讀取各階段指標：版本資料夾 / version.json / history.json（取 stages），或 trace.jsonl
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, "version.json")
+    if path.endswith(".jsonl"):
+        stages = {}
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    event = json.loads(line)
+                    stages[event["stage"]] = event
+        return stages
+    with open(path, "r") as f:
+        return json.load(f).get("stages") or {}
+
+
+def compare_stages(old, new, threshold=0.2):
+    """
+    比較兩組階段指標，印出差異；回傳退步的 (階段, 指標, 舊值, 新值) 清單
+    退步：新值比舊值高出 threshold 比例以上，且絕對差超過 COMPARE_METRICS 的下限
+    """
+    regressions = []
+    print(f"{'階段':<18}{'指標':<14}{'舊':>10}{'新':>10}{'變化':>9}")
+    for name in [name for name in new if name in old]:
+        for metric, min_delta in COMPARE_METRICS.items():
+            before, after = old[name].get(metric), new[name].get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            regressed = change > threshold and after - before > min_delta
+            if regressed:
+                regressions.append((name, metric, before, after))
+            print(f"{name:<18}{metric:<14}{before:>10.2f}{after:>10.2f}{change:>+9.0%}"
+                  f"{'  ⚠️' if regressed else ''}")
+    for name in sorted(set(old) - set(new)):
+        print(f"  - {name}（只在舊版）")
+    for name in sorted(set(new) - set(old)):
+        print(f"  + {name}（只在新版）")
+    if regressions:
+        print(f"⚠️ {len(regressions)} 項指標退步超過 {threshold:.0%}")
+    else:
+        print("✅ 沒有退步的階段")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="比較兩次執行的各階段指標")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compare_parser = sub.add_parser("compare", help="比較兩個版本或 trace 檔")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="視為退步的增加比例（預設 20%%）")
+    args = parser.parse_args()
+
+    regressions = compare_stages(load_stages(args.old), load_stages(args.new), args.threshold)
+    sys.exit(1 if regressions else 0)
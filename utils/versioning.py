@@ -0,0 +1,298 @@
+# 版本快照：以內容 hash 去重的 blob 儲存區 + 硬連結
+#
+# data/versions/
+# ├── .blobs/ab/abcdef...          # 每個不同內容的檔案只存一份（唯讀）
+# ├── 20250717_1745_preproc/       # 版本資料夾：檔案皆為 .blobs 的硬連結
+# │   ├── merged.parquet
+# │   ├── ...
+# │   └── version.json             # 含 files 清單（相對路徑 → sha256 / 大小）
+#
+# 與上一版相同的產物不會再佔用空間，建立快照只需計算 hash 與建立連結。
+# blob 一律由來源檔「複製」（支援時使用 reflink）而來，不直接硬連結 data/processed 的檔案，
+# 之後覆寫 data/processed 不會改到已保存的版本；blob 設為唯讀，避免透過版本資料夾誤改內容。
+#
+# 用法（於專案根目錄執行）：
+# python -m utils.versioning list
+# python -m utils.versioning diff 20250717_1745_preproc 20250718_0930_preproc
+# python -m utils.versioning gc --keep-last 10 --dry-run
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+
+from utils.profiling import compare_stages
+
+BLOBS_DIR = ".blobs"
+VERSION_FILE = "version.json"
+# linux/fs.h: FICLONE = _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 * 1024 ** 2), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def blob_path(versions_dir, sha):
+    return os.path.join(versions_dir, BLOBS_DIR, sha[:2], sha)
+
+
+def _reflink_or_copy(src, dst):
+    """
+    檔案系統支援時以 reflink（copy-on-write，幾乎不佔空間）複製，否則一般複製
+    """
+    try:
+        import fcntl
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return "reflink"
+    except (ImportError, OSError):
+        shutil.copyfile(src, dst)
+        return "copy"
+
+
+def _store_blob(versions_dir, src, sha):
+    """
+    將 src 存成 blob（已存在則略過）；回傳新寫入的位元組數
+    """
+    dst = blob_path(versions_dir, sha)
+    if os.path.exists(dst):
+        return 0
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    _reflink_or_copy(src, tmp_path)
+    os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(tmp_path, dst)
+    return os.path.getsize(dst)
+
+
+def _materialize(blob, dst):
+    """
+    在版本資料夾建立指向 blob 的硬連結；跨檔案系統等無法連結時退回複製
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(blob, dst)
+    except OSError:
+        _reflink_or_copy(blob, dst)
+
+
+def read_version(version_dir):
+    """
+    讀取版本資料夾的 version.json（不存在時回傳空 dict）
+    """
+    path = os.path.join(version_dir, VERSION_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def list_version_dirs(versions_dir):
+    """
+    依名稱（時間戳）排序的版本資料夾名稱
+    """
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(name for name in os.listdir(versions_dir)
+                  if not name.startswith(".")
+                  and os.path.isdir(os.path.join(versions_dir, name)))
+
+
+def _previous_manifest(versions_dir):
+    """
+    最近一版的 files 清單；用來在檔案大小與修改時間都相同時沿用 hash，省去重新讀檔
+    """
+    for name in reversed(list_version_dirs(versions_dir)):
+        files = read_version(os.path.join(versions_dir, name)).get("files")
+        if files:
+            return files
+    return {}
+
+
+def available_version_name(versions_dir, name):
+    """
+    回傳尚未使用的版本名稱：name 已存在時依序加上 _2、_3 ...
+    （時間戳只到分鐘，同一分鐘內重跑會撞名；需在覆寫 source_dir 之前決定）
+    """
+    candidate, n = name, 1
+    while os.path.exists(os.path.join(versions_dir, candidate)):
+        n += 1
+        candidate = f"{name}_{n}"
+    return candidate
+
+
+def snapshot(source_dir, versions_dir, name):
+    """
+    為 source_dir 建立版本快照 versions_dir/name
+    回傳 (版本資料夾路徑, files 清單, 統計)；files 需寫入 version.json，gc 依此判斷 blob 是否仍被引用
+    """
+    version_dir = os.path.join(versions_dir, name)
+    os.makedirs(versions_dir, exist_ok=True)
+    os.makedirs(version_dir)  # 已存在時直接報錯，不覆蓋舊版本
+    previous = _previous_manifest(versions_dir)
+
+    files = {}
+    stats = {"files": 0, "bytes": 0, "new_blobs": 0, "new_bytes": 0}
+    for root, _, names in os.walk(source_dir):
+        for filename in sorted(names):
+            src = os.path.join(root, filename)
+            rel = os.path.relpath(src, source_dir).replace(os.sep, "/")
+            st = os.stat(src)
+            prev = previous.get(rel)
+            if prev and prev["size"] == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns \
+                    and os.path.exists(blob_path(versions_dir, prev["sha256"])):
+                sha = prev["sha256"]
+            else:
+                sha = file_sha256(src)
+
+            written = _store_blob(versions_dir, src, sha)
+            _materialize(blob_path(versions_dir, sha), os.path.join(version_dir, rel))
+            files[rel] = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            stats["files"] += 1
+            stats["bytes"] += st.st_size
+            stats["new_blobs"] += int(written > 0)
+            stats["new_bytes"] += written
+    return version_dir, files, stats
+
+
+def print_snapshot_stats(stats):
+    print(f"   {stats['files']} 個檔案（{stats['bytes'] / 1024 ** 2:.1f} MB），"
+          f"新增 {stats['new_blobs']} 個 blob（{stats['new_bytes'] / 1024 ** 2:.1f} MB），其餘與舊版共用")
+
+
+def list_versions(versions_dir):
+    """
+    列出各版本：檔案數、邏輯大小，以及只屬於該版本（其他版本未引用）的大小
+    """
+    rows = []
+    refs = {}
+    for name in list_version_dirs(versions_dir):
+        info = read_version(os.path.join(versions_dir, name))
+        files = info.get("files")
+        rows.append((name, info, files))
+        for entry in (files or {}).values():
+            refs.setdefault(entry["sha256"], set()).add(name)
+
+    print(f"{'version':<28}{'mode':<8}{'files':>7}{'size MB':>10}{'unique MB':>11}  features")
+    for name, info, files in rows:
+        if files is None:
+            print(f"{name:<28}{info.get('mode', '-'):<8}{'-':>7}{'-':>10}{'-':>11}  （舊版完整複製，無 files 清單）")
+            continue
+        size = sum(entry["size"] for entry in files.values())
+        unique = sum(entry["size"] for entry in files.values() if len(refs[entry["sha256"]]) == 1)
+        n_features = len(info.get("selected_features") or [])
+        print(f"{name:<28}{info.get('mode', '-'):<8}{len(files):>7}{size / 1024 ** 2:>10.1f}"
+              f"{unique / 1024 ** 2:>11.1f}  {n_features}")
+    return [name for name, _, _ in rows]
+
+
+def diff_versions(versions_dir, old, new):
+    """
+    比較兩個版本：新增 / 刪除 / 內容變更的檔案、選定特徵與參數的差異，
+    以及兩版都有 stages 時各階段的耗時 / 記憶體（退步超過 20% 的標記 ⚠️）
+    """
+    old_info = read_version(os.path.join(versions_dir, old))
+    new_info = read_version(os.path.join(versions_dir, new))
+    old_files = old_info.get("files") or {}
+    new_files = new_info.get("files") or {}
+
+    added = sorted(set(new_files) - set(old_files))
+    removed = sorted(set(old_files) - set(new_files))
+    changed = sorted(rel for rel in set(old_files) & set(new_files)
+                     if old_files[rel]["sha256"] != new_files[rel]["sha256"])
+    print(f"📄 {old} → {new}")
+    for rel in added:
+        print(f"  + {rel}")
+    for rel in removed:
+        print(f"  - {rel}")
+    for rel in changed:
+        print(f"  ~ {rel}（{old_files[rel]['size']} → {new_files[rel]['size']} bytes）")
+    unchanged = len(set(old_files) & set(new_files)) - len(changed)
+    print(f"  {unchanged} 個檔案內容相同")
+
+    for key in ["mode", "corr_threshold", "high_corr_threshold", "merged_rows"]:
+        if old_info.get(key) != new_info.get(key):
+            print(f"  {key}: {old_info.get(key)} → {new_info.get(key)}")
+    old_features = set(old_info.get("selected_features") or [])
+    new_features = set(new_info.get("selected_features") or [])
+    if old_features != new_features:
+        print(f"  selected_features 新增: {sorted(new_features - old_features)}")
+        print(f"  selected_features 移除: {sorted(old_features - new_features)}")
+    regressions = []
+    if old_info.get("stages") and new_info.get("stages"):
+        print("📊 各階段指標：")
+        regressions = compare_stages(old_info["stages"], new_info["stages"])
+    return {"added": added, "removed": removed, "changed": changed, "regressions": regressions}
+
+
+def gc(versions_dir, keep_last=None, dry_run=False):
+    """
+    （可選）只保留最近 keep_last 個版本，再刪除沒有任何版本引用的 blob
+    舊版完整複製的版本（沒有 files 清單）一律保留，需要時請手動刪除
+    回傳 (刪除的版本, 刪除的 blob 數, 釋放的位元組數)
+    """
+    # 舊版完整複製的版本（version.json 沒有 files 清單）不引用 blob，也不列入 keep_last 的計算
+    names = [name for name in list_version_dirs(versions_dir)
+             if read_version(os.path.join(versions_dir, name)).get("files") is not None]
+    removed_versions = []
+    if keep_last is not None and len(names) > keep_last:
+        removed_versions = names[:len(names) - keep_last]
+        names = names[len(names) - keep_last:]
+        for name in removed_versions:
+            print(f"🗑️ 刪除版本 {name}")
+            if not dry_run:
+                shutil.rmtree(os.path.join(versions_dir, name))
+
+    referenced = set()
+    for name in names:
+        for entry in (read_version(os.path.join(versions_dir, name)).get("files") or {}).values():
+            referenced.add(entry["sha256"])
+
+    removed_blobs = freed = 0
+    blobs_root = os.path.join(versions_dir, BLOBS_DIR)
+    if os.path.isdir(blobs_root):
+        for prefix in os.listdir(blobs_root):
+            prefix_dir = os.path.join(blobs_root, prefix)
+            for sha in os.listdir(prefix_dir):
+                if sha in referenced:
+                    continue
+                path = os.path.join(prefix_dir, sha)
+                freed += os.path.getsize(path)
+                removed_blobs += 1
+                if not dry_run:
+                    os.remove(path)
+            if not dry_run and not os.listdir(prefix_dir):
+                os.rmdir(prefix_dir)
+
+    action = "可刪除" if dry_run else "已刪除"
+    print(f"🧹 {action} {removed_blobs} 個未引用的 blob，釋放 {freed / 1024 ** 2:.1f} MB")
+    return removed_versions, removed_blobs, freed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="版本快照管理")
+    parser.add_argument("--versions-dir", default="data/versions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="列出所有版本")
+    diff_parser = sub.add_parser("diff", help="比較兩個版本")
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+    gc_parser = sub.add_parser("gc", help="刪除未引用的 blob（可選擇只保留最近 N 個版本）")
+    gc_parser.add_argument("--keep-last", type=int, default=None,
+                           help="只保留最近 N 個快照版本（舊版完整複製、沒有 files 清單的版本不受影響）")
+    gc_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_versions(args.versions_dir)
+    elif args.command == "diff":
+        diff_versions(args.versions_dir, args.old, args.new)
+    else:
+        gc(args.versions_dir, keep_last=args.keep_last, dry_run=args.dry_run)